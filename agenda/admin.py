@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Agenda, Cita
+from .models import Agenda, Cita, Slot
 
 admin.site.register(Agenda)
-admin.site.register(Cita)
\ No newline at end of file
+admin.site.register(Cita)
+admin.site.register(Slot)
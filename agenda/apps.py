@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AgendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agenda'
+
+    def ready(self):
+        # Registrar los receptores de señales (inventario de slots)
+        from . import signals  # noqa: F401
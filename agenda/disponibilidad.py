@@ -0,0 +1,197 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from hospital_project.cache import CacheTTL
+from personal.models import Personal, Especialista
+from .models import Agenda, Cita
+
+# Estados que mantienen ocupado un slot (una cita CANCELADA o COMPLETADA lo libera)
+ESTADOS_ACTIVOS = ['PENDIENTE', 'CONFIRMADA']
+
+# Slots de 30 minutos (RF-011) buscados en una ventana de 2 semanas (configurables en settings)
+DURACION_SLOT = timedelta(minutes=settings.AGENDA_DURACION_SLOT_MINUTOS)
+DIAS_A_BUSCAR = settings.AGENDA_DIAS_A_BUSCAR
+
+
+# Padrón de Médicos Generales y sus Agendas: cambia pocas veces al día, así que se guarda en cache
+# y se invalida con señales al modificar Personal, Especialista o Agenda (ver agenda/signals.py).
+cache_padron_mg = CacheTTL(
+    'padron_mg',
+    ttl=settings.AGENDA_CACHE_PADRON_TTL,
+    max_entradas=1,
+    backend=settings.AGENDA_CACHE_PADRON_BACKEND,
+)
+
+
+def _cargar_padron_mg():
+    """
+    Un Médico General (MG) es todo Personal con rol MEDICO que no está registrado como Especialista.
+    Se cargan sus IDs y sus Agendas (con el médico) en dos consultas.
+    """
+    medicos_ids = list(
+        Personal.objects.filter(rol='MEDICO').exclude(
+            id__in=Especialista.objects.values('medico_id')
+        ).values_list('id', flat=True)
+    )
+    agendas = list(
+        Agenda.objects.filter(medico_id__in=medicos_ids)
+        .select_related('medico')
+        .order_by('dia', 'hora_inicio', 'id')
+    )
+    return {'medicos_ids': medicos_ids, 'agendas': agendas}
+
+
+def invalidar_padron_mg():
+    cache_padron_mg.delete('padron')
+
+
+def medicos_generales_ids():
+    """ Devuelve la lista de IDs de los Médicos Generales (MG). """
+    return list(cache_padron_mg.get_or_set('padron', _cargar_padron_mg)['medicos_ids'])
+
+
+def agendas_medicina_general():
+    """ Devuelve las Agendas de los Médicos Generales (MG), con su médico. """
+    return list(cache_padron_mg.get_or_set('padron', _cargar_padron_mg)['agendas'])
+
+
+def ventana_busqueda(fecha_inicio, dias=DIAS_A_BUSCAR):
+    """ Devuelve el rango [desde, hasta) de fechas-hora que cubren `dias` días a partir de fecha_inicio. """
+    desde = timezone.make_aware(datetime.combine(fecha_inicio, time.min))
+    return desde, desde + timedelta(days=dias)
+
+
+def citas_activas(medico_ids, desde, hasta):
+    """
+    Queryset de las citas activas de los médicos indicados dentro de [desde, hasta).
+    Filtra por Cita.medico (sin JOIN con Agenda), así que el predicado coincide con el índice
+    parcial (medico_id, fecha_hora) WHERE estado IN activos de la restricción cita_unica_slot_activo_por_medico.
+    """
+    return Cita.objects.filter(
+        medico_id__in=medico_ids,
+        fecha_hora__gte=desde,
+        fecha_hora__lt=hasta,
+        estado__in=ESTADOS_ACTIVOS
+    )
+
+
+def cargar_ocupados(medico_ids, desde, hasta):
+    """
+    Carga en una sola consulta las citas activas de los médicos indicados
+    dentro de [desde, hasta) y las agrupa en un conjunto de slots ocupados por médico.
+    """
+    ocupados = defaultdict(set)
+    if not medico_ids:
+        return ocupados
+
+    for medico_id, fecha_hora in citas_activas(medico_ids, desde, hasta).values_list('medico_id', 'fecha_hora'):
+        ocupados[medico_id].add(fecha_hora)
+    return ocupados
+
+
+def slots_de_agenda(agenda, fecha):
+    """ Genera los inicios de slot de una Agenda para una fecha concreta. """
+    inicio_bloque = timezone.make_aware(datetime.combine(fecha, agenda.hora_inicio))
+    fin_bloque = timezone.make_aware(datetime.combine(fecha, agenda.hora_fin))
+
+    slot_actual = inicio_bloque
+    while slot_actual + DURACION_SLOT <= fin_bloque:
+        yield slot_actual
+        slot_actual += DURACION_SLOT
+
+
+def agenda_contiene_slot(agenda, fecha_hora):
+    """
+    Verifica que fecha_hora sea el inicio de un slot válido de la Agenda:
+    mismo día de la semana, dentro del horario y alineado a bloques de 30 minutos.
+    """
+    local = timezone.localtime(fecha_hora)
+    if local.weekday() != agenda.dia:
+        return False
+    return local in set(slots_de_agenda(agenda, local.date()))
+
+
+class DisponibilidadMG:
+    """
+    Fotografía en memoria de la disponibilidad de Medicina General.
+
+    Carga todas las Agendas MG y todas las citas activas de la ventana de búsqueda
+    con dos consultas; a partir de ahí los slots libres se calculan sin tocar la BD,
+    sin importar qué tan llena esté la agenda.
+    """
+
+    def __init__(self, fecha_inicio=None, dias=DIAS_A_BUSCAR, agendas=None):
+        # La búsqueda empieza a partir de mañana
+        self.fecha_inicio = fecha_inicio or timezone.localdate() + timedelta(days=1)
+        self.dias = dias
+        self.agendas = agendas if agendas is not None else agendas_medicina_general()
+
+        desde, hasta = ventana_busqueda(self.fecha_inicio, self.dias)
+        medico_ids = {agenda.medico_id for agenda in self.agendas}
+
+        # Una sola consulta da los slots ocupados y, de paso, la carga de cada médico:
+        # número de citas activas en la ventana y la cita más reciente que se le asignó (mayor id).
+        self.ocupados = defaultdict(set)
+        self.ultima_asignacion = {}
+        if medico_ids:
+            citas = citas_activas(medico_ids, desde, hasta).values_list('medico_id', 'fecha_hora', 'id')
+            for medico_id, fecha_hora, cita_id in citas:
+                self.ocupados[medico_id].add(fecha_hora)
+                self.ultima_asignacion[medico_id] = max(cita_id, self.ultima_asignacion.get(medico_id, 0))
+        self._siguiente_asignacion = max(self.ultima_asignacion.values(), default=0) + 1
+
+    def hay_agendas(self):
+        return bool(self.agendas)
+
+    def medicos_ids(self):
+        """ IDs de los médicos con agenda, en el orden de las agendas. """
+        return list(dict.fromkeys(agenda.medico_id for agenda in self.agendas))
+
+    def esta_libre(self, medico_id, fecha_hora):
+        return fecha_hora not in self.ocupados[medico_id]
+
+    def minutos_agendados(self, medico_id):
+        """ Minutos ya agendados al médico dentro de la ventana. """
+        return len(self.ocupados[medico_id]) * int(DURACION_SLOT.total_seconds() // 60)
+
+    def ocupar(self, medico_id, fecha_hora):
+        """ Marca un slot como ocupado en la fotografía (p. ej. tras crear una cita). """
+        self.ocupados[medico_id].add(fecha_hora)
+        self.ultima_asignacion[medico_id] = self._siguiente_asignacion
+        self._siguiente_asignacion += 1
+
+    def _slots_de_agenda_en_ventana(self, agenda):
+        """ Genera (fecha_hora, agenda_id, agenda) para cada slot de la Agenda en los días de la ventana. """
+        # Primer día de la ventana que coincide con el día de la semana de la Agenda; luego, cada 7 días
+        desfase = (agenda.dia - self.fecha_inicio.weekday()) % 7
+        for i in range(desfase, self.dias, 7):
+            for slot in slots_de_agenda(agenda, self.fecha_inicio + timedelta(days=i)):
+                yield slot, agenda.id, agenda
+
+    def slots_libres(self, medico_id=None, despues_de=None):
+        """
+        Genera tuplas (agenda, fecha_hora) de slots libres en orden (fecha_hora, id de la Agenda),
+        opcionalmente solo de un médico y/o estrictamente posteriores al cursor `despues_de`,
+        una tupla (fecha_hora, agenda_id): varias agendas pueden tener un slot a la misma hora.
+
+        Es perezoso: mezcla con un heap los slots de todas las agendas a medida que se piden,
+        así que quien solo necesita los primeros N slots no genera el resto de la ventana.
+        """
+        generadores = [
+            self._slots_de_agenda_en_ventana(agenda)
+            for agenda in self.agendas
+            if medico_id is None or agenda.medico_id == medico_id
+        ]
+        for slot, agenda_id, agenda in heapq.merge(*generadores):
+            if despues_de is not None and (slot, agenda_id) <= despues_de:
+                continue
+            if self.esta_libre(agenda.medico_id, slot):
+                yield agenda, slot
+
+    def primer_slot_libre(self):
+        """ Devuelve (agenda, fecha_hora) del primer slot libre, o None. """
+        return next(self.slots_libres(), None)
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class EstrategiaAsignacion:
+    """
+    Decide en qué orden se prueban los slots libres al autoasignar citas MG.
+    `candidatos()` genera tuplas (agenda, fecha_hora) consultando el estado actual de la
+    fotografía de disponibilidad en cada paso, así que respeta los slots que el llamador
+    marque con `disponibilidad.ocupar()` (asignaciones del mismo lote o conflictos).
+    """
+    nombre = None
+    # Si el orden coincide con el del inventario materializado (primer slot libre),
+    # la autoasignación puede resolverse con una sola consulta indexada.
+    usa_inventario = False
+
+    def candidatos(self, disponibilidad):
+        raise NotImplementedError
+
+
+class PrimerSlotLibre(EstrategiaAsignacion):
+    """ El slot más próximo, sin importar el médico (comportamiento original, RB-003). """
+    nombre = 'primero'
+    usa_inventario = True
+
+    def candidatos(self, disponibilidad):
+        return disponibilidad.slots_libres()
+
+
+class EstrategiaPorMedico(EstrategiaAsignacion):
+    """
+    Elige primero al médico con menor `prioridad()` entre los que aún tienen slots libres
+    y le asigna su slot más próximo. Los empates se resuelven por el slot más próximo.
+    """
+
+    def prioridad(self, disponibilidad, medico_id):
+        raise NotImplementedError
+
+    def candidatos(self, disponibilidad):
+        iteradores = {medico_id: disponibilidad.slots_libres(medico_id) for medico_id in disponibilidad.medicos_ids()}
+        siguientes = {}
+
+        while True:
+            for medico_id, iterador in list(iteradores.items()):
+                candidato = siguientes.get(medico_id)
+                if candidato is None or not disponibilidad.esta_libre(medico_id, candidato[1]):
+                    candidato = next(iterador, None)
+                    if candidato is None:
+                        # El médico ya no tiene slots libres en la ventana
+                        del iteradores[medico_id]
+                        siguientes.pop(medico_id, None)
+                        continue
+                    siguientes[medico_id] = candidato
+
+            if not siguientes:
+                return
+
+            elegido = min(siguientes, key=lambda medico_id: (self.prioridad(disponibilidad, medico_id), siguientes[medico_id][1]))
+            yield siguientes.pop(elegido)
+
+
+class MenorCarga(EstrategiaPorMedico):
+    """ El médico con menos minutos agendados en la ventana de búsqueda. """
+    nombre = 'menor_carga'
+
+    def prioridad(self, disponibilidad, medico_id):
+        return disponibilidad.minutos_agendados(medico_id)
+
+
+class RoundRobin(EstrategiaPorMedico):
+    """ El médico al que hace más tiempo se le asignó una cita (rotación entre médicos). """
+    nombre = 'round_robin'
+
+    def prioridad(self, disponibilidad, medico_id):
+        return disponibilidad.ultima_asignacion.get(medico_id, 0)
+
+
+ESTRATEGIAS = {estrategia.nombre: estrategia for estrategia in (PrimerSlotLibre, MenorCarga, RoundRobin)}
+
+
+def obtener_estrategia(nombre=None):
+    """ Devuelve la estrategia indicada o la configurada en settings.AGENDA_ESTRATEGIA_ASIGNACION. """
+    nombre = nombre or settings.AGENDA_ESTRATEGIA_ASIGNACION
+    try:
+        return ESTRATEGIAS[nombre]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Estrategia de asignación desconocida: '{nombre}'. Opciones: {', '.join(ESTRATEGIAS)}."
+        )
@@ -0,0 +1,131 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .disponibilidad import (DIAS_A_BUSCAR, ESTADOS_ACTIVOS, agendas_medicina_general, medicos_generales_ids,
+                             slots_de_agenda, ventana_busqueda)
+from .models import Cita, Slot
+
+# Días hacia adelante que cubre el inventario de slots (debe ser >= DIAS_A_BUSCAR)
+DIAS_INVENTARIO = 2 * DIAS_A_BUSCAR
+
+
+def generar_inventario(fecha_inicio=None, dias=DIAS_INVENTARIO, medico_id=None):
+    """
+    Materializa los slots de las Agendas MG para el horizonte [fecha_inicio, fecha_inicio + dias).
+    Es idempotente: crea los slots faltantes, elimina los libres que ya no corresponden a una
+    Agenda MG vigente y los del pasado, y enlaza los slots con las citas activas existentes.
+    Con `medico_id` solo se rehacen los slots de ese médico (p. ej. al cambiar su Agenda).
+    Devuelve (slots_esperados, slots_eliminados).
+    """
+    fecha_inicio = fecha_inicio or timezone.localdate()
+    desde, hasta = ventana_busqueda(fecha_inicio, dias)
+    slots = Slot.objects.all() if medico_id is None else Slot.objects.filter(medico_id=medico_id)
+
+    agendas_por_dia = defaultdict(list)
+    for agenda in agendas_medicina_general():
+        if medico_id is None or agenda.medico_id == medico_id:
+            agendas_por_dia[agenda.dia].append(agenda)
+
+    esperados = []
+    for i in range(dias):
+        fecha_actual = fecha_inicio + timedelta(days=i)
+        for agenda in agendas_por_dia.get(fecha_actual.weekday(), []):
+            for slot in slots_de_agenda(agenda, fecha_actual):
+                esperados.append(Slot(agenda=agenda, medico_id=agenda.medico_id, fecha_hora=slot))
+
+    # 1. Limpiar el pasado y los slots libres que ya no existen en las Agendas (cambios de horario/rol)
+    eliminados, _ = slots.filter(fecha_hora__lt=desde).delete()
+    claves = {(slot.medico_id, slot.fecha_hora) for slot in esperados}
+    obsoletos = [
+        slot_id for slot_id, slot_medico_id, fecha_hora in slots.filter(
+            cita__isnull=True, fecha_hora__gte=desde, fecha_hora__lt=hasta
+        ).values_list('id', 'medico_id', 'fecha_hora').iterator()
+        if (slot_medico_id, fecha_hora) not in claves
+    ]
+    for i in range(0, len(obsoletos), 1000):
+        borrados, _ = Slot.objects.filter(id__in=obsoletos[i:i + 1000]).delete()
+        eliminados += borrados
+
+    # 2. Crear los slots faltantes (los existentes se respetan por la restricción única)
+    Slot.objects.bulk_create(esperados, batch_size=1000, ignore_conflicts=True)
+
+    # 3. Enlazar con las citas activas ya agendadas en el horizonte
+    enlazar_citas_activas(slots.filter(fecha_hora__gte=desde, fecha_hora__lt=hasta))
+
+    return len(esperados), eliminados
+
+
+def regenerar_slots_medico(medico_id):
+    """
+    Rehace los slots de un médico tras cambiar o eliminar una de sus Agendas, para que el inventario
+    no ofrezca horarios que ya no atiende. Si el inventario no se ha generado (no hay slots), no hace
+    nada: materializar solo a este médico haría que el camino rápido ignorara al resto.
+    """
+    if Slot.objects.exists():
+        generar_inventario(medico_id=medico_id)
+
+
+def enlazar_citas_activas(slots):
+    """
+    Marca como ocupados, con una sola sentencia UPDATE, los slots libres del queryset
+    que coinciden (médico, fecha_hora) con una cita activa.
+    """
+    slots.filter(cita__isnull=True).update(
+        cita=Subquery(
+            Cita.objects.filter(
+                medico_id=OuterRef('medico_id'),
+                fecha_hora=OuterRef('fecha_hora'),
+                estado__in=ESTADOS_ACTIVOS
+            ).values('id')[:1]
+        )
+    )
+
+
+def reservar_primer_slot_libre(desde, hasta):
+    """
+    Devuelve el primer Slot MG libre en [desde, hasta) bloqueando su fila, o None.
+    Se traduce en un único SELECT ... ORDER BY fecha_hora LIMIT 1 FOR UPDATE SKIP LOCKED,
+    por lo que solicitudes concurrentes obtienen slots distintos sin esperarse.
+    Debe llamarse dentro de transaction.atomic().
+    """
+    return (
+        Slot.objects.select_for_update(skip_locked=True, of=('self',))
+        .select_related('agenda__medico')
+        .filter(
+            cita__isnull=True,
+            fecha_hora__gte=desde,
+            fecha_hora__lt=hasta,
+            medico_id__in=medicos_generales_ids()
+        )
+        .order_by('fecha_hora', 'id')
+        .first()
+    )
+
+
+def sincronizar_slot(cita, created=False):
+    """ Refleja en el inventario el estado de una Cita recién creada, cancelada o reagendada. """
+    if cita.estado in ESTADOS_ACTIVOS:
+        if not created:
+            # Si la cita cambió de horario, liberar el slot anterior
+            Slot.objects.filter(cita=cita).exclude(fecha_hora=cita.fecha_hora).update(cita=None)
+        Slot.objects.filter(medico_id=cita.medico_id, fecha_hora=cita.fecha_hora, cita__isnull=True).update(cita=cita)
+    else:
+        # CANCELADA o COMPLETADA: el slot vuelve a estar libre
+        Slot.objects.filter(cita=cita).update(cita=None)
+
+
+def sincronizar_slots_lote(citas):
+    """
+    Equivalente a sincronizar_slot para citas nuevas creadas con bulk_create
+    (que no emite señales post_save): una sola sentencia para todo el lote.
+    """
+    if not citas:
+        return
+    enlazar_citas_activas(Slot.objects.filter(
+        medico_id__in={cita.medico_id for cita in citas},
+        fecha_hora__gte=min(cita.fecha_hora for cita in citas),
+        fecha_hora__lte=max(cita.fecha_hora for cita in citas),
+    ))
@@ -0,0 +1,81 @@
+import statistics
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from agenda.estrategias import ESTRATEGIAS, obtener_estrategia
+from agenda.views import intentar_autoasignar_cita
+from expediente.models import Paciente
+from hospital_project.benchmark import percentil, transaccion_revertida
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara las estrategias de autoasignación de citas MG: distribución del tiempo de espera, "
+        "reparto de la ocupación entre médicos y latencia. Trabaja sobre las Agendas reales "
+        "dentro de una transacción que se revierte al terminar (no deja citas creadas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citas', type=int, default=200, help="Número de solicitudes a simular por estrategia.")
+        parser.add_argument(
+            '--estrategias', default=','.join(ESTRATEGIAS),
+            help=f"Estrategias a comparar, separadas por coma (por defecto: {','.join(ESTRATEGIAS)})."
+        )
+
+    def handle(self, *args, **options):
+        nombres = [nombre.strip() for nombre in options['estrategias'].split(',') if nombre.strip()]
+        for nombre in nombres:
+            if nombre not in ESTRATEGIAS:
+                raise CommandError(f"Estrategia desconocida: '{nombre}'.")
+
+        for nombre in nombres:
+            resultado = self.simular(obtener_estrategia(nombre), options['citas'])
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Estrategia: {nombre}"))
+            if resultado is None:
+                self.stdout.write("  No hay agendas de Medicina General configuradas.")
+                continue
+            for etiqueta, valor in resultado.items():
+                self.stdout.write(f"  {etiqueta}: {valor}")
+
+    def simular(self, estrategia, total):
+        esperas_horas = []
+        latencias_ms = []
+        por_medico = Counter()
+        sin_slot = 0
+
+        with transaccion_revertida():
+            # Pacientes temporales (se revierten junto con las citas)
+            pacientes = Paciente.objects.bulk_create([
+                Paciente(CURP=f"BENCH{i:013d}", nombre='Benchmark', apellidos=f'Paciente {i}',
+                         direccion='N/A', fecha_nacimiento=date(1990, 1, 1))
+                for i in range(total)
+            ])
+
+            for paciente in pacientes:
+                inicio = time.perf_counter()
+                cita = intentar_autoasignar_cita(paciente.id, estrategia=estrategia)
+                latencias_ms.append((time.perf_counter() - inicio) * 1000)
+
+                if cita is False:
+                    return None
+                if cita is None:
+                    sin_slot += 1
+                    continue
+                esperas_horas.append((cita.fecha_hora - timezone.now()).total_seconds() / 3600)
+                por_medico[cita.medico_id] += 1
+
+        ocupacion = list(por_medico.values())
+        return {
+            'citas asignadas': f"{len(esperas_horas)} (sin slot: {sin_slot})",
+            'espera (h) p50/p95/max': "{:.1f} / {:.1f} / {:.1f}".format(
+                percentil(esperas_horas, 50), percentil(esperas_horas, 95), max(esperas_horas, default=0)),
+            'citas por médico min/max/desv': "{} / {} / {:.2f}".format(
+                min(ocupacion, default=0), max(ocupacion, default=0),
+                statistics.pstdev(ocupacion) if ocupacion else 0.0),
+            'latencia (ms) p50/p95/p99': "{:.2f} / {:.2f} / {:.2f}".format(
+                percentil(latencias_ms, 50), percentil(latencias_ms, 95), percentil(latencias_ms, 99)),
+        }
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from agenda.inventario import DIAS_INVENTARIO, generar_inventario
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera el inventario de slots de Medicina General a partir de las Agendas "
+        "para un horizonte móvil. Es idempotente; se recomienda ejecutarlo a diario (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=DIAS_INVENTARIO,
+            help=f"Días hacia adelante que cubre el inventario (por defecto {DIAS_INVENTARIO})."
+        )
+
+    def handle(self, *args, **options):
+        esperados, eliminados = generar_inventario(dias=options['dias'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Inventario actualizado: {esperados} slots en {options['dias']} días, {eliminados} slots obsoletos eliminados."
+        ))
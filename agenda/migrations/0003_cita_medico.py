@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copiar_medico_de_agenda(apps, schema_editor):
+    Cita = apps.get_model('agenda', 'Cita')
+    Cita.objects.update(
+        medico_id=models.Subquery(
+            apps.get_model('agenda', 'Agenda').objects.filter(id=models.OuterRef('agenda_id')).values('medico_id')[:1]
+        )
+    )
+
+    # Los dobles agendados previos impedirían crear la restricción única (0004). Cancelar alguna de
+    # esas citas es una decisión clínica: no se toca ninguna y la migración se detiene con la lista
+    # de slots en conflicto para resolverlos a mano (igual que las CURP duplicadas en expediente 0007).
+    por_slot = {}
+    activas = Cita.objects.filter(estado__in=['PENDIENTE', 'CONFIRMADA']).order_by('id')
+    for cita_id, medico_id, fecha_hora in activas.values_list('id', 'medico_id', 'fecha_hora').iterator():
+        por_slot.setdefault((medico_id, fecha_hora), []).append(cita_id)
+    conflictos = [
+        f"médico {medico_id}, {fecha_hora:%Y-%m-%d %H:%M}: citas {', '.join(map(str, ids))}"
+        for (medico_id, fecha_hora), ids in por_slot.items() if len(ids) > 1
+    ]
+    if conflictos:
+        raise RuntimeError(
+            "Hay citas activas que comparten médico y horario; cancele o reagende todas menos una "
+            "de cada slot y vuelva a ejecutar la migración:\n  " + "\n  ".join(conflictos)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0002_alter_cita_fecha_hora'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='medico',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='citas_asignadas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copiar_medico_de_agenda, migrations.RunPython.noop),
+    ]
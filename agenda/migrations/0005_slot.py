@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0004_alter_cita_medico_cita_unica_slot_activo_por_medico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Slot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_hora', models.DateTimeField()),
+                ('agenda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='agenda.agenda')),
+                ('cita', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slot', to='agenda.cita')),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('cita__isnull', True)), fields=['fecha_hora'], name='slot_libre_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('medico', 'fecha_hora'), name='slot_unico_por_medico')],
+            },
+        ),
+    ]
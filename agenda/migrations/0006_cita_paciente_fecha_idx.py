@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0005_slot'),
+        ('expediente', '0005_historial_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['paciente', 'fecha_hora', 'id'], name='cita_paciente_fecha_idx'),
+        ),
+    ]
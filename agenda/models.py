@@ -29,6 +29,8 @@ class Cita(models.Model):
     # Relaciones
     agenda = models.ForeignKey(Agenda, on_delete=models.PROTECT, related_name='citas')
     paciente = models.ForeignKey(Paciente, on_delete=models.PROTECT)
+    # Copia de agenda.medico: permite que la BD garantice un solo paciente por slot y médico
+    medico = models.ForeignKey(Personal, on_delete=models.PROTECT, related_name='citas_asignadas', editable=False)
     
     # Campo de tiempo (debe ser un slot de 30 minutos - RF-011)
     fecha_hora = models.DateTimeField()
@@ -48,5 +50,52 @@ class Cita(models.Model):
     ]
     tipo_cita = models.CharField(max_length=3, choices=TIPO_CITA)
 
+    def save(self, *args, **kwargs):
+        # El médico siempre es el de la Agenda (se guarda duplicado para la restricción única)
+        self.medico_id = self.agenda.medico_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Cita de {self.paciente.apellidos} con {self.agenda.medico.numero_empleado} en {self.fecha_hora}"
+
+    class Meta:
+        constraints = [
+            # Un médico no puede tener dos citas activas en el mismo slot (evita doble agendado concurrente).
+            # Su índice parcial (medico_id, fecha_hora) también sirve a las consultas de disponibilidad.
+            models.UniqueConstraint(
+                fields=['medico', 'fecha_hora'],
+                condition=models.Q(estado__in=['PENDIENTE', 'CONFIRMADA']),
+                name='cita_unica_slot_activo_por_medico',
+            ),
+        ]
+        indexes = [
+            # Citas del paciente paginadas por cursor: WHERE paciente_id = ? ORDER BY fecha_hora, id
+            models.Index(fields=['paciente', 'fecha_hora', 'id'], name='cita_paciente_fecha_idx'),
+        ]
+
+class Slot(models.Model):
+    """
+    Inventario materializado de slots de 30 minutos (RF-011), generado a partir de las Agendas.
+    Un slot está libre mientras no tenga una Cita activa asociada.
+    """
+    agenda = models.ForeignKey(Agenda, on_delete=models.CASCADE, related_name='slots')
+    medico = models.ForeignKey(Personal, on_delete=models.CASCADE, related_name='slots')
+    fecha_hora = models.DateTimeField()
+    cita = models.OneToOneField(Cita, on_delete=models.SET_NULL, null=True, blank=True, related_name='slot')
+
+    @property
+    def libre(self):
+        return self.cita_id is None
+
     def __str__(self):
-        return f"Cita de {self.paciente.apellidos} con {self.agenda.medico.numero_empleado} en {self.fecha_hora}"
\ No newline at end of file
+        estado = 'Libre' if self.libre else 'Ocupado'
+        return f"Slot de {self.medico.numero_empleado} en {self.fecha_hora} ({estado})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medico', 'fecha_hora'], name='slot_unico_por_medico'),
+        ]
+        indexes = [
+            # Búsqueda del primer slot libre: ORDER BY fecha_hora sobre los slots sin cita
+            models.Index(fields=['fecha_hora'], condition=models.Q(cita__isnull=True), name='slot_libre_fecha_idx'),
+        ]
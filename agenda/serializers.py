@@ -1,7 +1,11 @@
+import math
+
 from rest_framework import serializers
 from .models import Cita, Agenda
 from expediente.models import Paciente
 from django.utils import timezone
+from hospital_project.proyecciones import Proyeccion, fecha_hora, nombre_completo
+from .disponibilidad import DURACION_SLOT, agenda_contiene_slot, cargar_ocupados
 
 class SolicitudCitaSerializer(serializers.Serializer):
     """
@@ -19,6 +23,15 @@ class SolicitudCitaSerializer(serializers.Serializer):
             raise serializers.ValidationError("Paciente no encontrado. Asegúrese de estar registrado.")
         return value
 
+class SolicitudCitaLoteSerializer(serializers.Serializer):
+    """
+    Serializador de entrada para la solicitud masiva de citas (call center, campañas).
+    Los pacientes inexistentes no invalidan el lote: se reportan en el resultado de cada uno.
+    """
+    pacientes_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=1000, write_only=True
+    )
+
 class CancelarCitaSerializer(serializers.Serializer):
     """
     Serializador de entrada para la cancelación.
@@ -78,27 +91,59 @@ class CitaReadSerializer(serializers.ModelSerializer):
         model = Cita
         fields = ['id', 'fecha_hora', 'tipo_cita', 'estado', 'consultorio', 'medico_nombre']
 
+class CitaReadProyeccion(Proyeccion):
+    """ Listado de CitaReadSerializer con .values() (citas del paciente). """
+    columnas = ('id', 'fecha_hora', 'tipo_cita', 'estado', 'agenda__consultorio',
+                'agenda__medico__first_name', 'agenda__medico__last_name')
+
+    def fila(self, fila):
+        return {
+            'id': fila['id'],
+            'fecha_hora': fecha_hora(fila['fecha_hora']),
+            'tipo_cita': fila['tipo_cita'],
+            'estado': fila['estado'],
+            'consultorio': fila['agenda__consultorio'],
+            'medico_nombre': nombre_completo(fila['agenda__medico__first_name'], fila['agenda__medico__last_name']),
+        }
+
+class OpcionesCitaQuerySerializer(serializers.Serializer):
+    """
+    Parámetros de consulta de las opciones de slots: cuántas devolver y desde dónde continuar.
+    El cursor es (desde, desde_agenda) de la última opción recibida; sin desde_agenda se continúa
+    después de todos los slots de la hora `desde`.
+    """
+    limite = serializers.IntegerField(required=False, min_value=1, max_value=50)
+    desde = serializers.DateTimeField(required=False)
+    desde_agenda = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        if 'desde_agenda' in data and 'desde' not in data:
+            raise serializers.ValidationError("'desde_agenda' requiere 'desde'.")
+        if 'desde' in data:
+            data['cursor'] = (data['desde'], data.get('desde_agenda', math.inf))
+        return data
+
 class SlotSeleccionadoSerializer(serializers.Serializer):
     """ Serializador para crear una cita con slot elegido por el paciente. """
     paciente_id = serializers.IntegerField()
     agenda_id = serializers.IntegerField()
     fecha_hora = serializers.DateTimeField()
     
-    # Validación simple: Asegurar que el slot elegido esté dentro de la Agenda.
+    # Validación: el slot elegido debe pertenecer a la Agenda y estar libre.
     def validate(self, data):
         try:
             agenda = Agenda.objects.get(id=data['agenda_id'])
         except Agenda.DoesNotExist:
             raise serializers.ValidationError("Agenda no válida.")
 
-        # Verificar si la fecha_hora está ya ocupada por otra cita activa
-        cita_ocupada = Cita.objects.filter(
-            fecha_hora=data['fecha_hora'],
-            agenda__medico=agenda.medico,
-            estado__in=['PENDIENTE', 'CONFIRMADA']
-        ).exists()
+        if not agenda_contiene_slot(agenda, data['fecha_hora']):
+            raise serializers.ValidationError("El horario elegido no pertenece a la Agenda.")
 
-        if cita_ocupada:
+        # Verificar si la fecha_hora está ya ocupada por otra cita activa del médico
+        ocupados = cargar_ocupados(
+            [agenda.medico_id], data['fecha_hora'], data['fecha_hora'] + DURACION_SLOT
+        )
+        if data['fecha_hora'] in ocupados[agenda.medico_id]:
             raise serializers.ValidationError("Slot ya ocupado.")
 
-        return data
\ No newline at end of file
+        return data
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from personal.models import Especialista, Personal
+from .disponibilidad import invalidar_padron_mg
+from .inventario import regenerar_slots_medico, sincronizar_slot
+from .models import Agenda, Cita
+
+# Campos de Personal que afectan al padrón de Médicos Generales (rol y nombre mostrado)
+CAMPOS_PADRON = {'rol', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Cita)
+def actualizar_inventario_slots(sender, instance, created, **kwargs):
+    # Mantiene el inventario de slots al crear, cancelar o reagendar una Cita
+    sincronizar_slot(instance, created=created)
+
+
+@receiver(post_save, sender=Personal)
+@receiver(post_delete, sender=Personal)
+def invalidar_padron_por_personal(sender, instance, update_fields=None, **kwargs):
+    # Los guardados parciales ajenos al padrón (p. ej. last_login al iniciar sesión) no lo invalidan
+    if update_fields is not None and not CAMPOS_PADRON.intersection(update_fields):
+        return
+    invalidar_padron_mg()
+
+
+@receiver(post_save, sender=Especialista)
+@receiver(post_delete, sender=Especialista)
+def invalidar_padron(sender, **kwargs):
+    invalidar_padron_mg()
+
+
+@receiver(post_save, sender=Agenda)
+@receiver(post_delete, sender=Agenda)
+def actualizar_slots_por_agenda(sender, instance, **kwargs):
+    # El padrón se invalida antes: la regeneración de slots lee las Agendas vigentes
+    invalidar_padron_mg()
+    regenerar_slots_medico(instance.medico_id)
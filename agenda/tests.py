@@ -1,3 +1,352 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from expediente.models import Paciente
+from personal.models import Personal
+from .disponibilidad import ESTADOS_ACTIVOS, DisponibilidadMG, agenda_contiene_slot, citas_activas, invalidar_padron_mg, ventana_busqueda
+from .estrategias import MenorCarga, PrimerSlotLibre, RoundRobin
+from .inventario import generar_inventario
+from .models import Agenda, Cita, Slot
+from .views import autoasignar_citas_lote, autoasignar_desde_inventario
+
+# Solicitudes simultáneas de cada prueba de concurrencia
+HILOS = 8
+
+
+def crear_medico(numero_empleado):
+    return Personal.objects.create_user(numero_empleado, password='x', rol='MEDICO',
+                                        first_name='Ana', last_name=f'Médico {numero_empleado}')
+
+
+def crear_pacientes(n):
+    return [
+        Paciente.objects.create(CURP=f'PACX{i:06d}HDFRRN09', nombre='Juan', apellidos=f'Pérez {i}',
+                                direccion='Calle 1', fecha_nacimiento='1990-01-01')
+        for i in range(n)
+    ]
+
+
+def en_paralelo(peticiones):
+    """
+    Lanza cada petición (función sin argumentos) en su propio hilo, todas a la vez, y devuelve
+    sus respuestas en orden. Cada hilo usa su propia conexión a la BD y la cierra al terminar.
+    """
+    barrera = threading.Barrier(len(peticiones))
+    respuestas = [None] * len(peticiones)
+
+    def ejecutar(i, peticion):
+        try:
+            barrera.wait()
+            respuestas[i] = peticion()
+        finally:
+            connection.close()
+
+    hilos = [threading.Thread(target=ejecutar, args=(i, peticion)) for i, peticion in enumerate(peticiones)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return respuestas
+
+
+class AgendadoConcurrenteTests(TransactionTestCase):
+    """
+    Solicitudes simultáneas para el mismo médico y horario (RF-013): la restricción
+    cita_unica_slot_activo_por_medico deja una sola cita activa por slot y los perdedores
+    reciben la respuesta de slot ocupado o el siguiente slot libre, nunca un 500.
+    """
+
+    def setUp(self):
+        invalidar_padron_mg()
+        self.medico = crear_medico('MG-001')
+        # Una agenda con un único slot de 30 minutos, el día de la semana de mañana
+        self.manana = timezone.localdate() + timedelta(days=1)
+        self.agenda = Agenda.objects.create(medico=self.medico, dia=self.manana.weekday(), hora_inicio=time(9, 0),
+                                            hora_fin=time(9, 30), consultorio='C-01')
+        self.pacientes = crear_pacientes(HILOS)
+
+    def tearDown(self):
+        invalidar_padron_mg()
+
+    def assertUnaCitaActivaPorSlot(self):
+        activas = list(Cita.objects.filter(estado__in=ESTADOS_ACTIVOS).values_list('medico_id', 'fecha_hora'))
+        self.assertEqual(len(activas), len(set(activas)))
+
+    def test_solicitar_concurrente(self):
+        respuestas = en_paralelo([
+            lambda paciente=paciente: APIClient().post('/api/agenda/solicitar/', {'paciente_id': paciente.id},
+                                                       format='json')
+            for paciente in self.pacientes
+        ])
+
+        # El horizonte de búsqueda contiene el día de la agenda dos veces: hay dos slots para repartir
+        codigos = sorted(respuesta.status_code for respuesta in respuestas)
+        self.assertEqual(codigos, [201] * 2 + [404] * (HILOS - 2))
+        for respuesta in respuestas:
+            if respuesta.status_code == 404:
+                self.assertEqual(respuesta.json()['error'], 'E-P02')
+        self.assertEqual(Cita.objects.filter(estado__in=ESTADOS_ACTIVOS).count(), 2)
+        self.assertUnaCitaActivaPorSlot()
+
+    def test_slot_elegido_concurrente(self):
+        slot = timezone.make_aware(datetime.combine(self.manana, time(9, 0)))
+        respuestas = en_paralelo([
+            lambda paciente=paciente: APIClient().post('/api/agenda/crear_elegido/', {
+                'paciente_id': paciente.id, 'agenda_id': self.agenda.id, 'fecha_hora': slot.isoformat(),
+            }, format='json')
+            for paciente in self.pacientes
+        ])
+
+        codigos = sorted(respuesta.status_code for respuesta in respuestas)
+        self.assertEqual(codigos, [201] + [400] * (HILOS - 1))
+        for respuesta in respuestas:
+            if respuesta.status_code == 400:
+                self.assertEqual(respuesta.json(), {'non_field_errors': ['Slot ya ocupado.']})
+        self.assertEqual(Cita.objects.get(estado__in=ESTADOS_ACTIVOS).fecha_hora, slot)
+        self.assertUnaCitaActivaPorSlot()
+
+
+class InventarioSlotsTests(TestCase):
+    """ El inventario materializado sigue a las Agendas y no repite inserciones fallidas. """
+
+    def setUp(self):
+        invalidar_padron_mg()
+        self.medico = crear_medico('MG-002')
+        self.manana = timezone.localdate() + timedelta(days=1)
+        self.agenda = Agenda.objects.create(medico=self.medico, dia=self.manana.weekday(), hora_inicio=time(8, 0),
+                                            hora_fin=time(9, 0), consultorio='C-02')
+        self.paciente, self.otro_paciente = crear_pacientes(2)
+        generar_inventario()
+
+    def tearDown(self):
+        invalidar_padron_mg()
+
+    def a_las(self, hora):
+        return timezone.make_aware(datetime.combine(self.manana, hora))
+
+    def test_cambio_de_horario_regenera_slots(self):
+        self.agenda.hora_inicio, self.agenda.hora_fin = time(13, 0), time(14, 0)
+        self.agenda.save()
+
+        horas = {timezone.localtime(fecha_hora).time() for fecha_hora in Slot.objects.values_list('fecha_hora', flat=True)}
+        self.assertEqual(horas, {time(13, 0), time(13, 30)})
+
+        respuesta = self.client.post('/api/agenda/solicitar/', {'paciente_id': self.paciente.id},
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        cita = Cita.objects.get(id=respuesta.json()['cita_id'])
+        self.assertEqual(cita.fecha_hora, self.a_las(time(13, 0)))
+        self.assertTrue(agenda_contiene_slot(self.agenda, cita.fecha_hora))
+
+    def test_eliminar_agenda_elimina_sus_slots(self):
+        self.agenda.delete()
+        self.assertFalse(Slot.objects.exists())
+
+    def test_slot_desfasado_se_enlaza_a_la_cita_que_lo_ocupa(self):
+        # Cita activa creada sin pasar por el inventario (p. ej. con update() o desde otra réplica)
+        ocupante = Cita(agenda=self.agenda, medico=self.medico, paciente=self.otro_paciente,
+                        fecha_hora=self.a_las(time(8, 0)), tipo_cita='MG')
+        Cita.objects.bulk_create([ocupante])
+        slot = Slot.objects.get(fecha_hora=self.a_las(time(8, 0)))
+        self.assertIsNone(slot.cita_id)
+
+        self.assertIsNone(autoasignar_desde_inventario(self.paciente))
+        slot.refresh_from_db()
+        self.assertEqual(slot.cita_id, ocupante.id)
+
+        # La siguiente solicitud ya no lo intenta: toma el siguiente slot libre del inventario
+        cita = autoasignar_desde_inventario(self.paciente)
+        self.assertEqual(cita.fecha_hora, self.a_las(time(8, 30)))
+
+
+def con_competencia(paciente_id, veces):
+    """
+    DisponibilidadMG en la que otra solicitud toma el primer slot libre justo después de cada una de
+    las primeras `veces` fotografías: el bulk_create del lote choca con la restricción única.
+    """
+    class DisponibilidadConCompetencia(DisponibilidadMG):
+        restantes = veces
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if DisponibilidadConCompetencia.restantes:
+                DisponibilidadConCompetencia.restantes -= 1
+                agenda, slot = next(self.slots_libres())
+                Cita.objects.create(agenda=agenda, paciente_id=paciente_id, fecha_hora=slot, tipo_cita='MG')
+
+    return mock.patch('agenda.views.DisponibilidadMG', DisponibilidadConCompetencia)
+
+
+class SolicitudCitaLoteTests(TestCase):
+    """ Solicitud masiva de citas MG: un resultado por paciente y 207 si alguno falló. """
+
+    def setUp(self):
+        invalidar_padron_mg()
+        self.medico = crear_medico('MG-005')
+        # Dos slots por día; el horizonte contiene el día de la agenda dos veces: cuatro slots en total
+        dia = (timezone.localdate() + timedelta(days=1)).weekday()
+        Agenda.objects.create(medico=self.medico, dia=dia, hora_inicio=time(9, 0), hora_fin=time(10, 0),
+                              consultorio='C-05')
+        self.pacientes = [paciente.id for paciente in crear_pacientes(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(Personal.objects.create_user('RE-005', password='x', rol='ADMIN_RECEPCION'))
+
+    def tearDown(self):
+        invalidar_padron_mg()
+
+    def solicitar(self, pacientes_ids):
+        return self.client.post('/api/agenda/solicitar/lote/', {'pacientes_ids': pacientes_ids}, format='json')
+
+    def errores(self, resultados):
+        return [resultado.get('error') for resultado in resultados]
+
+    def test_todas_asignadas(self):
+        respuesta = self.solicitar(self.pacientes[:2])
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['asignadas'], 2)
+        self.assertEqual(Cita.objects.filter(paciente_id__in=self.pacientes[:2]).count(), 2)
+        self.assertUnaCitaActivaPorSlot()
+
+    def test_pacientes_inexistentes_y_repetidos(self):
+        respuesta = self.solicitar([self.pacientes[0], 999999, self.pacientes[0], self.pacientes[1]])
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual(respuesta.json()['fallidas'], 2)
+        self.assertEqual(self.errores(respuesta.json()['resultados']), [None, 'E-P01', 'E-P05', None])
+
+    def test_slots_agotados(self):
+        respuesta = self.solicitar(self.pacientes)
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual(self.errores(respuesta.json()['resultados']), [None] * 4 + ['E-P02'])
+        self.assertUnaCitaActivaPorSlot()
+
+    def test_reintento_tras_conflicto(self):
+        competidor = self.pacientes.pop()
+        with con_competencia(competidor, veces=1):
+            resultados = autoasignar_citas_lote(self.pacientes[:2])
+
+        self.assertEqual(self.errores(resultados), [None, None])
+        # Se recalculó sobre una fotografía nueva: ninguna cita del lote cae en el slot del competidor
+        ocupado = Cita.objects.get(paciente_id=competidor).fecha_hora
+        asignadas = Cita.objects.filter(paciente_id__in=self.pacientes[:2]).values_list('fecha_hora', flat=True)
+        self.assertNotIn(ocupado, asignadas)
+        self.assertUnaCitaActivaPorSlot()
+
+    def test_reintentos_agotados(self):
+        competidor = self.pacientes.pop()
+        with con_competencia(competidor, veces=3):
+            resultados = autoasignar_citas_lote([999999, self.pacientes[0], self.pacientes[0]], intentos=3)
+
+        # Solo el paciente con cita propuesta recibe el conflicto; los demás conservan su resultado
+        self.assertEqual(self.errores(resultados), ['E-P01', 'E-P06', 'E-P05'])
+        self.assertFalse(Cita.objects.filter(paciente_id=self.pacientes[0]).exists())
+
+    def assertUnaCitaActivaPorSlot(self):
+        activas = list(Cita.objects.filter(estado__in=ESTADOS_ACTIVOS).values_list('medico_id', 'fecha_hora'))
+        self.assertEqual(len(activas), len(set(activas)))
+
+
+class EstrategiasAsignacionTests(TestCase):
+    """
+    Orden en que cada estrategia reparte los slots entre dos médicos con carga desigual:
+    A tiene dos citas (las más antiguas) y B una (la más reciente).
+    """
+
+    def setUp(self):
+        invalidar_padron_mg()
+        self.manana = timezone.localdate() + timedelta(days=1)
+        self.a, self.b = crear_medico('MG-010'), crear_medico('MG-011')
+        self.agendas = {
+            medico.id: Agenda.objects.create(medico=medico, dia=self.manana.weekday(), hora_inicio=inicio,
+                                             hora_fin=fin, consultorio=medico.numero_empleado)
+            for medico, inicio, fin in ((self.a, time(9, 0), time(11, 0)), (self.b, time(10, 0), time(12, 0)))
+        }
+        self.paciente = crear_pacientes(1)[0]
+
+    def tearDown(self):
+        invalidar_padron_mg()
+
+    def agendar(self, medico, hora):
+        Cita.objects.create(agenda=self.agendas[medico.id], paciente=self.paciente, tipo_cita='MG',
+                            fecha_hora=timezone.make_aware(datetime.combine(self.manana, hora)))
+
+    def con_carga_desigual(self):
+        self.agendar(self.a, time(9, 0))
+        self.agendar(self.a, time(9, 30))
+        self.agendar(self.b, time(10, 0))
+
+    def asignar(self, estrategia, n=4):
+        """ Los primeros `n` slots que da la estrategia, ocupándolos como lo hace la autoasignación. """
+        disponibilidad = DisponibilidadMG()
+        candidatos = estrategia.candidatos(disponibilidad)
+        asignados = []
+        for _ in range(n):
+            agenda, slot = next(candidatos)
+            disponibilidad.ocupar(agenda.medico_id, slot)
+            asignados.append((agenda.medico_id, timezone.localtime(slot).time()))
+        return asignados
+
+    def test_menor_carga(self):
+        self.con_carga_desigual()
+        # B (30 min) antes que A (60 min); con la misma carga gana el slot más próximo
+        self.assertEqual(self.asignar(MenorCarga()), [
+            (self.b.id, time(10, 30)), (self.a.id, time(10, 0)), (self.b.id, time(11, 0)), (self.a.id, time(10, 30)),
+        ])
+
+    def test_round_robin(self):
+        self.con_carga_desigual()
+        # A tuvo su última cita antes que B, aunque tenga más carga; después se alternan
+        self.assertEqual(self.asignar(RoundRobin()), [
+            (self.a.id, time(10, 0)), (self.b.id, time(10, 30)), (self.a.id, time(10, 30)), (self.b.id, time(11, 0)),
+        ])
+
+    def test_empates_por_slot_mas_proximo(self):
+        for estrategia in (MenorCarga(), RoundRobin(), PrimerSlotLibre()):
+            self.assertEqual(self.asignar(estrategia, n=1), [(self.a.id, time(9, 0))])
+
+
+class OpcionesCitaTests(TestCase):
+    """ Paginación de /api/agenda/opciones/ con el cursor (fecha_hora, agenda_id). """
+
+    def setUp(self):
+        invalidar_padron_mg()
+        dia = (timezone.localdate() + timedelta(days=1)).weekday()
+        # Dos médicos con slots a las mismas horas: los empates se desempatan por la agenda
+        for numero in ('MG-003', 'MG-004'):
+            Agenda.objects.create(medico=crear_medico(numero), dia=dia, hora_inicio=time(9, 0),
+                                  hora_fin=time(10, 0), consultorio=numero)
+
+    def tearDown(self):
+        invalidar_padron_mg()
+
+    def test_paginar_no_omite_slots_de_la_misma_hora(self):
+        todas = self.client.get('/api/agenda/opciones/', {'limite': 50}).json()
+        vistas, parametros = [], {'limite': 3}
+        while len(vistas) < len(todas):
+            respuesta = self.client.get('/api/agenda/opciones/', parametros)
+            self.assertEqual(respuesta.status_code, 200)
+            vistas += respuesta.json()
+            parametros = {'limite': 3, 'desde': respuesta['X-Siguiente-Desde'],
+                          'desde_agenda': respuesta['X-Siguiente-Desde-Agenda']}
+
+        self.assertEqual(vistas, todas)
+        # La página cortó entre las dos agendas de las 09:30 y la siguiente empieza por la segunda
+        self.assertEqual([opcion['fecha_hora'][11:16] for opcion in vistas[2:4]], ['09:30', '09:30'])
+
+
+@skipUnless(connection.vendor == 'postgresql', "El índice parcial y EXPLAIN se comprueban en PostgreSQL")
+class IndiceCitasActivasTests(TestCase):
+    """ La consulta de citas activas por médico usa el índice parcial de cita_unica_slot_activo_por_medico. """
+
+    def test_citas_activas_usa_indice_parcial(self):
+        desde, hasta = ventana_busqueda(timezone.localdate() + timedelta(days=1))
+        with connection.cursor() as cursor:
+            # Con la tabla casi vacía el planificador preferiría un Seq Scan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = citas_activas([1, 2, 3], desde, hasta).values_list('medico_id', 'fecha_hora').explain()
+        self.assertIn('cita_unica_slot_activo_por_medico', plan)
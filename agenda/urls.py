@@ -1,12 +1,15 @@
 # agenda/urls.py
 from django.urls import path
-from .views import (AutoAsignarCitaAPIView, CancelarCitaAPIView, ReagendarCitaAPIView, CitasPacienteListAPIView, 
+from .views import (AutoAsignarCitaAPIView, AutoAsignarCitaLoteAPIView, CancelarCitaAPIView, ReagendarCitaAPIView, CitasPacienteListAPIView, 
                     OpcionesCitaListAPIView, CrearCitaSlotElegidoAPIView)
 
 urlpatterns = [
     # /api/agenda/solicitar/ -> POST: Autoasignación de Cita MG
     path('solicitar/', AutoAsignarCitaAPIView.as_view(), name='cita-auto-asignar'),
 
+    # /api/agenda/solicitar/lote/ -> POST: Autoasignación masiva de Citas MG (call center, campañas)
+    path('solicitar/lote/', AutoAsignarCitaLoteAPIView.as_view(), name='cita-auto-asignar-lote'),
+
     # /api/agenda/cancelar/ -> POST: Cancelar Cita MG
     path('cancelar/', CancelarCitaAPIView.as_view(), name='cita-cancelar'),
 
@@ -1,132 +1,205 @@
 from django.shortcuts import render
 
 from rest_framework import generics, permissions, status
+from rest_framework import serializers
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import Q, F
 from django.utils import timezone
-from datetime import timedelta, time, datetime
-import calendar
+from django.utils.decorators import method_decorator
+from datetime import timedelta
 
-from personal.models import Personal, Especialista
 from expediente.models import Paciente
-from .models import Agenda, Cita
-from .serializers import SolicitudCitaSerializer, CancelarCitaSerializer, ReagendarCitaSerializer, CitaReadSerializer, SlotSeleccionadoSerializer
+from expediente.pagination import CitaCursorPagination
+from expediente.versiones import historial_versionado, incrementar_version
+from hospital_project.proyecciones import ListadoProyectadoMixin
+from hospital_project.renderers import RENDERERS_LISTADOS
+from personal.permissions import IsDoctorOrAdmin
+from .models import Agenda, Cita, Slot
+from .disponibilidad import DIAS_A_BUSCAR, DisponibilidadMG, ventana_busqueda
+from .estrategias import obtener_estrategia
+from .inventario import enlazar_citas_activas, reservar_primer_slot_libre, sincronizar_slots_lote
+from .serializers import (SolicitudCitaSerializer, SolicitudCitaLoteSerializer, CancelarCitaSerializer, ReagendarCitaSerializer, CitaReadSerializer, SlotSeleccionadoSerializer,
+                          OpcionesCitaQuerySerializer, CitaReadProyeccion)
 
-def obtener_opciones_disponibles(min_options=3):
+def obtener_opciones_disponibles(min_options=3, despues_de=None):
     """
-    Genera una lista de slots de 30 minutos disponibles a partir de mañana,
+    Genera una lista de slots disponibles a partir de mañana (o estrictamente después del cursor
+    `despues_de` = (fecha_hora, agenda_id) de la última opción, para paginar hacia adelante),
     buscando en las agendas de los Médicos Generales (MG).
     """
-    opciones = []
-    hoy = timezone.now().date()
-    manana = hoy + timedelta(days=1)
-    
-    # Obtener IDs de Médicos Generales
-    medicos_generales_ids = Personal.objects.filter(rol='MEDICO').exclude(
-        id__in=Especialista.objects.values('medico_id')
-    ).values_list('id', flat=True)
-    
-    agendas_mg = Agenda.objects.filter(medico_id__in=medicos_generales_ids).order_by('dia')
+    manana = timezone.localdate() + timedelta(days=1)
+    fin_busqueda = manana + timedelta(days=DIAS_A_BUSCAR)
+
+    # Al paginar, la fotografía empieza en el día del cursor: los días anteriores no se vuelven a calcular
+    fecha_inicio = manana
+    if despues_de is not None:
+        fecha_inicio = max(manana, timezone.localtime(despues_de[0]).date())
+    disponibilidad = DisponibilidadMG(fecha_inicio=fecha_inicio, dias=max(0, (fin_busqueda - fecha_inicio).days))
     
-    if not agendas_mg.exists():
+    if not disponibilidad.hay_agendas():
         return False # No hay agendas configuradas
 
-    dias_a_buscar = 14 # Limitar la búsqueda a 2 semanas
-    for i in range(dias_a_buscar):
-        fecha_actual = manana + timedelta(days=i)
-        dia_semana_num = fecha_actual.weekday()
-
-        agendas_del_dia = agendas_mg.filter(dia=dia_semana_num)
-
-        for agenda in agendas_del_dia:
-            inicio_bloque = timezone.make_aware(datetime.combine(fecha_actual, agenda.hora_inicio))
-            fin_bloque = timezone.make_aware(datetime.combine(fecha_actual, agenda.hora_fin))
-            
-            slot_actual = inicio_bloque
-            while slot_actual + timedelta(minutes=30) <= fin_bloque:
-                
-                # Criterio de Disponibilidad: SOLO si NO está PENDIENTE o CONFIRMADA
-                cita_ocupada = Cita.objects.filter(
-                    fecha_hora=slot_actual,
-                    agenda__medico=agenda.medico,
-                    estado__in=['PENDIENTE', 'CONFIRMADA']
-                ).exists()
-                
-                if not cita_ocupada:
-                    # Slot disponible encontrado
-                    opciones.append({
-                        "agenda_id": agenda.id,
-                        "medico_nombre": agenda.medico.get_full_name(),
-                        "consultorio": agenda.consultorio,
-                        "fecha_hora": slot_actual.strftime("%Y-%m-%d %H:%M:%S")
-                    })
-                    
-                    # Devolvemos un mínimo de opciones para la UI (RB-005 sugiere >3)
-                    if len(opciones) >= min_options:
-                        return opciones 
-                        
-                slot_actual += timedelta(minutes=30)
+    opciones = []
+    for agenda, slot in disponibilidad.slots_libres(despues_de=despues_de):
+        opciones.append({
+            "agenda_id": agenda.id,
+            "medico_nombre": agenda.medico.get_full_name(),
+            "consultorio": agenda.consultorio,
+            "fecha_hora": slot.strftime("%Y-%m-%d %H:%M:%S")
+        })
+        
+        # Devolvemos un mínimo de opciones para la UI (RB-005 sugiere >3); el generador
+        # se detiene aquí sin calcular el resto de la ventana.
+        if len(opciones) >= min_options:
+            break
                 
     return opciones # Devuelve todas las opciones si no alcanzó el mínimo
 
-def intentar_autoasignar_cita(paciente_id):
+def autoasignar_desde_inventario(paciente):
+    """
+    Camino rápido: toma el primer slot libre del inventario materializado (una consulta indexada).
+    Devuelve la Cita creada, o None si el inventario no tiene slots o está desfasado.
+    """
+    desde, hasta = ventana_busqueda(timezone.localdate() + timedelta(days=1))
+    slot = None
+    try:
+        with transaction.atomic():
+            slot = reservar_primer_slot_libre(desde, hasta)
+            if slot is not None:
+                return Cita.objects.create(
+                    agenda=slot.agenda,
+                    paciente=paciente,
+                    # Hora local, igual que los slots calculados desde las Agendas
+                    fecha_hora=timezone.localtime(slot.fecha_hora),
+                    tipo_cita='MG',
+                    estado='PENDIENTE'
+                )
+    except IntegrityError:
+        # Inventario desfasado respecto a las citas: se enlaza el slot con la cita activa que lo ocupa,
+        # para que las siguientes solicitudes no lo vuelvan a intentar, y se continúa con el cálculo
+        # desde las Agendas
+        enlazar_citas_activas(Slot.objects.filter(pk=slot.pk))
+    return None
+
+def intentar_autoasignar_cita(paciente_id, estrategia=None):
     """
-    Contiene la lógica central de búsqueda del primer slot MG disponible.
-    Devuelve un Response (201, 404) simulado o el objeto Cita si es exitoso.
+    Contiene la lógica central de búsqueda del slot MG a asignar, según la estrategia
+    configurada (por defecto, el primer slot disponible).
+    Devuelve False si no hay agendas MG, None si no hay slots o el objeto Cita si es exitoso.
     """
     paciente = Paciente.objects.get(id=paciente_id)
+    estrategia = estrategia or obtener_estrategia()
     
-    hoy = timezone.now().date()
-    manana = hoy + timedelta(days=1)
-    
-    # Obtener Agendas de MÉDICOS GENERALES (MG)
-    medicos_generales_ids = Personal.objects.filter(rol='MEDICO').exclude(
-        id__in=Especialista.objects.values('medico_id')
-    ).values_list('id', flat=True)
-    
-    agendas_mg = Agenda.objects.filter(medico_id__in=medicos_generales_ids).order_by('dia')
+    # 1. El inventario materializado solo sirve para la estrategia del primer slot libre
+    if estrategia.usa_inventario:
+        nueva_cita = autoasignar_desde_inventario(paciente)
+        if nueva_cita is not None:
+            return nueva_cita
+
+    # 2. Otra estrategia, o inventario sin generar/agotado: fotografía de disponibilidad
+    #    Agendas MG + citas activas de la ventana (2 consultas)
+    disponibilidad = DisponibilidadMG()
     
-    if not agendas_mg.exists():
-        return Response({"error": "E-P02", "message": "No hay agendas de Medicina General configuradas."}, status=status.HTTP_404_NOT_FOUND)
-
-    # Iterar día por día
-    dias_a_buscar = 14
-    for i in range(dias_a_buscar):
-        fecha_actual = manana + timedelta(days=i)
-        dia_semana_num = fecha_actual.weekday()
-        agendas_del_dia = agendas_mg.filter(dia=dia_semana_num)
-
-        for agenda in agendas_del_dia:
-            inicio_bloque = timezone.make_aware(datetime.combine(fecha_actual, agenda.hora_inicio))
-            fin_bloque = timezone.make_aware(datetime.combine(fecha_actual, agenda.hora_fin))
-            
-            # Generar slots de 30 minutos
-            slot_actual = inicio_bloque
-            while slot_actual + timedelta(minutes=30) <= fin_bloque:
-                
-                cita_existente = Cita.objects.filter(
-                    fecha_hora=slot_actual,
-                    agenda__medico=agenda.medico,
-                    estado__in=['PENDIENTE', 'CONFIRMADA']
-                ).exists()
-                
-                if not cita_existente:
-                    # ¡Slot encontrado! Crear la cita.
-                    nueva_cita = Cita.objects.create(
-                        agenda=agenda,
-                        paciente=paciente,
-                        fecha_hora=slot_actual,
-                        tipo_cita='MG',
-                        estado='PENDIENTE'
-                    )
-                    # Devolvemos la Cita para procesarla en la vista
-                    return nueva_cita 
-                        
-                slot_actual += timedelta(minutes=30)
+    if not disponibilidad.hay_agendas():
+        return False
+
+    for agenda, slot in estrategia.candidatos(disponibilidad):
+        try:
+            # ¡Slot encontrado! Crear la cita. La restricción única (médico, fecha_hora)
+            # de citas activas garantiza que dos solicitudes simultáneas no tomen el mismo slot.
+            with transaction.atomic():
+                nueva_cita = Cita.objects.create(
+                    agenda=agenda,
+                    paciente=paciente,
+                    fecha_hora=slot,
+                    tipo_cita='MG',
+                    estado='PENDIENTE'
+                )
+        except IntegrityError:
+            # Otra solicitud ganó este slot después de tomar la fotografía: probar con el siguiente
+            disponibilidad.ocupar(agenda.medico_id, slot)
+            continue
+        # Devolvemos la Cita para procesarla en la vista
+        return nueva_cita
 
     # Si no se encuentra slot
     return None
 
+def autoasignar_citas_lote(pacientes_ids, estrategia=None, intentos=3):
+    """
+    Asigna a cada paciente el siguiente slot MG libre (según la estrategia configurada) en una sola
+    pasada sobre una fotografía de disponibilidad, y escribe todas las citas con un bulk_create
+    en una transacción.
+    Devuelve False si no hay agendas MG, o la lista de resultados (uno por paciente, en orden).
+    Errores por paciente: E-P01 (no existe), E-P05 (repetido en el lote), E-P02 (sin slots) y
+    E-P06 (conflicto de concurrencia tras agotar los reintentos).
+    """
+    estrategia = estrategia or obtener_estrategia()
+    existentes = set(Paciente.objects.filter(id__in=pacientes_ids).values_list('id', flat=True))
+
+    for _ in range(intentos):
+        disponibilidad = DisponibilidadMG()
+        if not disponibilidad.hay_agendas():
+            return False
+
+        slots_libres = estrategia.candidatos(disponibilidad)
+        resultados = []
+        nuevas_citas = []
+        vistos = set()
+        for paciente_id in pacientes_ids:
+            if paciente_id not in existentes:
+                resultados.append({"paciente_id": paciente_id, "error": "E-P01", "message": "Paciente no encontrado."})
+                continue
+            if paciente_id in vistos:
+                resultados.append({"paciente_id": paciente_id, "error": "E-P05", "message": "Paciente duplicado en el lote."})
+                continue
+            vistos.add(paciente_id)
+
+            siguiente = next(slots_libres, None)
+            if siguiente is None:
+                resultados.append({"paciente_id": paciente_id, "error": "E-P02", "message": "No se encontraron slots disponibles para la cita."})
+                continue
+
+            agenda, slot = siguiente
+            disponibilidad.ocupar(agenda.medico_id, slot)
+            cita = Cita(agenda=agenda, medico_id=agenda.medico_id, paciente_id=paciente_id,
+                        fecha_hora=slot, tipo_cita='MG', estado='PENDIENTE')
+            nuevas_citas.append(cita)
+            resultados.append(cita)
+
+        try:
+            with transaction.atomic():
+                # bulk_create no llama a save() ni emite post_save: el médico ya viene asignado
+                # y el inventario de slots se sincroniza explícitamente.
+                Cita.objects.bulk_create(nuevas_citas)
+                sincronizar_slots_lote(nuevas_citas)
+                incrementar_version(*(cita.paciente_id for cita in nuevas_citas))
+        except IntegrityError:
+            # Una solicitud concurrente tomó alguno de los slots: recalcular con una fotografía nueva
+            continue
+
+        return [
+            {
+                "paciente_id": resultado.paciente_id,
+                "cita_id": resultado.id,
+                "fecha_hora": resultado.fecha_hora.strftime("%Y-%m-%d %H:%M"),
+                "medico": resultado.agenda.medico.get_full_name(),
+                "consultorio": resultado.agenda.consultorio
+            } if isinstance(resultado, Cita) else resultado
+            for resultado in resultados
+        ]
+
+    # Sin más reintentos: solo los pacientes con cita propuesta fallan por el conflicto;
+    # los demás conservan su propio resultado (E-P01, E-P05, E-P02)
+    return [
+        {"paciente_id": resultado.paciente_id, "error": "E-P06", "message": "Conflicto de concurrencia. Intente de nuevo."}
+        if isinstance(resultado, Cita) else resultado
+        for resultado in resultados
+    ]
+
 class AutoAsignarCitaAPIView(generics.CreateAPIView):
     """
     API para la Solicitud de Cita (CU-PAC-002).
@@ -158,6 +231,31 @@ class AutoAsignarCitaAPIView(generics.CreateAPIView):
             # Si nueva_cita es None
             return Response({"error": "E-P02", "message": "No se encontraron slots disponibles para la cita."}, status=status.HTTP_404_NOT_FOUND)
 
+class AutoAsignarCitaLoteAPIView(generics.CreateAPIView):
+    """
+    API para la Solicitud Masiva de Citas MG (call center y campañas de vacunación).
+    Responde 201 si todas se asignaron, o 207 con el resultado de cada paciente si hubo fallos parciales.
+    """
+    serializer_class = SolicitudCitaLoteSerializer
+    permission_classes = [permissions.IsAuthenticated, IsDoctorOrAdmin]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        resultados = autoasignar_citas_lote(serializer.validated_data['pacientes_ids'])
+
+        if resultados is False:
+            return Response({"error": "E-P02", "message": "No hay agendas de Medicina General configuradas."}, status=status.HTTP_404_NOT_FOUND)
+
+        asignadas = sum(1 for resultado in resultados if "cita_id" in resultado)
+        return Response({
+            "message": f"{asignadas} de {len(resultados)} citas asignadas automáticamente.",
+            "asignadas": asignadas,
+            "fallidas": len(resultados) - asignadas,
+            "resultados": resultados
+        }, status=status.HTTP_201_CREATED if asignadas == len(resultados) else status.HTTP_207_MULTI_STATUS)
+
 class CancelarCitaAPIView(generics.UpdateAPIView):
     """
     API para la Cancelación de Cita (CU-PAC-004).
@@ -230,33 +328,52 @@ class ReagendarCitaAPIView(generics.CreateAPIView):
                 "cita_original_id": cita_id
             }, status=status.HTTP_202_ACCEPTED)
 
-class CitasPacienteListAPIView(generics.ListAPIView):
+# Las citas forman parte de la versión del expediente del paciente
+@method_decorator(historial_versionado, name='get')
+class CitasPacienteListAPIView(ListadoProyectadoMixin, generics.ListAPIView):
     """
     API para listar todas las citas de un paciente específico (CU-PAC-003).
     """
     serializer_class = CitaReadSerializer
+    proyeccion = CitaReadProyeccion()
+    renderer_classes = RENDERERS_LISTADOS
     # NOTA: Solo pacientes autenticados/logeados (sin token) pueden ver esto.
     # Dado que el Paciente se autentica por CURP, mantenemos AllowAny, 
     # pero el frontend debe pasar el ID.
     permission_classes = [permissions.AllowAny] 
+    pagination_class = CitaCursorPagination
 
     def get_queryset(self):
+        # El orden cronológico lo fija la paginación por cursor
         paciente_id = self.kwargs['paciente_id']
-        return Cita.objects.filter(paciente_id=paciente_id).order_by('fecha_hora')
+        # consultorio y medico_nombre salen de la Agenda y su médico: se traen por JOIN
+        return Cita.objects.filter(paciente_id=paciente_id).select_related('agenda__medico')
 
 class OpcionesCitaListAPIView(generics.ListAPIView):
     """
     API para devolver las opciones de slots disponibles para reagendar (RB-005).
+    Para ver más opciones, se pide la siguiente página con ?desde=<fecha_hora de la última opción>
+    &desde_agenda=<agenda_id de la última opción> (también se envían en los encabezados
+    X-Siguiente-Desde y X-Siguiente-Desde-Agenda). La agenda desempata los slots de la misma hora.
     """
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, *args, **kwargs):
-        opciones = obtener_opciones_disponibles(min_options=5)
+        parametros = OpcionesCitaQuerySerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+
+        opciones = obtener_opciones_disponibles(
+            min_options=parametros.validated_data.get('limite', settings.AGENDA_OPCIONES_MINIMAS),
+            despues_de=parametros.validated_data.get('cursor')
+        )
         
         if not opciones or opciones is False:
             return Response({"error": "E-P02", "message": "No hay slots de Medicina General disponibles."}, status=status.HTTP_404_NOT_FOUND)
         
-        return Response(opciones, status=status.HTTP_200_OK)
+        return Response(opciones, status=status.HTTP_200_OK, headers={
+            'X-Siguiente-Desde': opciones[-1]['fecha_hora'],
+            'X-Siguiente-Desde-Agenda': str(opciones[-1]['agenda_id']),
+        })
 
 class CrearCitaSlotElegidoAPIView(generics.CreateAPIView):
     """
@@ -272,14 +389,19 @@ class CrearCitaSlotElegidoAPIView(generics.CreateAPIView):
         paciente = Paciente.objects.get(id=data['paciente_id'])
         agenda = Agenda.objects.get(id=data['agenda_id'])
         
-        # Crear la cita final (tipo MG)
-        nueva_cita = Cita.objects.create(
-            agenda=agenda,
-            paciente=paciente,
-            fecha_hora=data['fecha_hora'],
-            tipo_cita='MG',
-            estado='PENDIENTE' 
-        )
+        # Crear la cita final (tipo MG). Si otra solicitud tomó el slot entre la validación
+        # y la escritura, la restricción única de la BD lo detecta.
+        try:
+            with transaction.atomic():
+                nueva_cita = Cita.objects.create(
+                    agenda=agenda,
+                    paciente=paciente,
+                    fecha_hora=data['fecha_hora'],
+                    tipo_cita='MG',
+                    estado='PENDIENTE' 
+                )
+        except IntegrityError:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["Slot ya ocupado."]})
         return nueva_cita
     
     def post(self, request, *args, **kwargs):
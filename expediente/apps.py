@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ExpedienteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expediente'
+
+    def ready(self):
+        # Registrar los receptores de señales (índice de búsqueda de pacientes)
+        from . import signals  # noqa: F401
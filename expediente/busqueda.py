@@ -0,0 +1,109 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, FloatField, Func, IntegerField, Q, Value, When
+
+from hospital_project.cache import CacheTTL
+from .models import Paciente, PacienteToken
+from .normalizacion import normalizar_busqueda, normalizar_curp
+
+# CURP -> datos públicos del paciente, para el login del paciente (CU-PAC-001).
+# Se invalida con señales al guardar o eliminar un Paciente (ver expediente/signals.py).
+cache_curp = CacheTTL(
+    'pacientes_curp',
+    ttl=settings.PACIENTES_CACHE_CURP_TTL,
+    max_entradas=settings.PACIENTES_CACHE_CURP_MAX_ENTRADAS,
+    backend=settings.PACIENTES_CACHE_CURP_BACKEND,
+)
+
+
+def usa_trigramas():
+    """ La búsqueda por trigramas (pg_trgm) solo existe en PostgreSQL. """
+    return connection.vendor == 'postgresql'
+
+
+def actualizar_tokens(paciente):
+    """ Reconstruye el índice de tokens de un paciente (búsqueda en BD sin pg_trgm). """
+    PacienteToken.objects.filter(paciente=paciente).delete()
+    tokens = set(paciente.busqueda_normalizada.split())
+    PacienteToken.objects.bulk_create([PacienteToken(paciente=paciente, token=token[:100]) for token in tokens])
+
+
+class Similitud(Func):
+    """ similarity(a, b) de pg_trgm: 0 (nada en común) a 1 (idénticos). """
+    function = 'SIMILARITY'
+    output_field = FloatField()
+
+
+def buscar_pacientes(query, limite=None):
+    """
+    Busca pacientes por CURP, nombre, apellidos o número de expediente (id), sin distinguir
+    mayúsculas ni acentos. Devuelve un queryset ordenado por relevancia y limitado a `limite`.
+    """
+    limite = limite or settings.PACIENTES_BUSQUEDA_LIMITE
+    texto = normalizar_busqueda(query)
+    if not texto:
+        return Paciente.objects.none()
+
+    # El número de expediente se compara exacto y va primero
+    por_expediente = Q(id=int(texto)) if texto.isdigit() else Q(pk__in=[])
+    es_expediente = Case(When(por_expediente, then=Value(1)), default=Value(0), output_field=IntegerField())
+
+    # En ambos motores cada palabra de la búsqueda, en cualquier orden, debe ser prefijo de alguna
+    # palabra del paciente: 'perez juan' encuentra a 'Juan Pérez'
+    palabras = texto.split()
+
+    if usa_trigramas():
+        # Una expresión regular por palabra sobre la columna normalizada; pg_trgm también resuelve
+        # los operadores ~ con el índice GIN (gin_trgm_ops). La similitud del texto completo da el orden.
+        coincidencias = Q()
+        for palabra in palabras:
+            coincidencias &= Q(busqueda_normalizada__regex=r'(^| )' + re.escape(palabra))
+        return (
+            Paciente.objects.filter(coincidencias | por_expediente)
+            .annotate(es_expediente=es_expediente, rango=Similitud('busqueda_normalizada', Value(texto)))
+            .order_by('-es_expediente', '-rango', 'apellidos', 'id')[:limite]
+        )
+
+    # Sin pg_trgm, con el índice de tokens: el rango [palabra, palabra + U+FFFF) aprovecha el índice
+    # B-tree de PacienteToken.token.
+    coincidencias = Paciente.objects.all()
+    for palabra in palabras:
+        coincidencias = coincidencias.filter(id__in=PacienteToken.objects.filter(
+            token__gte=palabra, token__lt=palabra + '\uffff'
+        ).values('paciente_id'))
+
+    # Relevancia: primero quien coincide en más palabras completas (no solo prefijos)
+    return (
+        Paciente.objects.filter(Q(id__in=coincidencias.values('id')) | por_expediente)
+        .annotate(
+            es_expediente=es_expediente,
+            rango=Count('tokens', filter=Q(tokens__token__in=palabras), distinct=True)
+        )
+        .order_by('-es_expediente', '-rango', 'apellidos', 'nombre', 'id')[:limite]
+    )
+
+
+def paciente_por_curp(curp):
+    """
+    Devuelve {'id', 'CURP', 'nombre', 'apellidos'} del paciente con esa CURP, o None.
+    Igualdad exacta sobre el índice único (la CURP se guarda en mayúsculas) con cache delante.
+    Las CURP inexistentes no se guardan en cache: un paciente recién registrado puede entrar de inmediato.
+    """
+    curp = normalizar_curp(curp)
+    if not curp:
+        return None
+
+    datos = cache_curp.get(curp)
+    if datos is None:
+        datos = Paciente.objects.filter(CURP=curp).values('id', 'CURP', 'nombre', 'apellidos').first()
+        if datos is not None:
+            cache_curp.set(curp, datos)
+    return datos
+
+
+def invalidar_curp(*curps):
+    for curp in curps:
+        if curp:
+            cache_curp.delete(normalizar_curp(curp))
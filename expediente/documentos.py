@@ -0,0 +1,183 @@
+# expediente/documentos.py
+"""
+Documento de la receta (NOM-024, RB-012) en HTML y PDF, con cache en disco.
+
+Cada documento se guarda con un nombre derivado del hash de los datos de origen
+(RecetaDigital + DetalleMedicamento + Personal + Paciente): si los datos no cambian,
+el archivo ya existe y no se vuelve a generar; si cambian, el nombre cambia.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import textwrap
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+# Cambiar al modificar la plantilla o el generador de PDF: invalida todos los documentos ya generados
+VERSION_DOCUMENTO = 1
+
+FORMATOS = {
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+def datos_receta(receta):
+    """
+    Datos de origen del documento. Espera la receta con select_related('medico', 'paciente')
+    y prefetch_related('detalles').
+    """
+    fecha_emision = timezone.localtime(receta.fecha_emision)
+    paciente = receta.paciente
+    nacimiento = paciente.fecha_nacimiento
+    edad = fecha_emision.year - nacimiento.year - ((fecha_emision.month, fecha_emision.day) < (nacimiento.month, nacimiento.day))
+    return {
+        'folio': receta.id,
+        'fecha_emision': fecha_emision.strftime('%Y-%m-%d %H:%M'),
+        'diagnostico': receta.diagnostico,
+        'talla': str(receta.talla) if receta.talla is not None else None,
+        'peso': str(receta.peso) if receta.peso is not None else None,
+        'requiere_firma': receta.requiere_firma,
+        'medico': {
+            'nombre': receta.medico.get_full_name(),
+            'cedula_profesional': receta.medico.cedula_profesional,
+            'numero_empleado': receta.medico.numero_empleado,
+        },
+        'paciente': {
+            'expediente': paciente.id,
+            'nombre': f"{paciente.nombre} {paciente.apellidos}",
+            'CURP': paciente.CURP,
+            'edad': edad,
+        },
+        'detalles': [
+            {
+                'medicamento': d.medicamento,
+                'presentacion': d.presentacion,
+                'dosificacion': d.dosificacion,
+                'cantidad': d.cantidad,
+            }
+            for d in sorted(receta.detalles.all(), key=lambda d: d.id)
+        ],
+    }
+
+
+def huella(datos):
+    """ Hash de contenido de los datos de origen (se usa como nombre del archivo y como ETag). """
+    canonico = json.dumps([VERSION_DOCUMENTO, datos], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+
+def render_html(datos):
+    return render_to_string('expediente/receta.html', {'receta': datos}).encode('utf-8')
+
+
+def lineas_receta(datos):
+    """ Texto plano de la receta, línea por línea (para el PDF). """
+    medico, paciente = datos['medico'], datos['paciente']
+    lineas = [
+        "RECETA MÉDICA",
+        f"Folio: {datos['folio']}    Fecha de emisión: {datos['fecha_emision']}",
+        "",
+        f"Médico: {medico['nombre']}",
+        f"Cédula profesional: {medico['cedula_profesional'] or 'N/D'}    No. de empleado: {medico['numero_empleado']}",
+        "",
+        f"Paciente: {paciente['nombre']}    Edad: {paciente['edad']} años",
+        f"CURP: {paciente['CURP']}    Expediente: {paciente['expediente']}",
+        f"Talla: {datos['talla'] or 'N/D'} m    Peso: {datos['peso'] or 'N/D'} kg",
+        "",
+        f"Diagnóstico: {datos['diagnostico']}",
+        "",
+        "Medicamentos:",
+    ]
+    for i, detalle in enumerate(datos['detalles'], start=1):
+        lineas.append(f"{i}. {detalle['medicamento']} - {detalle['presentacion']} (cantidad: {detalle['cantidad']})")
+        lineas.extend(textwrap.wrap(f"Indicaciones: {detalle['dosificacion']}", 90, initial_indent='   ', subsequent_indent='   '))
+    if datos['requiere_firma']:
+        lineas += ["", "", "_______________________________", "Firma del médico"]
+
+    # Las líneas largas se parten para que quepan en la página
+    return [parte for linea in lineas for parte in (textwrap.wrap(linea, 95) or [''])]
+
+
+def _texto_pdf(texto):
+    """ Cadena literal de PDF en WinAnsiEncoding (fuentes estándar: cubre acentos y ñ). """
+    crudo = texto.encode('cp1252', errors='replace')
+    return b'(' + crudo.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def render_pdf(datos, lineas_por_pagina=54):
+    """ PDF mínimo (texto en Helvetica, tamaño carta) generado sin dependencias externas. """
+    lineas = lineas_receta(datos)
+    paginas = [lineas[i:i + lineas_por_pagina] for i in range(0, len(lineas), lineas_por_pagina)] or [[]]
+
+    # Objetos: 1 catálogo, 2 árbol de páginas, 3 fuente y, por página, la página y su contenido
+    objetos = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    }
+    paginas_ids = []
+    for n, lineas_pagina in enumerate(paginas):
+        pagina_id, contenido_id = 4 + 2 * n, 5 + 2 * n
+        paginas_ids.append(pagina_id)
+        contenido = b'BT /F1 10 Tf 14 TL 56 740 Td ' + b' '.join(
+            _texto_pdf(linea) + b" '" for linea in lineas_pagina
+        ) + b' ET'
+        objetos[contenido_id] = b'<< /Length %d >>\nstream\n%s\nendstream' % (len(contenido), contenido)
+        objetos[pagina_id] = (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % contenido_id
+        )
+    objetos[2] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % i for i in paginas_ids), len(paginas_ids))
+
+    salida = bytearray(b'%PDF-1.4\n')
+    posiciones = {}
+    for numero in sorted(objetos):
+        posiciones[numero] = len(salida)
+        salida += b'%d 0 obj\n%s\nendobj\n' % (numero, objetos[numero])
+    inicio_xref = len(salida)
+    salida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    for numero in sorted(objetos):
+        salida += b'%010d 00000 n \n' % posiciones[numero]
+    salida += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+
+RENDERIZADORES = {
+    'html': render_html,
+    'pdf': render_pdf,
+}
+
+
+def ruta_documento(clave, formato):
+    # Subdirectorio por los 2 primeros caracteres del hash para no acumular miles de archivos en uno solo
+    return Path(settings.RECETAS_DOCUMENTOS_DIR) / clave[:2] / f"{clave}.{formato}"
+
+
+def obtener_documento(datos, formato, clave=None):
+    """
+    Devuelve la ruta del documento en disco, generándolo solo si no existe.
+    La escritura es atómica (archivo temporal + rename): dos peticiones simultáneas
+    no dejan un archivo a medias.
+    """
+    clave = clave or huella(datos)
+    ruta = ruta_documento(clave, formato)
+    if ruta.exists():
+        return ruta
+
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    contenido = RENDERIZADORES[formato](datos)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+    return ruta
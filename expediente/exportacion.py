@@ -0,0 +1,134 @@
+# expediente/exportacion.py
+"""
+Exportación completa de registros clínicos (notas, recetas con sus medicamentos, citas y órdenes de
+referencia) para auditorías y reportes NOM, en NDJSON o CSV. Se recorre la tabla por id con un cursor
+(.iterator(chunk_size)) y se escribe por lotes: la memoria depende de EXPORTACION_CHUNK_SIZE, no del
+número de filas. Cada registro tiene la misma representación que en la API (ver las Proyeccion).
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+
+from agenda.models import Cita
+from agenda.serializers import CitaReadProyeccion
+from hospital_project.renderers import JSONRapidoRenderer
+from .models import NotaConsulta, OrdenReferencia, RecetaDigital
+from .serializers import (DetalleMedicamentoSerializer, NotaConsultaProyeccion, OrdenReferenciaProyeccion,
+                          RecetaDigitalProyeccion)
+
+
+class CitaExportacionProyeccion(CitaReadProyeccion):
+    """ Las citas de la API no llevan el paciente (se piden por paciente); en la exportación sí. """
+    columnas = (*CitaReadProyeccion.columnas, 'paciente_id', 'medico_id')
+
+    def fila(self, fila):
+        return {**super().fila(fila), 'paciente': fila['paciente_id'], 'medico': fila['medico_id']}
+
+
+# entidad -> (modelo, campo de fecha del filtro, proyección, lista anidada (nombre, campos) o None)
+ENTIDADES = {
+    'notas': (NotaConsulta, 'fecha_registro', NotaConsultaProyeccion(), None),
+    'recetas': (RecetaDigital, 'fecha_emision', RecetaDigitalProyeccion(),
+                ('detalles', DetalleMedicamentoSerializer.Meta.fields)),
+    'citas': (Cita, 'fecha_hora', CitaExportacionProyeccion(), None),
+    'ordenes': (OrdenReferencia, 'fecha_emision', OrdenReferenciaProyeccion(), None),
+}
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class ExportacionQuerySerializer(serializers.Serializer):
+    """ Parámetros de la exportación: qué registros, en qué formato y de qué rango de fechas. """
+    entidad = serializers.ChoiceField(choices=list(ENTIDADES))
+    formato = serializers.ChoiceField(choices=list(FORMATOS), default='ndjson')
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('desde') and data.get('hasta') and data['desde'] > data['hasta']:
+            raise serializers.ValidationError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+        return data
+
+
+def inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def lotes(entidad, desde=None, hasta=None, chunk_size=None):
+    """
+    Genera listas de registros ya representados, de `chunk_size` en `chunk_size`, con fecha entre
+    `desde` y `hasta` (ambos días incluidos, en la zona horaria local). Las recetas cargan los
+    medicamentos de cada lote en una sola consulta.
+    """
+    chunk_size = chunk_size or settings.EXPORTACION_CHUNK_SIZE
+    modelo, campo_fecha, proyeccion, _ = ENTIDADES[entidad]
+    queryset = modelo.objects.all()
+    if desde:
+        queryset = queryset.filter(**{f'{campo_fecha}__gte': inicio_del_dia(desde)})
+    if hasta:
+        queryset = queryset.filter(**{f'{campo_fecha}__lt': inicio_del_dia(hasta + timedelta(days=1))})
+
+    # Orden por la llave primaria: la BD entrega las filas según las lee, sin ordenar todo el rango antes
+    lote = []
+    for fila in proyeccion.consulta(queryset.order_by('id')).iterator(chunk_size=chunk_size):
+        lote.append(fila)
+        if len(lote) >= chunk_size:
+            yield proyeccion.representar(lote)
+            lote = []
+    if lote:
+        yield proyeccion.representar(lote)
+
+
+def ndjson(entidad, registros_por_lote):
+    """ Un objeto JSON por línea, con el mismo JSON que la API. """
+    renderer = JSONRapidoRenderer()
+    for lote in registros_por_lote:
+        yield b''.join(renderer.render(registro) + b'\n' for registro in lote)
+
+
+class _Eco:
+    """ Pseudo-archivo para csv.writer: devuelve la línea en lugar de escribirla. """
+    def write(self, valor):
+        return valor
+
+
+def csv_(entidad, registros_por_lote):
+    """
+    CSV con encabezado. La lista anidada (medicamentos de la receta) se aplana: una fila por elemento,
+    con los datos del registro repetidos y sus columnas con prefijo (detalles_medicamento, ...).
+    """
+    anidado = ENTIDADES[entidad][3]
+    escritor = csv.writer(_Eco())
+    encabezado = False
+    for lote in registros_por_lote:
+        lineas = []
+        for registro in lote:
+            elementos = registro.pop(anidado[0]) if anidado else None
+            if not encabezado:
+                columnas = list(registro)
+                if anidado:
+                    columnas += [f"{anidado[0]}_{campo}" for campo in anidado[1]]
+                lineas.append(escritor.writerow(columnas))
+                encabezado = True
+            valores = list(registro.values())
+            if not anidado:
+                lineas.append(escritor.writerow(valores))
+                continue
+            # Un registro sin elementos se exporta igual, con las columnas anidadas vacías
+            for elemento in elementos or [dict.fromkeys(anidado[1])]:
+                lineas.append(escritor.writerow(valores + [elemento[campo] for campo in anidado[1]]))
+        yield ''.join(lineas).encode('utf-8')
+
+
+ESCRITORES = {'ndjson': ndjson, 'csv': csv_}
+
+
+def exportar(entidad, formato, desde=None, hasta=None, chunk_size=None):
+    """ Generador de bloques de bytes de la exportación (para StreamingHttpResponse o un archivo). """
+    return ESCRITORES[formato](entidad, lotes(entidad, desde, hasta, chunk_size))
@@ -0,0 +1,141 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from agenda.models import Cita
+from expediente.models import NotaConsulta, Paciente, RecetaDigital
+from hospital_project.benchmark import host_permitido, muestra_pacientes, resumen_latencias, transaccion_revertida
+from personal.models import Personal
+
+PASSWORD_BENCH = 'Bench#2024'
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide los endpoints clave (login, solicitar, opciones, búsqueda, lookup e historiales) con el "
+        "cliente de pruebas de Django sobre los datos de la BD (ver `generar_datos_sinteticos`). "
+        "Reporta p50/p95/p99 y consultas por petición en JSON, comparable entre commits con --comparar. "
+        "Trabaja dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=100, help="Peticiones por endpoint.")
+        parser.add_argument('--repeticiones-login', type=int, default=10,
+                            help="Peticiones de login (cada una calcula un hash de contraseña).")
+        parser.add_argument('--semilla', type=int, default=0, help="Semilla aleatoria (carga reproducible).")
+        parser.add_argument('--salida', help="Archivo donde guardar el reporte JSON (por defecto, stdout).")
+        parser.add_argument('--comparar', help="Reporte JSON previo contra el cual comparar p95 y consultas.")
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        muestra = muestra_pacientes(rnd, 200)
+        if not muestra:
+            raise CommandError("No hay pacientes en la BD. Ejecute antes `generar_datos_sinteticos`.")
+
+        resultados = {}
+        with transaccion_revertida():
+            numero = f"BENCH-{int(time.time())}"
+            Personal.objects.create(numero_empleado=numero, username=numero, rol='MEDICO',
+                                    password=make_password(PASSWORD_BENCH))
+            host = host_permitido()
+            anonimo, autenticado = APIClient(SERVER_NAME=host), APIClient(SERVER_NAME=host)
+
+            resultados['login'] = self.medir(options['repeticiones_login'], lambda: anonimo.post(
+                '/api/personal/login/', {'numero_empleado': numero, 'password': PASSWORD_BENCH}, format='json'))
+            token = anonimo.post('/api/personal/login/', {'numero_empleado': numero, 'password': PASSWORD_BENCH},
+                                 format='json').json()['token']
+            autenticado.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+            n = options['repeticiones']
+
+            def paciente():
+                return rnd.choice(muestra)
+
+            escenarios = {
+                'lookup': lambda: anonimo.get('/api/expediente/lookup/', {'curp': paciente()['CURP']}),
+                'pacientes_search': lambda: autenticado.get(
+                    '/api/expediente/pacientes/', {'search': paciente()['apellidos'].split()[0]}),
+                'historial_notas': lambda: autenticado.get(f"/api/expediente/historial/notas/{paciente()['id']}/"),
+                'historial_recetas': lambda: autenticado.get(f"/api/expediente/historial/recetas/{paciente()['id']}/"),
+                'citas_paciente': lambda: anonimo.get(f"/api/agenda/citas/paciente/{paciente()['id']}/"),
+                'opciones': lambda: anonimo.get('/api/agenda/opciones/'),
+                # Al final: crea citas (se revierten) y va llenando la agenda
+                'solicitar': lambda: anonimo.post('/api/agenda/solicitar/', {'paciente_id': paciente()['id']},
+                                                  format='json'),
+            }
+            for nombre, peticion in escenarios.items():
+                resultados[nombre] = self.medir(n, peticion)
+
+        reporte = {'meta': self.metadatos(options), 'endpoints': resultados}
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Reporte guardado en {options['salida']}"))
+        else:
+            self.stdout.write(texto)
+
+        if options['comparar']:
+            self.comparar(options['comparar'], resultados)
+
+    def medir(self, repeticiones, peticion):
+        latencias, consultas, estados = [], [], Counter()
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuesta = peticion()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(capturadas))
+            estados[str(respuesta.status_code)] += 1
+        return {
+            'n': repeticiones,
+            **resumen_latencias(latencias),
+            'consultas_p50': statistics.median(consultas) if consultas else 0,
+            'consultas_max': max(consultas, default=0),
+            'estados': dict(estados),
+        }
+
+    def metadatos(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'fecha': timezone.now().isoformat(),
+            'commit': commit,
+            'bd': connection.vendor,
+            'semilla': options['semilla'],
+            'filas': {
+                'pacientes': Paciente.objects.count(),
+                'notas': NotaConsulta.objects.count(),
+                'recetas': RecetaDigital.objects.count(),
+                'citas': Cita.objects.count(),
+                'medicos': Personal.objects.filter(rol='MEDICO').count(),
+            },
+        }
+
+    def comparar(self, ruta, actuales):
+        with open(ruta, encoding='utf-8') as archivo:
+            anteriores = json.load(archivo)['endpoints']
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Comparación con {ruta} (p95 ms / consultas p50)"))
+        for nombre, actual in actuales.items():
+            previo = anteriores.get(nombre)
+            if not previo:
+                self.stdout.write(f"  {nombre}: sin dato previo")
+                continue
+            cambio = (actual['p95_ms'] / previo['p95_ms'] - 1) * 100 if previo['p95_ms'] else 0.0
+            self.stdout.write(
+                f"  {nombre}: {previo['p95_ms']:.2f} -> {actual['p95_ms']:.2f} ({cambio:+.1f}%), "
+                f"consultas {previo['consultas_p50']} -> {actual['consultas_p50']}"
+            )
@@ -0,0 +1,104 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from agenda.views import CitasPacienteListAPIView
+from expediente.views import (NotaConsultaListAPIView, OrdenReferenciaListAPIView, PacienteListCreateAPIView,
+                              RecetaDigitalListAPIView)
+from hospital_project.benchmark import host_permitido, muestra_pacientes
+from hospital_project.renderers import JSONRapidoRenderer, orjson
+from personal.models import Personal
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara, por endpoint de listado, la ruta anterior (instanciar modelos + ModelSerializer + JSONRenderer) "
+        "con la actual (.values() + Proyeccion + JSONRapidoRenderer): respuestas por segundo de cada una "
+        "(consulta incluida) y si producen exactamente los mismos bytes. Falla si alguna respuesta difiere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=200, help="Respuestas por endpoint y ruta.")
+        parser.add_argument('--page-size', type=int, default=settings.HISTORIAL_MAX_PAGE_SIZE,
+                            help="Tamaño de página de los historiales.")
+        parser.add_argument('--semilla', type=int, default=0, help="Semilla aleatoria (pacientes de la muestra).")
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        muestra = muestra_pacientes(rnd, 200, campos=('id', 'apellidos'))
+        if not muestra:
+            raise CommandError("No hay pacientes en la BD. Ejecute antes `generar_datos_sinteticos`.")
+        usuario = Personal.objects.filter(rol='MEDICO').first()
+        page_size = {'page_size': options['page_size']}
+
+        endpoints = {
+            'pacientes_search': (PacienteListCreateAPIView, lambda p: ({}, {'search': p['apellidos'].split()[0]})),
+            'historial_notas': (NotaConsultaListAPIView, lambda p: ({'paciente_id': p['id']}, page_size)),
+            'historial_recetas': (RecetaDigitalListAPIView, lambda p: ({'paciente_id': p['id']}, page_size)),
+            'historial_ordenes': (OrdenReferenciaListAPIView, lambda p: ({'paciente_id': p['id']}, page_size)),
+            'citas_paciente': (CitasPacienteListAPIView, lambda p: ({'paciente_id': p['id']}, page_size)),
+        }
+
+        self.stdout.write(f"orjson: {'sí (' + orjson.__version__ + ')' if orjson else 'no (json de la biblioteca estándar)'}")
+        diferencias = []
+        for nombre, (vista_clase, parametros) in endpoints.items():
+            tiempos = {'antes': 0.0, 'despues': 0.0}
+            filas = bytes_totales = 0
+            for i in range(options['repeticiones']):
+                kwargs, query = parametros(rnd.choice(muestra))
+                # Se alterna el orden para no favorecer a ninguna ruta con la cache de la BD
+                orden = ('antes', 'despues') if i % 2 == 0 else ('despues', 'antes')
+                contenidos = {}
+                for ruta in orden:
+                    inicio = time.perf_counter()
+                    contenidos[ruta], n = getattr(self, ruta)(vista_clase, usuario, kwargs, query)
+                    tiempos[ruta] += time.perf_counter() - inicio
+                if contenidos['antes'] != contenidos['despues']:
+                    diferencias.append((nombre, kwargs, query))
+                filas += n
+                bytes_totales += len(contenidos['despues'])
+
+            n = options['repeticiones']
+            antes, despues = n / tiempos['antes'], n / tiempos['despues']
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            self.stdout.write(f"  filas/respuesta: {filas / n:.1f}  bytes/respuesta: {bytes_totales / n:.0f}")
+            self.stdout.write(f"  respuestas/s antes/después: {antes:.0f} / {despues:.0f} (x{despues / antes:.2f})")
+
+        if diferencias:
+            for nombre, kwargs, query in diferencias[:10]:
+                self.stderr.write(f"  {nombre} {kwargs} {query}: la respuesta difiere")
+            raise CommandError(f"{len(diferencias)} respuestas no son idénticas byte a byte.")
+        self.stdout.write(self.style.SUCCESS("Todas las respuestas son idénticas byte a byte."))
+
+    def preparar(self, vista_clase, usuario, kwargs, query):
+        request = Request(APIRequestFactory(SERVER_NAME=host_permitido()).get('/', query))
+        request.user = usuario
+        vista = vista_clase()
+        vista.setup(request, **kwargs)
+        vista.format_kwarg = None
+        return request, vista
+
+    def listar(self, vista, request, queryset, representar):
+        paginador = vista.pagination_class() if vista.pagination_class else None
+        if paginador is None:
+            filas = list(queryset)
+            return representar(filas), len(filas)
+        filas = paginador.paginate_queryset(queryset, request, view=vista)
+        return paginador.get_paginated_response(representar(filas)).data, len(filas)
+
+    def antes(self, vista_clase, usuario, kwargs, query):
+        request, vista = self.preparar(vista_clase, usuario, kwargs, query)
+        queryset = vista.filter_queryset(vista.get_queryset())
+        datos, n = self.listar(vista, request, queryset, lambda filas: vista.get_serializer(filas, many=True).data)
+        return JSONRenderer().render(datos), n
+
+    def despues(self, vista_clase, usuario, kwargs, query):
+        request, vista = self.preparar(vista_clase, usuario, kwargs, query)
+        queryset = vista.proyeccion.consulta(vista.filter_queryset(vista.get_queryset()))
+        datos, n = self.listar(vista, request, queryset, vista.proyeccion.representar)
+        return JSONRapidoRenderer().render(datos), n
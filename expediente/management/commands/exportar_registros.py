@@ -0,0 +1,67 @@
+import resource
+import sys
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expediente.exportacion import ENTIDADES, ESCRITORES, lotes
+
+
+def rss_maximo_mb():
+    # ru_maxrss está en KB en Linux (el servidor corre en Docker)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta registros clínicos completos (notas, recetas con medicamentos, citas u órdenes de referencia) "
+        "en NDJSON o CSV para auditorías y reportes NOM. Lee la BD con un cursor por lotes y escribe en streaming: "
+        "la memoria no crece con el número de filas. Con --max-rss-mb se aborta si el proceso excede ese límite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('entidad', choices=list(ENTIDADES), help="Registros a exportar.")
+        parser.add_argument('--formato', choices=list(ESCRITORES), default='ndjson', help="Formato de salida.")
+        parser.add_argument('--desde', type=date.fromisoformat, help="Primer día incluido (AAAA-MM-DD).")
+        parser.add_argument('--hasta', type=date.fromisoformat, help="Último día incluido (AAAA-MM-DD).")
+        parser.add_argument('--salida', help="Archivo de salida (por defecto, la salida estándar).")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORTACION_CHUNK_SIZE,
+                            help="Filas por lote leído de la BD y escrito.")
+        parser.add_argument('--max-rss-mb', type=float, help="Memoria máxima (RSS) permitida al proceso, en MB.")
+
+    def handle(self, *args, **options):
+        if options['desde'] and options['hasta'] and options['desde'] > options['hasta']:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        entidad, limite = options['entidad'], options['max_rss_mb']
+        filas = 0
+
+        def lotes_vigilados():
+            # Cuenta las filas y comprueba el presupuesto de memoria tras cada lote
+            nonlocal filas
+            for lote in lotes(entidad, options['desde'], options['hasta'], options['chunk_size']):
+                filas += len(lote)
+                yield lote
+                if limite and rss_maximo_mb() > limite:
+                    raise CommandError(
+                        f"RSS de {rss_maximo_mb():.0f} MB tras {filas} filas: excede --max-rss-mb={limite:.0f}."
+                    )
+
+        inicio = time.perf_counter()
+        salida = open(options['salida'], 'wb') if options['salida'] else sys.stdout.buffer
+        try:
+            for bloque in ESCRITORES[options['formato']](entidad, lotes_vigilados()):
+                salida.write(bloque)
+        finally:
+            if options['salida']:
+                salida.close()
+            else:
+                salida.flush()
+
+        segundos = time.perf_counter() - inicio
+        self.stderr.write(self.style.SUCCESS(
+            f"{entidad}: {filas} registros en {segundos:.1f} s ({filas / segundos if segundos else 0:.0f}/s), "
+            f"RSS máximo {rss_maximo_mb():.0f} MB."
+        ))
@@ -0,0 +1,254 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from agenda.disponibilidad import DIAS_A_BUSCAR, DURACION_SLOT, invalidar_padron_mg
+from agenda.models import Agenda, Cita
+from expediente.busqueda import usa_trigramas
+from expediente.models import (DetalleMedicamento, NotaConsulta, OrdenReferencia, Paciente,
+                               PacienteToken, RecetaDigital)
+from expediente.normalizacion import normalizar_busqueda
+from personal.models import Especialidad, Especialista, Personal
+
+# Prefijo de todo lo generado (numero_empleado y CURP): identifica los datos sintéticos
+PREFIJO = 'SIN'
+
+NOMBRES = ['José', 'María', 'Juan', 'Guadalupe', 'Luis', 'Ana', 'Carlos', 'Sofía', 'Miguel', 'Lucía',
+           'Jorge', 'Fernanda', 'Ricardo', 'Valeria', 'Andrés', 'Camila', 'Raúl', 'Ximena', 'Iván', 'Renata']
+APELLIDOS = ['Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez',
+             'Ramírez', 'Cruz', 'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes', 'Jiménez', 'Torres',
+             'Díaz', 'Gutiérrez', 'Ruiz', 'Mendoza', 'Aguilar', 'Ortiz', 'Moreno', 'Castillo', 'Núñez']
+DIAGNOSTICOS = ['Faringitis aguda', 'Hipertensión arterial', 'Diabetes mellitus tipo 2', 'Lumbalgia',
+                'Gastroenteritis', 'Rinitis alérgica', 'Infección de vías urinarias', 'Migraña', 'Asma']
+MEDICAMENTOS = [('Paracetamol', '500 mg tabletas'), ('Ibuprofeno', '400 mg tabletas'),
+                ('Amoxicilina', '500 mg cápsulas'), ('Metformina', '850 mg tabletas'),
+                ('Losartán', '50 mg tabletas'), ('Omeprazol', '20 mg cápsulas'), ('Loratadina', '10 mg tabletas')]
+ESPECIALIDADES = ["Maxilofacial", "Cardiología", "Hematología", "Pediatría", "ORL",
+                  "Plástica", "Nefrología", "Neumología", "Neurología", "Gastroenterología"]
+
+
+@contextmanager
+def sin_auto_now_add(modelo, campo):
+    """ Permite fijar a mano un DateTimeField(auto_now_add=True) (fechas históricas realistas). """
+    field = modelo._meta.get_field(campo)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos realistas a la escala indicada (médicos con agendas, pacientes, notas, "
+        "recetas, órdenes y citas) con bulk_create por lotes, para medir rendimiento con "
+        "`benchmark_endpoints`. Ejemplo de escala hospital grande: --medicos 500 --pacientes 1000000 "
+        "--notas 10000000 --citas 5000000. Usar sobre una BD de pruebas vacía."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medicos', type=int, default=50)
+        parser.add_argument('--especialistas', type=int, default=10, help="Cuántos de los médicos son especialistas.")
+        parser.add_argument('--pacientes', type=int, default=10000)
+        parser.add_argument('--notas', type=int, default=50000)
+        parser.add_argument('--recetas', type=int, default=20000)
+        parser.add_argument('--ordenes', type=int, default=2000)
+        parser.add_argument('--citas', type=int, default=20000)
+        parser.add_argument('--ocupacion', type=float, default=0.6,
+                            help="Fracción de slots futuros (ventana de búsqueda) ya ocupados.")
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por INSERT (bulk_create).")
+        parser.add_argument('--semilla', type=int, default=0, help="Semilla aleatoria (datos reproducibles).")
+
+    def handle(self, *args, **options):
+        if Personal.objects.filter(numero_empleado__startswith=f"{PREFIJO}-").exists():
+            raise CommandError(
+                "Ya hay datos sintéticos en la BD. Use una BD vacía (p. ej. `python manage.py flush`)."
+            )
+        if options['especialistas'] >= options['medicos']:
+            raise CommandError("--especialistas debe ser menor que --medicos (se necesitan Médicos Generales).")
+
+        self.rnd = random.Random(options['semilla'])
+        self.lote = options['lote']
+        self.ahora = timezone.now()
+
+        medicos_ids, mg_ids = self.generar_personal(options['medicos'], options['especialistas'])
+        agendas = self.generar_agendas(mg_ids)
+        pacientes_ids = self.generar_pacientes(options['pacientes'])
+        self.generar_notas(options['notas'], pacientes_ids, medicos_ids)
+        self.generar_recetas(options['recetas'], pacientes_ids, mg_ids)
+        self.generar_ordenes(options['ordenes'], pacientes_ids, mg_ids)
+        self.generar_citas(options['citas'], options['ocupacion'], agendas, pacientes_ids)
+
+        invalidar_padron_mg()
+        call_command('generar_slots', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Datos sintéticos generados."))
+
+    # --- utilidades ---
+
+    def insertar(self, modelo, objetos, etiqueta):
+        """ bulk_create por lotes desde un generador (no materializa todo en memoria). """
+        total = 0
+        objetos = iter(objetos)
+        while True:
+            lote = list(islice(objetos, self.lote))
+            if not lote:
+                break
+            with transaction.atomic():
+                modelo.objects.bulk_create(lote)
+            total += len(lote)
+            if total % (self.lote * 20) == 0:
+                self.stdout.write(f"  {etiqueta}: {total}...")
+        self.stdout.write(f"{etiqueta}: {total}")
+        return total
+
+    def fecha_pasada(self, dias=3 * 365):
+        return self.ahora - timedelta(seconds=self.rnd.randrange(dias * 24 * 3600))
+
+    # --- generadores ---
+
+    def generar_personal(self, total, especialistas):
+        # Un solo hash para todos: el costo del hasher no debe dominar la generación
+        password = make_password('Sintetico#2024')
+        self.insertar(Personal, (
+            Personal(numero_empleado=f"{PREFIJO}-M{i:06d}", username=f"{PREFIJO}-M{i:06d}", password=password,
+                     first_name=self.rnd.choice(NOMBRES), last_name=self.rnd.choice(APELLIDOS),
+                     rol='MEDICO', cedula_profesional=f"{PREFIJO}{i:08d}")
+            for i in range(total)
+        ), "Médicos")
+        medicos_ids = list(Personal.objects.filter(numero_empleado__startswith=f"{PREFIJO}-M")
+                           .order_by('id').values_list('id', flat=True))
+
+        for nombre in ESPECIALIDADES:
+            Especialidad.objects.get_or_create(nombre=nombre)
+        catalogo = list(Especialidad.objects.all())
+        Especialista.objects.bulk_create([
+            Especialista(medico_id=medico_id, especialidad=self.rnd.choice(catalogo))
+            for medico_id in medicos_ids[:especialistas]
+        ])
+        return medicos_ids, medicos_ids[especialistas:]
+
+    def generar_agendas(self, mg_ids):
+        # Lunes a viernes, turno matutino o vespertino de 6 horas
+        turnos = [(time(8, 0), time(14, 0)), (time(14, 0), time(20, 0))]
+        agendas = []
+        for n, medico_id in enumerate(mg_ids):
+            inicio, fin = turnos[n % 2]
+            for dia in range(5):
+                agendas.append(Agenda(medico_id=medico_id, dia=dia, hora_inicio=inicio, hora_fin=fin,
+                                      consultorio=f"C-{n % 40 + 1:02d}"))
+        Agenda.objects.bulk_create(agendas, batch_size=self.lote)
+        self.stdout.write(f"Agendas: {len(agendas)}")
+        return list(Agenda.objects.filter(medico_id__in=mg_ids).order_by('dia', 'hora_inicio', 'id'))
+
+    def generar_pacientes(self, total):
+        def pacientes():
+            for i in range(total):
+                nombre, apellidos = self.rnd.choice(NOMBRES), f"{self.rnd.choice(APELLIDOS)} {self.rnd.choice(APELLIDOS)}"
+                curp = f"{PREFIJO}{i:015d}"
+                yield Paciente(
+                    CURP=curp, nombre=nombre, apellidos=apellidos, direccion='Domicilio sintético',
+                    fecha_nacimiento=(self.ahora - timedelta(days=self.rnd.randrange(365, 90 * 365))).date(),
+                    tipo=self.rnd.choice(['A', 'N']),
+                    # bulk_create no llama a Paciente.save(): el texto de búsqueda se calcula aquí
+                    busqueda_normalizada=normalizar_busqueda(f"{curp} {nombre} {apellidos}"),
+                )
+
+        self.insertar(Paciente, pacientes(), "Pacientes")
+        pacientes_ids = list(Paciente.objects.filter(CURP__startswith=PREFIJO).values_list('id', flat=True))
+
+        if not usa_trigramas():
+            # Índice de tokens de la búsqueda (lo mantiene una señal que bulk_create no emite)
+            self.insertar(PacienteToken, (
+                PacienteToken(paciente_id=paciente_id, token=token)
+                for paciente_id, texto in Paciente.objects.filter(CURP__startswith=PREFIJO)
+                .values_list('id', 'busqueda_normalizada').iterator(chunk_size=self.lote)
+                for token in set(texto.split())
+            ), "Tokens de búsqueda")
+        return pacientes_ids
+
+    def generar_notas(self, total, pacientes_ids, medicos_ids):
+        with sin_auto_now_add(NotaConsulta, 'fecha_registro'):
+            self.insertar(NotaConsulta, (
+                NotaConsulta(
+                    paciente_id=self.rnd.choice(pacientes_ids), medico_id=self.rnd.choice(medicos_ids),
+                    diagnostico=self.rnd.choice(DIAGNOSTICOS), tratamiento='Tratamiento sintomático.',
+                    evolucion='Paciente estable, se cita a revisión.', fecha_registro=self.fecha_pasada(),
+                )
+                for _ in range(total)
+            ), "Notas de consulta")
+
+    def generar_recetas(self, total, pacientes_ids, mg_ids):
+        generadas = 0
+        with sin_auto_now_add(RecetaDigital, 'fecha_emision'):
+            while generadas < total:
+                cantidad = min(self.lote, total - generadas)
+                with transaction.atomic():
+                    recetas = RecetaDigital.objects.bulk_create([
+                        RecetaDigital(paciente_id=self.rnd.choice(pacientes_ids), medico_id=self.rnd.choice(mg_ids),
+                                      diagnostico=self.rnd.choice(DIAGNOSTICOS), fecha_emision=self.fecha_pasada())
+                        for _ in range(cantidad)
+                    ])
+                    DetalleMedicamento.objects.bulk_create([
+                        DetalleMedicamento(receta=receta, medicamento=medicamento, presentacion=presentacion,
+                                           dosificacion='Una cada 8 horas por 5 días.', cantidad=self.rnd.randint(1, 3))
+                        for receta in recetas
+                        for medicamento, presentacion in self.rnd.sample(MEDICAMENTOS, self.rnd.randint(1, 3))
+                    ], batch_size=self.lote)
+                generadas += cantidad
+        self.stdout.write(f"Recetas: {generadas}")
+
+    def generar_ordenes(self, total, pacientes_ids, mg_ids):
+        with sin_auto_now_add(OrdenReferencia, 'fecha_emision'):
+            self.insertar(OrdenReferencia, (
+                OrdenReferencia(paciente_id=self.rnd.choice(pacientes_ids), medico_general_id=self.rnd.choice(mg_ids),
+                                especialidad_solicitada=self.rnd.choice(ESPECIALIDADES),
+                                motivo_referencia='Valoración por especialista.', fecha_emision=self.fecha_pasada(),
+                                estado=self.rnd.choice(['PENDIENTE', 'AGENDADA']))
+                for _ in range(total)
+            ), "Órdenes de referencia")
+
+    def generar_citas(self, total, ocupacion, agendas, pacientes_ids):
+        """
+        Recorre los días hacia atrás desde el final de la ventana de búsqueda llenando slots:
+        los futuros con la ocupación indicada (PENDIENTE/CONFIRMADA) y los pasados casi llenos
+        (COMPLETADA/CANCELADA), hasta llegar al total. Respeta un solo slot activo por médico.
+        """
+        por_dia = {}
+        for agenda in agendas:
+            por_dia.setdefault(agenda.dia, []).append(agenda)
+        if not por_dia:
+            self.stdout.write("Citas: 0 (no hay agendas)")
+            return
+
+        hoy = timezone.localdate()
+
+        def citas():
+            generadas = 0
+            fecha = hoy + timedelta(days=DIAS_A_BUSCAR)
+            while generadas < total:
+                futura = fecha > hoy
+                for agenda in por_dia.get(fecha.weekday(), []):
+                    slot = timezone.make_aware(datetime.combine(fecha, agenda.hora_inicio))
+                    fin = timezone.make_aware(datetime.combine(fecha, agenda.hora_fin))
+                    while slot + DURACION_SLOT <= fin and generadas < total:
+                        if self.rnd.random() < (ocupacion if futura else 0.9):
+                            if futura:
+                                estado = self.rnd.choice(['PENDIENTE', 'CONFIRMADA'])
+                            else:
+                                estado = 'COMPLETADA' if self.rnd.random() < 0.85 else 'CANCELADA'
+                            yield Cita(agenda=agenda, medico_id=agenda.medico_id,
+                                       paciente_id=self.rnd.choice(pacientes_ids), fecha_hora=slot,
+                                       estado=estado, tipo_cita='MG')
+                            generadas += 1
+                        slot += DURACION_SLOT
+                fecha -= timedelta(days=1)
+
+        # bulk_create no emite post_save: el inventario de slots se sincroniza al final con generar_slots
+        self.insertar(Cita, citas(), "Citas")
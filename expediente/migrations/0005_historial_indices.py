@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expediente', '0004_paciente_email_paciente_telefono'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notaconsulta',
+            index=models.Index(fields=['paciente', '-fecha_registro', '-id'], name='nota_paciente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recetadigital',
+            index=models.Index(fields=['paciente', '-fecha_emision', '-id'], name='receta_paciente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from expediente.normalizacion import normalizar_busqueda
+
+
+def poblar_indice_busqueda(apps, schema_editor):
+    """ Calcula el texto normalizado (y, fuera de PostgreSQL, los tokens) de los pacientes existentes. """
+    Paciente = apps.get_model('expediente', 'Paciente')
+    PacienteToken = apps.get_model('expediente', 'PacienteToken')
+    con_tokens = schema_editor.connection.vendor != 'postgresql'
+
+    for paciente in Paciente.objects.all().iterator(chunk_size=1000):
+        paciente.busqueda_normalizada = normalizar_busqueda(
+            f"{paciente.CURP} {paciente.nombre} {paciente.apellidos}"
+        )
+        paciente.save(update_fields=['busqueda_normalizada'])
+        if con_tokens:
+            PacienteToken.objects.bulk_create(
+                [PacienteToken(paciente=paciente, token=token[:100])
+                 for token in set(paciente.busqueda_normalizada.split())],
+                ignore_conflicts=True,
+            )
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS paciente_busqueda_trgm_idx '
+        'ON expediente_paciente USING gin (busqueda_normalizada gin_trgm_ops)'
+    )
+
+
+def eliminar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS paciente_busqueda_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expediente', '0005_historial_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='busqueda_normalizada',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='PacienteToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=100)),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='expediente.paciente')),
+            ],
+            options={
+                'unique_together': {('paciente', 'token')},
+            },
+        ),
+        migrations.RunPython(poblar_indice_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trigramas, eliminar_indice_trigramas),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models.functions import Upper
+
+
+def curp_a_mayusculas(apps, schema_editor):
+    """
+    Pasa a mayúsculas las CURP guardadas antes de normalizarlas al escribir.
+    Si la versión en mayúsculas ya existe (duplicado que solo difiere en mayúsculas/minúsculas),
+    el registro se deja como está para revisarlo a mano en lugar de romper la migración.
+    """
+    Paciente = apps.get_model('expediente', 'Paciente')
+    for paciente in Paciente.objects.exclude(CURP=Upper('CURP')).only('id', 'CURP').iterator():
+        curp = paciente.CURP.strip().upper()
+        if Paciente.objects.filter(CURP=curp).exists():
+            continue
+        Paciente.objects.filter(pk=paciente.pk).update(CURP=curp)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expediente', '0006_busqueda_pacientes'),
+    ]
+
+    operations = [
+        migrations.RunPython(curp_a_mayusculas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expediente', '0007_curp_mayusculas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordenreferencia',
+            index=models.Index(fields=['paciente', '-fecha_emision', '-id'], name='orden_paciente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expediente', '0008_historial_ordenes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='expediente_modificado',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='version_expediente',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 # Importamos el modelo de Personal para la relación Médico -> Nota
 from personal.models import Personal 
+from .normalizacion import normalizar_busqueda, normalizar_curp
+
+# Campos de Paciente que mantiene expediente.versiones
+CAMPOS_VERSION = ('version_expediente', 'expediente_modificado')
 
 class Paciente(models.Model):
     # Campos de Registro (RF-001, RF-002)
@@ -23,10 +27,43 @@ class Paciente(models.Model):
     
     # RFC es requerido en RF-001, pero lo haremos opcional ya que no todos lo tienen.
     RFC = models.CharField(max_length=13, unique=True, null=True, blank=True)
+
+    # CURP, nombre y apellidos en minúsculas y sin acentos, para la búsqueda (RF-M03).
+    # En PostgreSQL tiene un índice GIN de trigramas (pg_trgm).
+    busqueda_normalizada = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    # Versión del expediente (expediente.versiones): solo se modifica con UPDATE atómicos en la BD
+    version_expediente = models.PositiveBigIntegerField(default=0, editable=False)
+    expediente_modificado = models.DateTimeField(null=True, blank=True, editable=False)
     
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Guardar una copia leída antes de un incremento haría retroceder la versión
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in CAMPOS_VERSION
+            ]
+        # La CURP se normaliza al escribir para que el login del paciente use igualdad exacta sobre el índice único
+        self.CURP = normalizar_curp(self.CURP)
+        self.busqueda_normalizada = normalizar_busqueda(f"{self.CURP} {self.nombre} {self.apellidos}")
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'busqueda_normalizada'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Expediente No. {self.pk}: {self.nombre} {self.apellidos}"
 
+class PacienteToken(models.Model):
+    # Índice de palabras normalizadas del paciente: respaldo de la búsqueda cuando la BD no tiene pg_trgm
+    paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='tokens')
+    token = models.CharField(max_length=100, db_index=True)
+
+    def __str__(self):
+        return f"{self.token} -> {self.paciente_id}"
+
+    class Meta:
+        unique_together = ('paciente', 'token')
+
 class NotaConsulta(models.Model):
     # Relaciones
     # CASCADE: Si se elimina el paciente, se elimina la nota (Historial)
@@ -51,6 +88,10 @@ class NotaConsulta(models.Model):
     class Meta:
         ordering = ['-fecha_registro'] # Las notas más recientes aparecerán primero (RF-020)
         verbose_name_plural = "Notas de Consulta"
+        indexes = [
+            # Historial paginado por cursor: WHERE paciente_id = ? ORDER BY fecha_registro DESC, id DESC
+            models.Index(fields=['paciente', '-fecha_registro', '-id'], name='nota_paciente_fecha_idx'),
+        ]
 
 class RecetaDigital(models.Model):
     # Relaciones y Trazabilidad
@@ -73,6 +114,12 @@ class RecetaDigital(models.Model):
     def __str__(self):
         return f"Receta de {self.paciente.apellidos} - {self.fecha_emision.strftime('%Y-%m-%d')}"
 
+    class Meta:
+        indexes = [
+            # Historial paginado por cursor: WHERE paciente_id = ? ORDER BY fecha_emision DESC, id DESC
+            models.Index(fields=['paciente', '-fecha_emision', '-id'], name='receta_paciente_fecha_idx'),
+        ]
+
 class DetalleMedicamento(models.Model):
     # Detalle de cada medicamento en la receta
     receta = models.ForeignKey(RecetaDigital, on_delete=models.CASCADE, related_name='detalles')
@@ -103,4 +150,10 @@ class OrdenReferencia(models.Model):
     estado = models.CharField(max_length=10, choices=ESTADOS, default='PENDIENTE')
 
     def __str__(self):
-        return f"Orden para {self.especialidad_solicitada} de {self.paciente.apellidos}"
\ No newline at end of file
+        return f"Orden para {self.especialidad_solicitada} de {self.paciente.apellidos}"
+
+    class Meta:
+        indexes = [
+            # Historial paginado por cursor: WHERE paciente_id = ? ORDER BY fecha_emision DESC, id DESC
+            models.Index(fields=['paciente', '-fecha_emision', '-id'], name='orden_paciente_fecha_idx'),
+        ]
\ No newline at end of file
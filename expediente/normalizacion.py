@@ -0,0 +1,13 @@
+import unicodedata
+
+
+def normalizar_busqueda(texto):
+    """ Minúsculas, sin acentos y con espacios simples: 'José  Núñez' -> 'jose nunez'. """
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.lower().split())
+
+
+def normalizar_curp(curp):
+    """ La CURP se guarda y se busca en mayúsculas y sin espacios: ' gomj800101... ' -> 'GOMJ800101...'. """
+    return (curp or '').strip().upper()
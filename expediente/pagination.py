@@ -0,0 +1,32 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class HistorialCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para los historiales de un paciente.
+    Cada página se obtiene con un WHERE sobre la fecha en lugar de un OFFSET, así que las
+    páginas profundas cuestan lo mismo que la primera. El `id` desempata registros con la misma fecha.
+    El tamaño de página se puede pedir con ?page_size= (hasta HISTORIAL_MAX_PAGE_SIZE).
+    """
+    page_size = settings.HISTORIAL_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.HISTORIAL_MAX_PAGE_SIZE
+
+
+class NotaConsultaCursorPagination(HistorialCursorPagination):
+    # Las notas más recientes primero (RF-020)
+    ordering = ('-fecha_registro', '-id')
+
+
+class RecetaDigitalCursorPagination(HistorialCursorPagination):
+    ordering = ('-fecha_emision', '-id')
+
+
+class OrdenReferenciaCursorPagination(HistorialCursorPagination):
+    ordering = ('-fecha_emision', '-id')
+
+
+class CitaCursorPagination(HistorialCursorPagination):
+    # Las citas se listan en orden cronológico
+    ordering = ('fecha_hora', 'id')
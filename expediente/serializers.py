@@ -1,5 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
+from hospital_project.proyecciones import Proyeccion, decimal, fecha, fecha_hora, nombre_completo
+from personal.models import Personal
 from .models import Paciente, NotaConsulta, RecetaDigital, DetalleMedicamento, OrdenReferencia
+from .normalizacion import normalizar_curp
+from .versiones import incrementar_version
 
 # --- 1. Paciente Serializer (Para buscar y mostrar datos) ---
 
@@ -14,6 +19,23 @@ class PacienteSerializer(serializers.ModelSerializer):
         fields = ['id', 'CURP', 'nombre', 'apellidos', 'direccion', 'fecha_nacimiento', 'tipo', 'RFC']
         read_only_fields = ['id']
 
+    def to_internal_value(self, data):
+        # La CURP se normaliza antes de validar, para que el validador de unicidad
+        # compare contra lo que realmente se guarda (en mayúsculas).
+        if 'CURP' in data and isinstance(data['CURP'], str):
+            data = data.copy()
+            data['CURP'] = normalizar_curp(data['CURP'])
+        return super().to_internal_value(data)
+
+
+class PacienteProyeccion(Proyeccion):
+    """ Listado de PacienteSerializer con .values() (búsqueda de pacientes). """
+    columnas = ('id', 'CURP', 'nombre', 'apellidos', 'direccion', 'fecha_nacimiento', 'tipo', 'RFC')
+
+    def fila(self, fila):
+        fila['fecha_nacimiento'] = fecha(fila['fecha_nacimiento'])
+        return fila
+
 
 # --- 2. Nota de Consulta Serializer (Para registrar una nueva nota) ---
 
@@ -44,37 +66,148 @@ class NotaConsultaSerializer(serializers.ModelSerializer):
                     self.fields[field_name].required = False
 
 
+class NotaConsultaProyeccion(Proyeccion):
+    """ Listado de NotaConsultaSerializer con .values() (historial de notas). """
+    columnas = (
+        'id', 'paciente_id', 'medico_id', 'medico__first_name', 'medico__last_name', 'diagnostico',
+        'tratamiento', 'evolucion', 'procedimientos', 'observaciones', 'fecha_registro',
+    )
+
+    def fila(self, fila):
+        return {
+            'id': fila['id'],
+            'paciente': fila['paciente_id'],
+            'medico': fila['medico_id'],
+            'medico_nombre': nombre_completo(fila['medico__first_name'], fila['medico__last_name']),
+            'diagnostico': fila['diagnostico'],
+            'tratamiento': fila['tratamiento'],
+            'evolucion': fila['evolucion'],
+            'procedimientos': fila['procedimientos'],
+            'observaciones': fila['observaciones'],
+            'fecha_registro': fecha_hora(fila['fecha_registro']),
+        }
+
+
+class PrecargadoRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que, si el contexto trae un diccionario {pk: objeto} en `clave_contexto`,
+    resuelve ahí en vez de hacer una consulta por elemento (carga por lotes).
+    """
+    def __init__(self, clave_contexto, **kwargs):
+        self.clave_contexto = clave_contexto
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        precargados = self.context.get(self.clave_contexto)
+        if precargados is None:
+            return super().to_internal_value(data)
+        try:
+            return precargados[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 class DetalleMedicamentoSerializer(serializers.ModelSerializer):
     class Meta:
         model = DetalleMedicamento
         fields = ['medicamento', 'presentacion', 'dosificacion', 'cantidad']
+
+
+class RecetaDigitalListSerializer(serializers.ListSerializer):
+    """ Alta de un lote de recetas con un número constante de consultas. """
+
+    def create(self, validated_data):
+        detalles_por_receta = [datos.pop('detalles') for datos in validated_data]
+        with transaction.atomic():
+            recetas = RecetaDigital.objects.bulk_create([RecetaDigital(**datos) for datos in validated_data])
+            DetalleMedicamento.objects.bulk_create([
+                DetalleMedicamento(receta=receta, **detalle)
+                for receta, detalles in zip(recetas, detalles_por_receta)
+                for detalle in detalles
+            ])
+            # bulk_create no emite post_save
+            incrementar_version(*(receta.paciente_id for receta in recetas))
+        return recetas
+
         
 class RecetaDigitalSerializer(serializers.ModelSerializer):
     medico_nombre = serializers.ReadOnlyField(source='medico.get_full_name')
-    detalles = DetalleMedicamentoSerializer(many=True, read_only=True) # Campo anidado
+    detalles = DetalleMedicamentoSerializer(many=True, allow_empty=False) # Campo anidado (RB-012)
+    paciente = PrecargadoRelatedField('pacientes_precargados', queryset=Paciente.objects.all())
+    # Solo se usa en la carga por lotes hecha por Farmacia; al emitir una receta, el médico es el usuario autenticado
+    medico = PrecargadoRelatedField(
+        'medicos_precargados', queryset=Personal.objects.filter(rol='MEDICO'), write_only=True, required=False
+    )
     
     class Meta:
         model = RecetaDigital
         fields = [
-            'id', 'paciente', 'diagnostico', 'medico_nombre', 'talla', 'peso', 
+            'id', 'paciente', 'medico', 'diagnostico', 'medico_nombre', 'talla', 'peso', 
             'detalles', 'fecha_emision'
         ]
-        read_only_fields = ['id','paciente', 'medico_nombre', 'fecha_emision']
+        read_only_fields = ['id', 'medico_nombre', 'fecha_emision']
+        list_serializer_class = RecetaDigitalListSerializer
+
+    def validate_detalles(self, detalles):
+        # Un mismo medicamento y presentación no puede repetirse en la receta: se indica una vez con su cantidad
+        vistos = set()
+        for detalle in detalles:
+            clave = (detalle['medicamento'].strip().lower(), detalle['presentacion'].strip().lower())
+            if clave in vistos:
+                raise serializers.ValidationError(
+                    f"El medicamento '{detalle['medicamento']}' ({detalle['presentacion']}) está repetido."
+                )
+            vistos.add(clave)
+        return detalles
         
     def create(self, validated_data):
         # 1. Extraer los detalles del medicamento
         detalles_data = validated_data.pop('detalles')
         
-        # 2. Crear la Receta principal
-        # Aseguramos que el médico sea el usuario autenticado
-        receta = RecetaDigital.objects.create(**validated_data)
-        
-        # 3. Crear los detalles de los medicamentos (Dosificación RB-012)
-        for detalle in detalles_data:
-            DetalleMedicamento.objects.create(receta=receta, **detalle)
+        with transaction.atomic():
+            # 2. Crear la Receta principal
+            # Aseguramos que el médico sea el usuario autenticado
+            receta = RecetaDigital.objects.create(**validated_data)
+            
+            # 3. Crear los detalles de los medicamentos (Dosificación RB-012) en un solo INSERT
+            DetalleMedicamento.objects.bulk_create(
+                [DetalleMedicamento(receta=receta, **detalle) for detalle in detalles_data]
+            )
             
         return receta
 
+class RecetaDigitalProyeccion(Proyeccion):
+    """ Listado de RecetaDigitalSerializer con .values(): los detalles de toda la página en una consulta. """
+    columnas = (
+        'id', 'paciente_id', 'diagnostico', 'medico__first_name', 'medico__last_name',
+        'talla', 'peso', 'fecha_emision',
+    )
+    # talla y peso: DecimalField(max_digits=5, decimal_places=2)
+    medida = staticmethod(decimal(5, 2))
+
+    def representar(self, filas):
+        filas = list(filas)
+        detalles = {}
+        if filas:
+            consulta = DetalleMedicamento.objects.filter(receta_id__in=[fila['id'] for fila in filas])
+            for detalle in consulta.values('receta_id', *DetalleMedicamentoSerializer.Meta.fields):
+                detalles.setdefault(detalle.pop('receta_id'), []).append(detalle)
+        return [self.fila(fila, detalles.get(fila['id'], [])) for fila in filas]
+
+    def fila(self, fila, detalles):
+        return {
+            'id': fila['id'],
+            'paciente': fila['paciente_id'],
+            'diagnostico': fila['diagnostico'],
+            'medico_nombre': nombre_completo(fila['medico__first_name'], fila['medico__last_name']),
+            'talla': self.medida(fila['talla']),
+            'peso': self.medida(fila['peso']),
+            'detalles': detalles,
+            'fecha_emision': fecha_hora(fila['fecha_emision']),
+        }
+
 class OrdenReferenciaSerializer(serializers.ModelSerializer):
     medico_general_numero = serializers.ReadOnlyField(source='medico_general.numero_empleado')
     class Meta:
@@ -82,6 +215,24 @@ class OrdenReferenciaSerializer(serializers.ModelSerializer):
         fields = ['id', 'paciente', 'especialidad_solicitada', 'motivo_referencia', 'medico_general_numero', 'fecha_emision', 'estado']
         read_only_fields = ['id', 'fecha_emision', 'estado', 'medico_general_numero']
 
+class OrdenReferenciaProyeccion(Proyeccion):
+    """ Listado de OrdenReferenciaSerializer con .values() (historial de órdenes). """
+    columnas = (
+        'id', 'paciente_id', 'especialidad_solicitada', 'motivo_referencia',
+        'medico_general__numero_empleado', 'fecha_emision', 'estado',
+    )
+
+    def fila(self, fila):
+        return {
+            'id': fila['id'],
+            'paciente': fila['paciente_id'],
+            'especialidad_solicitada': fila['especialidad_solicitada'],
+            'motivo_referencia': fila['motivo_referencia'],
+            'medico_general_numero': fila['medico_general__numero_empleado'],
+            'fecha_emision': fecha_hora(fila['fecha_emision']),
+            'estado': fila['estado'],
+        }
+
 class PacientePublicSerializer(serializers.ModelSerializer):
     """ Serializador simple para la búsqueda pública (solo CURP y ID). """
     class Meta:
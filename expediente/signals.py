@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from agenda.models import Cita
+from .busqueda import actualizar_tokens, invalidar_curp, usa_trigramas
+from .models import DetalleMedicamento, NotaConsulta, OrdenReferencia, Paciente, RecetaDigital
+from .versiones import incrementar_version
+
+
+@receiver(post_save, sender=Paciente)
+def indexar_paciente(sender, instance, **kwargs):
+    # En PostgreSQL la búsqueda usa el índice de trigramas; en otras BD, el índice de tokens
+    if not usa_trigramas():
+        actualizar_tokens(instance)
+
+
+@receiver(pre_save, sender=Paciente)
+def recordar_curp_anterior(sender, instance, update_fields=None, **kwargs):
+    # Si cambia la CURP hay que invalidar también la entrada de la CURP anterior
+    instance._curp_anterior = None
+    if instance.pk and (update_fields is None or 'CURP' in update_fields):
+        instance._curp_anterior = Paciente.objects.filter(pk=instance.pk).values_list('CURP', flat=True).first()
+
+
+@receiver(post_save, sender=Paciente)
+@receiver(post_delete, sender=Paciente)
+def invalidar_cache_curp(sender, instance, **kwargs):
+    invalidar_curp(instance.CURP, getattr(instance, '_curp_anterior', None))
+
+
+@receiver(post_save, sender=Paciente)
+def versionar_datos_paciente(sender, instance, created, **kwargs):
+    # Los datos del paciente forman parte del expediente unificado
+    if not created:
+        incrementar_version(instance.pk)
+
+
+@receiver(post_save, sender=NotaConsulta)
+@receiver(post_delete, sender=NotaConsulta)
+@receiver(post_save, sender=RecetaDigital)
+@receiver(post_delete, sender=RecetaDigital)
+@receiver(post_save, sender=OrdenReferencia)
+@receiver(post_delete, sender=OrdenReferencia)
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def versionar_expediente(sender, instance, **kwargs):
+    # Las escrituras en bloque (bulk_create) no emiten señales: quien las hace llama a incrementar_version
+    incrementar_version(instance.paciente_id)
+
+
+@receiver(post_save, sender=DetalleMedicamento)
+@receiver(post_delete, sender=DetalleMedicamento)
+def versionar_expediente_por_detalle(sender, instance, **kwargs):
+    if DetalleMedicamento.receta.is_cached(instance):
+        paciente_id = instance.receta.paciente_id
+    else:
+        # Sin cargar la receta completa; si ya se borró (en cascada), su propio post_delete incrementó la versión
+        paciente_id = RecetaDigital.objects.filter(pk=instance.receta_id).values_list('paciente_id', flat=True).first()
+    incrementar_version(paciente_id)
@@ -1,3 +1,565 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from agenda.disponibilidad import invalidar_padron_mg
+from agenda.models import Agenda, Cita
+from agenda.serializers import CitaReadProyeccion, CitaReadSerializer
+from agenda.views import autoasignar_citas_lote
+from hospital_project.renderers import JSONRapidoRenderer
+from personal.models import Personal
+from . import documentos
+from .busqueda import buscar_pacientes
+from .serializers import (NotaConsultaProyeccion, NotaConsultaSerializer, OrdenReferenciaProyeccion,
+                          OrdenReferenciaSerializer, PacienteProyeccion, PacienteSerializer, RecetaDigitalProyeccion,
+                          RecetaDigitalSerializer)
+from .models import DetalleMedicamento, NotaConsulta, OrdenReferencia, Paciente, RecetaDigital
+from .versiones import cache_historiales
+
+
+def crear_paciente(curp, nombre='Juan', apellidos='Pérez López'):
+    return Paciente.objects.create(CURP=curp, nombre=nombre, apellidos=apellidos,
+                                   direccion='Calle 1', fecha_nacimiento='1990-01-01')
+
+
+class HistorialNumeroConsultasTests(TestCase):
+    """
+    Los listados del historial (RF-020) hacen el mismo número de consultas con 2 registros que
+    con 30: los datos relacionados (médico, medicamentos, agenda) no se piden fila por fila.
+    """
+
+    def setUp(self):
+        cache_historiales.clear()
+        self.medico = Personal.objects.create_user('MG-100', password='x', rol='MEDICO',
+                                                   first_name='Ana', last_name='García')
+        self.agenda = Agenda.objects.create(medico=self.medico, dia=0, hora_inicio=time(8, 0),
+                                            hora_fin=time(20, 0), consultorio='C-01')
+        self.client = APIClient()
+        self.client.force_authenticate(self.medico)
+
+    def paciente_con_notas(self, n):
+        paciente = crear_paciente(f'NOTA{n:014d}')
+        NotaConsulta.objects.bulk_create([
+            NotaConsulta(paciente=paciente, medico=self.medico, diagnostico='Dx', tratamiento='Tx', evolucion='Ev')
+            for _ in range(n)
+        ])
+        return paciente
+
+    def paciente_con_recetas(self, n):
+        paciente = crear_paciente(f'RECE{n:014d}')
+        recetas = RecetaDigital.objects.bulk_create([
+            RecetaDigital(paciente=paciente, medico=self.medico, diagnostico='Dx') for _ in range(n)
+        ])
+        DetalleMedicamento.objects.bulk_create([
+            DetalleMedicamento(receta=receta, medicamento=medicamento, presentacion='Tabletas', dosificacion='c/8h')
+            for receta in recetas for medicamento in ('Paracetamol', 'Loratadina')
+        ])
+        return paciente
+
+    def paciente_con_citas(self, n):
+        paciente = crear_paciente(f'CITA{n:014d}')
+        inicio = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        Cita.objects.bulk_create([
+            Cita(agenda=self.agenda, medico=self.medico, paciente=paciente, tipo_cita='MG',
+                 fecha_hora=inicio + timedelta(minutes=30 * (i + 100 * n)))
+            for i in range(n)
+        ])
+        return paciente
+
+    def assertConsultasConstantes(self, url, crear):
+        # page_size por encima de 30: todas las filas se serializan en la misma respuesta
+        pocos, muchos = crear(2), crear(30)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url.format(pocos.id), {'page_size': 50})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['results']), 2)
+
+        with self.assertNumQueries(len(consultas)):
+            respuesta = self.client.get(url.format(muchos.id), {'page_size': 50})
+        self.assertEqual(len(respuesta.json()['results']), 30)
+        return respuesta.json()['results']
+
+    def test_notas(self):
+        self.assertConsultasConstantes('/api/expediente/historial/notas/{}/', self.paciente_con_notas)
+
+    def test_recetas(self):
+        resultados = self.assertConsultasConstantes('/api/expediente/historial/recetas/{}/', self.paciente_con_recetas)
+        self.assertTrue(all(len(receta['detalles']) == 2 for receta in resultados))
+
+    def test_citas(self):
+        self.assertConsultasConstantes('/api/agenda/citas/paciente/{}/', self.paciente_con_citas)
+
+
+class BusquedaPacientesTests(TestCase):
+    """ Misma semántica con y sin pg_trgm: cada palabra, en cualquier orden, es prefijo de una palabra del paciente. """
+
+    def setUp(self):
+        self.juan = crear_paciente('PEJJ900101HDFRRN01', 'Juan', 'Pérez López')
+        self.juana = crear_paciente('PEJA900101MDFRRN02', 'Juana', 'Pereira Soto')
+        self.pedro = crear_paciente('JUPE900101HDFRRN03', 'Pedro', 'Juárez Núñez')
+
+    def buscar(self, query):
+        return set(buscar_pacientes(query).values_list('id', flat=True))
+
+    def test_palabras_en_cualquier_orden(self):
+        self.assertEqual(self.buscar('perez juan'), {self.juan.id})
+        self.assertEqual(self.buscar('Pérez  JUAN'), {self.juan.id})
+
+    def test_prefijos_de_palabra(self):
+        self.assertEqual(self.buscar('jua'), {self.juan.id, self.juana.id, self.pedro.id})
+        self.assertEqual(self.buscar('pere'), {self.juan.id, self.juana.id})
+        # Solo prefijos: una subcadena en medio de la palabra no coincide
+        self.assertEqual(self.buscar('uan'), set())
+
+    def test_numero_de_expediente_primero(self):
+        self.assertEqual(list(buscar_pacientes(str(self.pedro.id)).values_list('id', flat=True))[:1], [self.pedro.id])
+
+
+class PacienteLookupTests(TestCase):
+    """ Validación de la CURP del paciente (CU-PAC-001). """
+
+    def test_curp_en_minusculas_y_con_espacios(self):
+        paciente = crear_paciente('PELJ900101HDFRRN05')
+        respuesta = self.client.get('/api/expediente/lookup/', {'curp': ' pelj900101hdfrrn05 '})
+        self.assertEqual(respuesta.json(), [{'id': paciente.id, 'CURP': 'PELJ900101HDFRRN05',
+                                             'nombre': 'Juan', 'apellidos': 'Pérez López'}])
+
+    def test_curp_inexistente_o_vacia(self):
+        self.assertEqual(self.client.get('/api/expediente/lookup/', {'curp': 'XXXX000000XXXXXX00'}).json(), [])
+        self.assertEqual(self.client.get('/api/expediente/lookup/').json(), [])
+        # La API navegable también responde sin un queryset en la vista
+        self.assertEqual(self.client.get('/api/expediente/lookup/', HTTP_ACCEPT='text/html').status_code, 200)
+
+
+class ExpedienteUnificadoTests(TestCase):
+    """ Cada sección del expediente (RF-020) es la primera página de su historial y sigue en su propia ruta. """
+
+    def setUp(self):
+        cache_historiales.clear()
+        self.medico = Personal.objects.create_user('MG-200', password='x', rol='MEDICO')
+        self.paciente = crear_paciente('EXPE900101HDFRRN01')
+        NotaConsulta.objects.bulk_create([
+            NotaConsulta(paciente=self.paciente, medico=self.medico, diagnostico='Dx', tratamiento='Tx', evolucion='Ev')
+            for _ in range(3)
+        ])
+        RecetaDigital.objects.bulk_create([
+            RecetaDigital(paciente=self.paciente, medico=self.medico, diagnostico='Dx') for _ in range(3)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.medico)
+
+    def expediente(self, **params):
+        respuesta = self.client.get(f'/api/expediente/historial/{self.paciente.id}/',
+                                    {'secciones': 'notas,recetas', 'page_size': 2, **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_next_apunta_al_historial_de_cada_seccion(self):
+        datos = self.expediente()
+        for seccion, ruta in (('notas', 'notas'), ('recetas', 'recetas')):
+            self.assertEqual(len(datos[seccion]['results']), 2)
+            self.assertIn(f'/api/expediente/historial/{ruta}/{self.paciente.id}/?cursor=', datos[seccion]['next'])
+            self.assertIn('page_size=2', datos[seccion]['next'])
+
+            # El enlace continúa la sección donde terminó la primera página
+            siguiente = self.client.get(datos[seccion]['next']).json()
+            self.assertEqual(len(siguiente['results']), 1)
+            self.assertIsNone(siguiente['next'])
+
+    def test_cursor_en_la_peticion_no_afecta_las_secciones(self):
+        primera = self.expediente()
+        cursor_notas = primera['notas']['next'].split('cursor=')[1].split('&')[0]
+
+        for cursor in ('basura', cursor_notas):
+            datos = self.expediente(cursor=cursor)
+            self.assertEqual(datos['notas'], primera['notas'])
+            self.assertEqual(datos['recetas'], primera['recetas'])
+            self.assertIsNone(datos['notas']['previous'])
+
+
+class RecetaAltaTests(TestCase):
+    """ Emisión de recetas con sus medicamentos anidados (RB-012) y carga por lotes de Farmacia. """
+
+    def setUp(self):
+        self.medico = Personal.objects.create_user('MG-300', password='x', rol='MEDICO')
+        self.farmacia = Personal.objects.create_user('FA-300', password='x', rol='ADMIN_FARMACIA')
+        self.paciente = crear_paciente('RECE900101HDFRRN01')
+        self.client = APIClient()
+
+    def receta(self, **extra):
+        return {'paciente': self.paciente.id, 'diagnostico': 'Faringitis', 'talla': '1.70', 'peso': '70.50',
+                'detalles': [{'medicamento': 'Paracetamol', 'presentacion': 'Tabletas', 'dosificacion': 'c/8h'},
+                             {'medicamento': 'Loratadina', 'presentacion': 'Jarabe', 'dosificacion': 'c/24h'}],
+                **extra}
+
+    def emitir(self, datos):
+        self.client.force_authenticate(self.medico)
+        return self.client.post('/api/expediente/recetas/', datos, format='json')
+
+    def lote(self, usuario, recetas):
+        self.client.force_authenticate(usuario)
+        return self.client.post('/api/expediente/recetas/lote/', recetas, format='json')
+
+    def test_receta_con_detalles_en_un_solo_insert(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.emitir(self.receta())
+        self.assertEqual(respuesta.status_code, 201)
+
+        receta = RecetaDigital.objects.get(pk=respuesta.json()['id'])
+        self.assertEqual(receta.medico, self.medico)
+        self.assertEqual(receta.detalles.count(), 2)
+        tabla = DetalleMedicamento._meta.db_table
+        inserts = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith(f'INSERT INTO "{tabla}"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_detalles_vacios(self):
+        respuesta = self.emitir(self.receta(detalles=[]))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('detalles', respuesta.json())
+        self.assertFalse(RecetaDigital.objects.exists())
+
+    def test_medicamento_repetido(self):
+        repetido = {'medicamento': ' paracetamol ', 'presentacion': 'TABLETAS', 'dosificacion': 'c/12h'}
+        respuesta = self.emitir(self.receta(detalles=[*self.receta()['detalles'], repetido]))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('repetido', str(respuesta.json()['detalles']))
+
+    def test_lote_sin_medico_reporta_las_recetas(self):
+        respuesta = self.lote(self.farmacia, [self.receta(), self.receta(medico=self.medico.id), self.receta()])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['error'], 'E-R02')
+        self.assertEqual(respuesta.json()['recetas'], [0, 2])
+        self.assertFalse(RecetaDigital.objects.exists())
+
+    def test_lote_de_un_medico_queda_a_su_nombre(self):
+        otro = Personal.objects.create_user('MG-301', password='x', rol='MEDICO')
+        respuesta = self.lote(self.medico, [self.receta(), self.receta(medico=otro.id)])
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['creadas'], 2)
+        self.assertEqual(set(RecetaDigital.objects.values_list('medico_id', flat=True)), {self.medico.id})
+
+    def test_lote_con_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.lote(self.farmacia, [self.receta(medico=self.medico.id)] * 2).status_code, 201)
+
+        with self.assertNumQueries(len(consultas)):
+            respuesta = self.lote(self.farmacia, [self.receta(medico=self.medico.id)] * 50)
+        self.assertEqual(respuesta.json()['creadas'], 50)
+        self.assertEqual(DetalleMedicamento.objects.count(), 2 * 2 + 50 * 2)
+
+
+class VersionExpedienteTests(TestCase):
+    """ GET condicional de los historiales (una consulta para el 304) y escrituras que cambian la versión. """
+
+    def setUp(self):
+        invalidar_padron_mg()
+        cache_historiales.clear()
+        self.medico = Personal.objects.create_user('MG-400', password='x', rol='MEDICO')
+        self.paciente = crear_paciente('VERS900101HDFRRN01')
+        self.url = f'/api/expediente/historial/notas/{self.paciente.id}/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.medico)
+
+    def tearDown(self):
+        invalidar_padron_mg()
+
+    def version(self):
+        self.paciente.refresh_from_db()
+        return self.paciente.version_expediente
+
+    def assertIncrementa(self, escritura):
+        anterior = self.version()
+        escritura()
+        self.assertGreater(self.version(), anterior)
+
+    def nota(self):
+        return NotaConsulta.objects.create(paciente=self.paciente, medico=self.medico, diagnostico='Dx',
+                                           tratamiento='Tx', evolucion='Ev')
+
+    def test_if_none_match_responde_304_con_una_consulta(self):
+        self.nota()
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        self.nota()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_responde_304_con_una_consulta(self):
+        self.nota()
+        ultima_modificacion = self.client.get(self.url)['Last-Modified']
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=ultima_modificacion)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_escrituras_incrementan_la_version(self):
+        self.assertIncrementa(self.nota)
+
+        receta = RecetaDigital(paciente=self.paciente, medico=self.medico, diagnostico='Dx')
+        self.assertIncrementa(receta.save)
+        detalle = DetalleMedicamento(receta=receta, medicamento='Paracetamol', presentacion='Tabletas',
+                                     dosificacion='c/8h')
+        self.assertIncrementa(detalle.save)
+        # Edición de un medicamento con la receta sin cargar
+        detalle = DetalleMedicamento.objects.get(pk=detalle.pk)
+        detalle.dosificacion = 'c/12h'
+        self.assertIncrementa(detalle.save)
+
+        self.assertIncrementa(lambda: OrdenReferencia.objects.create(
+            paciente=self.paciente, medico_general=self.medico, especialidad_solicitada='Cardiología',
+            motivo_referencia='Soplo'))
+
+        agenda = Agenda.objects.create(medico=self.medico, dia=0, hora_inicio=time(8, 0), hora_fin=time(9, 0),
+                                       consultorio='C-40')
+        cita = Cita(agenda=agenda, paciente=self.paciente, tipo_cita='MG',
+                    fecha_hora=timezone.now() + timedelta(days=30))
+        self.assertIncrementa(cita.save)
+        self.assertIncrementa(cita.delete)
+
+    def test_escrituras_en_bloque_incrementan_la_version(self):
+        self.client.post('/api/expediente/recetas/lote/', [{
+            'paciente': self.paciente.id, 'diagnostico': 'Dx',
+            'detalles': [{'medicamento': 'Paracetamol', 'presentacion': 'Tabletas', 'dosificacion': 'c/8h'}],
+        }], format='json')
+        self.assertEqual(self.version(), 1)
+
+        dia = (timezone.localdate() + timedelta(days=1)).weekday()
+        Agenda.objects.create(medico=self.medico, dia=dia, hora_inicio=time(8, 0), hora_fin=time(9, 0),
+                              consultorio='C-41')
+        self.assertIn('cita_id', autoasignar_citas_lote([self.paciente.id])[0])
+        self.assertEqual(self.version(), 2)
+
+
+class CacheHistorialTests(TestCase):
+    """ Las respuestas 200 en JSON de los historiales se sirven de cache_historiales mientras no cambie la versión. """
+
+    def setUp(self):
+        cache_historiales.clear()
+        self.medico = Personal.objects.create_user('MG-500', password='x', rol='MEDICO')
+        self.paciente = crear_paciente('CACH900101HDFRRN01')
+        self.url = f'/api/expediente/historial/notas/{self.paciente.id}/'
+        self.nota('Faringitis')
+        self.client = APIClient()
+        self.client.force_authenticate(self.medico)
+
+    def nota(self, diagnostico):
+        NotaConsulta.objects.create(paciente=self.paciente, medico=self.medico, diagnostico=diagnostico,
+                                    tratamiento='Tx', evolucion='Ev')
+
+    def test_segunda_peticion_desde_cache(self):
+        primera = self.client.get(self.url)
+        with self.assertNumQueries(1), \
+                mock.patch.object(NotaConsultaProyeccion, 'representar') as representar:
+            segunda = self.client.get(self.url)
+        representar.assert_not_called()
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda['Content-Type'], 'application/json')
+
+    def test_escritura_cambia_la_clave(self):
+        self.client.get(self.url)
+        self.nota('Otitis')
+        diagnosticos = [nota['diagnostico'] for nota in self.client.get(self.url).json()['results']]
+        self.assertEqual(sorted(diagnosticos), ['Faringitis', 'Otitis'])
+
+    def test_no_cachea_errores_ni_otros_formatos(self):
+        with mock.patch.object(cache_historiales, 'set') as guardar:
+            self.assertEqual(self.client.get(self.url, {'cursor': 'basura'}).status_code, 404)
+            self.assertEqual(self.client.get(self.url, HTTP_ACCEPT='text/html').status_code, 200)
+            # Paciente inexistente: sin versión no hay clave
+            otro = self.client.get(f'/api/expediente/historial/notas/{self.paciente.id + 1}/')
+            self.assertEqual(otro.json()['results'], [])
+        guardar.assert_not_called()
+
+
+class ProyeccionesTests(TestCase):
+    """
+    Cada Proyeccion produce exactamente los bytes de su serializador (hospital_project.proyecciones):
+    acentos, decimales, nulos, fechas y nombres de médico vacíos.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medico = Personal.objects.create_user('MG-600', password='x', rol='MEDICO',
+                                                  first_name='José Ángel', last_name='Muñoz Peña')
+        cls.sin_nombre = Personal.objects.create_user('MG-601', password='x', rol='MEDICO')
+        cls.pacientes = [
+            Paciente.objects.create(CURP='MUNI900101HDFRRN01', nombre='Íñigo', apellidos='Núñez Güemes',
+                                    direccion='Av. Reforma 1\u2028Piso 2', fecha_nacimiento='1990-01-01',
+                                    tipo='A', RFC='NUGI900101AB1'),
+            crear_paciente('PROY900101HDFRRN02'),
+        ]
+        paciente = cls.pacientes[0]
+        for medico in (cls.medico, cls.sin_nombre):
+            NotaConsulta.objects.create(paciente=paciente, medico=medico, diagnostico='Otitis media aguda',
+                                        tratamiento='Amoxicilina', evolucion='Favorable 😊',
+                                        procedimientos='Otoscopía' if medico == cls.medico else None)
+            OrdenReferencia.objects.create(paciente=paciente, medico_general=medico,
+                                           especialidad_solicitada='Otorrinolaringología',
+                                           motivo_referencia='Otitis de repetición')
+        for talla, peso in ((Decimal('1.7'), Decimal('70.5')), (None, None), (Decimal('0.55'), Decimal('999.99'))):
+            receta = RecetaDigital.objects.create(paciente=paciente, medico=cls.medico, diagnostico='Faringitis',
+                                                  talla=talla, peso=peso)
+            if talla is not None:
+                DetalleMedicamento.objects.create(receta=receta, medicamento='Paracetamol', presentacion='Tabletas',
+                                                  dosificacion='1 c/8h por 3 días', cantidad=2)
+        agenda = Agenda.objects.create(medico=cls.sin_nombre, dia=0, hora_inicio=time(8, 0), hora_fin=time(9, 0),
+                                       consultorio='Consultorio Nº 3')
+        Cita.objects.create(agenda=agenda, paciente=paciente, tipo_cita='MG',
+                            fecha_hora=timezone.now().replace(microsecond=123456) + timedelta(days=3))
+
+    def assertMismaRepresentacion(self, serializador, proyeccion, queryset):
+        queryset = queryset.order_by('id')
+        esperado = JSONRenderer().render(serializador(queryset, many=True).data)
+        proyectado = JSONRapidoRenderer().render(proyeccion.representar(proyeccion.consulta(queryset)))
+        self.assertEqual(proyectado, esperado)
+
+    def test_pacientes(self):
+        self.assertMismaRepresentacion(PacienteSerializer, PacienteProyeccion(), Paciente.objects.all())
+
+    def test_notas(self):
+        self.assertMismaRepresentacion(NotaConsultaSerializer, NotaConsultaProyeccion(), NotaConsulta.objects.all())
+
+    def test_recetas(self):
+        self.assertMismaRepresentacion(RecetaDigitalSerializer, RecetaDigitalProyeccion(), RecetaDigital.objects.all())
+
+    def test_ordenes(self):
+        self.assertMismaRepresentacion(OrdenReferenciaSerializer, OrdenReferenciaProyeccion(),
+                                       OrdenReferencia.objects.all())
+
+    def test_citas(self):
+        self.assertMismaRepresentacion(CitaReadSerializer, CitaReadProyeccion(), Cita.objects.all())
+
+
+class ExportacionTests(TestCase):
+    """ Exportación de registros clínicos (NDJSON/CSV) solo para el Super Administrador. """
+
+    def setUp(self):
+        self.medico = Personal.objects.create_user('MG-800', password='x', rol='MEDICO',
+                                                   first_name='Ana', last_name='Núñez')
+        self.paciente = crear_paciente('EXPO900101HDFRRN01')
+        self.notas = [
+            NotaConsulta.objects.create(paciente=self.paciente, medico=self.medico, diagnostico=f'Dx {i}',
+                                        tratamiento='Tx', evolucion='Ev')
+            for i in range(3)
+        ]
+        self.con_detalles = RecetaDigital.objects.create(paciente=self.paciente, medico=self.medico,
+                                                         diagnostico='Faringitis', talla=Decimal('1.7'))
+        for medicamento in ('Paracetamol', 'Amoxicilina'):
+            DetalleMedicamento.objects.create(receta=self.con_detalles, medicamento=medicamento,
+                                              presentacion='Tabletas', dosificacion='c/8h')
+        self.sin_detalles = RecetaDigital.objects.create(paciente=self.paciente, medico=self.medico,
+                                                         diagnostico='Control')
+        self.client = APIClient()
+        self.client.force_authenticate(Personal.objects.create_user('AD-800', password='x', rol='ADMIN_SUPER'))
+
+    def exportar(self, **params):
+        respuesta = self.client.get('/api/expediente/exportar/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return b''.join(respuesta.streaming_content).decode('utf-8')
+
+    def historial(self, seccion):
+        respuesta = self.client.get(f'/api/expediente/historial/{seccion}/{self.paciente.id}/', {'page_size': 50})
+        return sorted(respuesta.json()['results'], key=lambda registro: registro['id'])
+
+    def test_ndjson_igual_que_la_api(self):
+        for entidad in ('notas', 'recetas'):
+            lineas = self.exportar(entidad=entidad).splitlines()
+            self.assertEqual([json.loads(linea) for linea in lineas], self.historial(entidad))
+
+    def test_csv_una_fila_por_medicamento(self):
+        filas = list(csv.DictReader(io.StringIO(self.exportar(entidad='recetas', formato='csv'))))
+        self.assertEqual([(int(fila['id']), fila['detalles_medicamento']) for fila in filas], [
+            (self.con_detalles.id, 'Paracetamol'),
+            (self.con_detalles.id, 'Amoxicilina'),
+            (self.sin_detalles.id, ''),
+        ])
+        self.assertEqual(filas[0]['talla'], '1.70')
+        self.assertEqual(filas[0]['detalles_presentacion'], 'Tabletas')
+        self.assertNotIn('detalles', filas[0])
+
+    def test_filtro_por_fechas(self):
+        for nota, dia in zip(self.notas, (1, 2, 3)):
+            fecha = timezone.make_aware(datetime(2026, 3, dia, 23, 30))
+            NotaConsulta.objects.filter(pk=nota.pk).update(fecha_registro=fecha)
+
+        lineas = self.exportar(entidad='notas', desde='2026-03-02', hasta='2026-03-03').splitlines()
+        self.assertEqual([json.loads(linea)['id'] for linea in lineas], [self.notas[1].id, self.notas[2].id])
+        lineas = self.exportar(entidad='notas', hasta=date(2026, 3, 1).isoformat()).splitlines()
+        self.assertEqual([json.loads(linea)['id'] for linea in lineas], [self.notas[0].id])
+
+    def test_parametros_invalidos(self):
+        for params in ({'entidad': 'pacientes'}, {'entidad': 'notas', 'formato': 'xml'}, {},
+                       {'entidad': 'notas', 'desde': '2026-03-02', 'hasta': '2026-03-01'}):
+            self.assertEqual(self.client.get('/api/expediente/exportar/', params).status_code, 400)
+
+    def test_solo_super_administrador(self):
+        for rol in ('MEDICO', 'ADMIN_RECEPCION', 'ADMIN_ESTUDIOS', 'ADMIN_FARMACIA'):
+            cliente = APIClient()
+            cliente.force_authenticate(Personal.objects.create_user(f'X-{rol}', password='x', rol=rol))
+            self.assertEqual(cliente.get('/api/expediente/exportar/', {'entidad': 'notas'}).status_code, 403)
+        self.assertEqual(APIClient().get('/api/expediente/exportar/', {'entidad': 'notas'}).status_code, 401)
+
+
+class RecetaDocumentoTests(TestCase):
+    """ Documento de la receta: se genera una vez por versión de los datos y se revalida con su ETag. """
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(RECETAS_DOCUMENTOS_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        medico = Personal.objects.create_user('MG-900', password='x', rol='MEDICO', first_name='Ana', last_name='Ruiz')
+        self.receta = RecetaDigital.objects.create(paciente=crear_paciente('DOCU900101HDFRRN01'), medico=medico,
+                                                   diagnostico='Faringitis')
+        self.detalle = DetalleMedicamento.objects.create(receta=self.receta, medicamento='Paracetamol',
+                                                         presentacion='Tabletas', dosificacion='c/8h')
+        self.url = f'/api/expediente/recetas/{self.receta.id}/documento/'
+        self.client = APIClient()
+        self.client.force_authenticate(medico)
+
+        self.render_pdf = mock.Mock(wraps=documentos.render_pdf)
+        renderizadores = mock.patch.dict(documentos.RENDERIZADORES, {'pdf': self.render_pdf})
+        renderizadores.start()
+        self.addCleanup(renderizadores.stop)
+
+    def test_etag_y_304_sin_regenerar(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+        etag = respuesta['ETag']
+
+        # Segunda descarga: desde disco, sin volver a generar el PDF
+        self.assertEqual(self.client.get(self.url)['ETag'], etag)
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(self.render_pdf.call_count, 1)
+
+    def test_editar_un_medicamento_cambia_el_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.detalle.dosificacion = 'c/12h'
+        self.detalle.save()
+
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(self.render_pdf.call_count, 2)
+
+    def test_formato_no_soportado(self):
+        respuesta = self.client.get(self.url, {'formato': 'docx'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['error'], 'E-R03')
@@ -1,6 +1,6 @@
 from django.urls import path
-from .views import (PacienteListCreateAPIView, NotaConsultaCreateAPIView, RecetaCreateAPIView, OrdenReferenciaCreateAPIView, 
-                    NotaConsultaListAPIView, RecetaDigitalListAPIView, PacienteLookupAPIView)
+from .views import (PacienteListCreateAPIView, NotaConsultaCreateAPIView, RecetaCreateAPIView, RecetaLoteCreateAPIView, RecetaDocumentoAPIView, OrdenReferenciaCreateAPIView, 
+                    NotaConsultaListAPIView, RecetaDigitalListAPIView, OrdenReferenciaListAPIView, ExpedienteAPIView, ExportacionAPIView, PacienteLookupAPIView)
 
 urlpatterns = [
     # /api/expediente/pacientes/ -> GET: Buscar, POST: Crear Paciente
@@ -12,6 +12,12 @@ urlpatterns = [
     # /api/expediente/recetas/ -> POST: Emitir Receta Digital 
     path('recetas/', RecetaCreateAPIView.as_view(), name='receta-create'),
 
+    # /api/expediente/recetas/lote/ -> POST: Registrar un lote de recetas (carga de Farmacia)
+    path('recetas/lote/', RecetaLoteCreateAPIView.as_view(), name='receta-lote-create'),
+
+    # /api/expediente/recetas/{receta_id}/documento/?formato=pdf|html -> GET: Documento de la receta
+    path('recetas/<int:receta_id>/documento/', RecetaDocumentoAPIView.as_view(), name='receta-documento'),
+
     # /api/expediente/ordenes/ -> POST: Emitir Orden de Referencia
     path('ordenes/', OrdenReferenciaCreateAPIView.as_view(), name='orden-referencia-create'),
 
@@ -21,6 +27,15 @@ urlpatterns = [
     # Historial de Lectura: /api/expediente/historial/recetas/{paciente_id}/
     path('historial/recetas/<int:paciente_id>/', RecetaDigitalListAPIView.as_view(), name='historial-recetas'),
 
+    # Historial de Lectura: /api/expediente/historial/ordenes/{paciente_id}/
+    path('historial/ordenes/<int:paciente_id>/', OrdenReferenciaListAPIView.as_view(), name='historial-ordenes'),
+
+    # Expediente completo en una petición: /api/expediente/historial/{paciente_id}/?secciones=notas,recetas
+    path('historial/<int:paciente_id>/', ExpedienteAPIView.as_view(), name='historial-expediente'),
+
+    # Exportación para Administración: /api/expediente/exportar/?entidad=notas&formato=csv&desde=...&hasta=...
+    path('exportar/', ExportacionAPIView.as_view(), name='exportacion'),
+
     # RUTA PÚBLICA: Para que el paciente valide su CURP
     path('lookup/', PacienteLookupAPIView.as_view(), name='paciente-lookup'),
 ]
\ No newline at end of file
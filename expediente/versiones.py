@@ -0,0 +1,84 @@
+# expediente/versiones.py
+"""
+Versión del expediente de cada paciente: un contador en Paciente que se incrementa en la BD
+con cada escritura de sus datos, notas, recetas (y medicamentos), órdenes de referencia y citas
+(ver expediente/signals.py). Es el validador de las peticiones condicionales de los historiales
+y forma parte de la clave de la cache de sus respuestas.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+
+from hospital_project.cache import CacheTTL
+from hospital_project.condicional import condicional, validadores_peticion
+from hospital_project.metricas import medir_serializacion
+from .models import Paciente
+
+# Respuestas JSON ya renderizadas de los historiales. No se invalidan: al cambiar la versión cambia la clave
+# y las entradas viejas ya no se piden (las retira el LRU o el TTL). Con HISTORIAL_CACHE_BACKEND
+# se guardan en un alias de CACHES (p. ej. la cache en disco 'historiales') compartido entre workers.
+cache_historiales = CacheTTL(
+    'historiales',
+    ttl=settings.HISTORIAL_CACHE_TTL,
+    max_entradas=settings.HISTORIAL_CACHE_MAX_ENTRADAS,
+    backend=settings.HISTORIAL_CACHE_BACKEND,
+)
+
+
+def incrementar_version(*pacientes_ids):
+    """ Un solo UPDATE atómico (F()) para todos los pacientes afectados por una escritura. """
+    ids = {paciente_id for paciente_id in pacientes_ids if paciente_id is not None}
+    if ids:
+        Paciente.objects.filter(id__in=ids).update(
+            version_expediente=F('version_expediente') + 1, expediente_modificado=timezone.now()
+        )
+
+
+def validadores_expediente(request, paciente_id, *args, **kwargs):
+    """
+    ETag y Last-Modified de los historiales de un paciente (hospital_project.condicional).
+    La versión se lee antes que los registros: si una escritura llega en medio, la respuesta
+    queda marcada con la versión anterior y la siguiente petición simplemente la vuelve a descargar.
+    """
+    fila = (Paciente.objects.filter(id=paciente_id)
+            .values_list('version_expediente', 'expediente_modificado').first())
+    if fila is None:
+        return None
+    version, modificado = fila
+    return f"expediente-{paciente_id}-v{version}", modificado
+
+
+def cachear_historial(vista):
+    """
+    Lectura a través de cache_historiales para el get() de un historial. La clave es
+    (endpoint, paciente y versión, página): la página es la URL completa (cursor, page_size, secciones y host,
+    porque los enlaces `next` son absolutos). Solo se cachean las respuestas 200 en JSON.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        validadores = validadores_peticion(request)
+        if validadores is None or request.accepted_renderer.format != 'json':
+            return vista(request, *args, **kwargs)
+
+        pagina = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()[:20]
+        clave = f"{request.resolver_match.url_name}:{validadores[0]}:{pagina}"
+        contenido = cache_historiales.get(clave)
+        if contenido is None:
+            respuesta = vista(request, *args, **kwargs)
+            if respuesta.status_code != 200:
+                return respuesta
+            with medir_serializacion():
+                contenido = request.accepted_renderer.render(
+                    respuesta.data, request.accepted_media_type, {'request': request, 'response': respuesta})
+            cache_historiales.set(clave, contenido)
+        return HttpResponse(contenido, content_type=request.accepted_renderer.media_type)
+    return envoltura
+
+
+def historial_versionado(vista):
+    """ GET condicional y cache de respuestas, ambos con la versión del expediente (una consulta por petición). """
+    return condicional(validadores_expediente)(cachear_historial(vista))
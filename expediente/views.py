@@ -1,16 +1,37 @@
+import copy
+
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import generics, permissions, status
+from rest_framework.request import Request
 from rest_framework.response import Response
-from django.db.models import Q
+from rest_framework.views import APIView
+from rest_framework.utils.urls import replace_query_param
 from .models import Paciente, NotaConsulta, RecetaDigital, OrdenReferencia
-from .serializers import PacienteSerializer, NotaConsultaSerializer, RecetaDigitalSerializer, OrdenReferenciaSerializer, PacientePublicSerializer
-from personal.permissions import IsDoctorOrAdmin # Necesitaremos definir este permiso
+from .serializers import (PacienteSerializer, NotaConsultaSerializer, RecetaDigitalSerializer, OrdenReferenciaSerializer,
+                          PacienteProyeccion, NotaConsultaProyeccion, RecetaDigitalProyeccion, OrdenReferenciaProyeccion)
+from .busqueda import buscar_pacientes, paciente_por_curp
+from .documentos import FORMATOS, datos_receta, huella, obtener_documento
+from .exportacion import FORMATOS as FORMATOS_EXPORTACION, ExportacionQuerySerializer, exportar
+from .pagination import NotaConsultaCursorPagination, RecetaDigitalCursorPagination, OrdenReferenciaCursorPagination
+from .versiones import historial_versionado
+from agenda.views import CitasPacienteListAPIView
+from hospital_project.metricas import medir_serializacion
+from hospital_project.proyecciones import ListadoProyectadoMixin
+from hospital_project.renderers import RENDERERS_LISTADOS
+from personal.models import Personal
+from personal.permissions import DOCTOR_ROLES, IsDoctorOrAdmin, IsSuperAdmin # Necesitaremos definir este permiso
 
 # --- Permisos: Asegurar que solo personal autenticado pueda usar esta API ---
 # Nota: La clase IsDoctorOrAdmin la definiremos después del código de las vistas.
 
 # 1. API para Buscar y Crear Pacientes (CU-A02.5 y CU-A02.1)
-class PacienteListCreateAPIView(generics.ListCreateAPIView):
+class PacienteListCreateAPIView(ListadoProyectadoMixin, generics.ListCreateAPIView):
     serializer_class = PacienteSerializer
+    proyeccion = PacienteProyeccion()
+    renderer_classes = RENDERERS_LISTADOS
     # Permiso: Solo Médicos y Administradores (Recepción) pueden acceder
     permission_classes = [permissions.IsAuthenticated, IsDoctorOrAdmin] 
 
@@ -18,17 +39,12 @@ class PacienteListCreateAPIView(generics.ListCreateAPIView):
         """
         Permite buscar pacientes por nombre, CURP o expediente (id). (RF-M03)
         """
-        queryset = Paciente.objects.all()
         query = self.request.query_params.get('search', None)
         
         if query:
-            queryset = queryset.filter(
-                Q(CURP__icontains=query) |
-                Q(nombre__icontains=query) |
-                Q(apellidos__icontains=query) |
-                Q(id__iexact=query)
-            )
-        return queryset
+            # Búsqueda indexada sin acentos ni mayúsculas, ordenada por relevancia (expediente.busqueda)
+            return buscar_pacientes(query)
+        return Paciente.objects.all()
 
 # 2. API para Crear Nota de Consulta (Actualizar Expediente - RF-020)
 class NotaConsultaCreateAPIView(generics.CreateAPIView):
@@ -58,6 +74,111 @@ class RecetaCreateAPIView(generics.CreateAPIView):
         # (Se pasa al serializador para el método create())
         serializer.save(medico=self.request.user)
 
+def _ids_en_lote(datos, campo):
+    """ IDs enteros del campo `campo` en una lista de objetos JSON (los inválidos los reporta el serializador). """
+    ids = set()
+    for item in datos:
+        try:
+            ids.add(int(item.get(campo)))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return ids
+
+class RecetaLoteCreateAPIView(generics.GenericAPIView):
+    """
+    API para registrar un lote de recetas (carga de fin de turno de Farmacia).
+    Se valida todo el lote y se guarda en una transacción con un número constante de consultas:
+    pacientes y médicos se precargan en bloque y recetas y medicamentos se insertan con bulk_create.
+    Si quien envía es Médico, las recetas quedan a su nombre; si no, cada receta debe indicar `medico`.
+    """
+    serializer_class = RecetaDigitalSerializer
+    permission_classes = [permissions.IsAuthenticated, IsDoctorOrAdmin]
+    max_recetas = 500
+
+    def post(self, request, *args, **kwargs):
+        datos = request.data
+        if not isinstance(datos, list):
+            return Response({"error": "E-R01", "message": "Se esperaba una lista de recetas."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        contexto = self.get_serializer_context()
+        contexto['pacientes_precargados'] = Paciente.objects.in_bulk(_ids_en_lote(datos, 'paciente'))
+        contexto['medicos_precargados'] = Personal.objects.filter(rol='MEDICO').in_bulk(_ids_en_lote(datos, 'medico'))
+
+        serializer = RecetaDigitalSerializer(
+            data=datos, many=True, allow_empty=False, max_length=self.max_recetas, context=contexto
+        )
+        serializer.is_valid(raise_exception=True)
+
+        if request.user.rol in DOCTOR_ROLES:
+            recetas = serializer.save(medico=request.user)
+        else:
+            sin_medico = [i for i, receta in enumerate(serializer.validated_data) if 'medico' not in receta]
+            if sin_medico:
+                return Response({"error": "E-R02", "message": "Cada receta debe indicar el médico que la emitió.",
+                                 "recetas": sin_medico}, status=status.HTTP_400_BAD_REQUEST)
+            recetas = serializer.save()
+
+        return Response({"creadas": len(recetas), "ids": [receta.id for receta in recetas]},
+                        status=status.HTTP_201_CREATED)
+
+class RecetaDocumentoAPIView(generics.GenericAPIView):
+    """
+    API para descargar el documento de una receta (NOM-024, RB-012) en HTML o PDF (?formato=pdf).
+    El documento se genera una sola vez por versión de los datos y se sirve desde disco;
+    el ETag es el hash de los datos, así que si el cliente ya lo tiene se responde 304 sin leer el archivo.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, receta_id, *args, **kwargs):
+        formato = request.query_params.get('formato', 'pdf')
+        if formato not in FORMATOS:
+            return Response({"error": "E-R03", "message": f"Formato no soportado. Opciones: {', '.join(FORMATOS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        receta = (RecetaDigital.objects.select_related('medico', 'paciente')
+                  .prefetch_related('detalles').filter(id=receta_id).first())
+        if receta is None:
+            return Response({"detail": "Receta no encontrada."}, status=status.HTTP_404_NOT_FOUND)
+
+        datos = datos_receta(receta)
+        clave = huella(datos)
+        etag = quote_etag(f"{clave}-{formato}")
+        cabeceras = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            respuesta = HttpResponseNotModified()
+        else:
+            ruta = obtener_documento(datos, formato, clave=clave)
+            respuesta = FileResponse(
+                open(ruta, 'rb'), content_type=FORMATOS[formato],
+                as_attachment=formato == 'pdf', filename=f"receta-{receta.id}.{formato}"
+            )
+        for nombre, valor in cabeceras.items():
+            respuesta[nombre] = valor
+        return respuesta
+
+class ExportacionAPIView(generics.GenericAPIView):
+    """
+    API del Super Administrador para extraer registros clínicos completos (auditorías, reportes NOM):
+    ?entidad=notas|recetas|citas|ordenes&formato=ndjson|csv&desde=AAAA-MM-DD&hasta=AAAA-MM-DD.
+    La respuesta se genera en streaming mientras se lee la BD, con memoria constante.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsSuperAdmin]
+
+    def get(self, request, *args, **kwargs):
+        parametros = ExportacionQuerySerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        datos = parametros.validated_data
+
+        nombre = '-'.join([datos['entidad']] + [str(datos[campo]) for campo in ('desde', 'hasta') if datos.get(campo)])
+        respuesta = StreamingHttpResponse(
+            exportar(datos['entidad'], datos['formato'], datos.get('desde'), datos.get('hasta')),
+            content_type=FORMATOS_EXPORTACION[datos['formato']],
+        )
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.{datos["formato"]}"'
+        return respuesta
+
 class OrdenReferenciaCreateAPIView(generics.CreateAPIView):
     """
     API para que el Médico General emita una orden de referencia (RF-017, RB-006).
@@ -70,41 +191,138 @@ class OrdenReferenciaCreateAPIView(generics.CreateAPIView):
         # Asegura que el médico emisor sea el usuario autenticado
         serializer.save(medico_general=self.request.user)
 
-class NotaConsultaListAPIView(generics.ListAPIView):
+@method_decorator(historial_versionado, name='get')
+class NotaConsultaListAPIView(ListadoProyectadoMixin, generics.ListAPIView):
     """
     API para listar el historial de Notas de Consulta de un paciente.
+    Admite GET condicional (ETag/Last-Modified) con la versión del expediente: 304 sin leer las notas.
     """
     serializer_class = NotaConsultaSerializer
+    proyeccion = NotaConsultaProyeccion()
+    renderer_classes = RENDERERS_LISTADOS
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotaConsultaCursorPagination
 
     def get_queryset(self):
-        # Filtra solo las notas del paciente especificado en la URL
+        # Filtra solo las notas del paciente especificado en la URL (el orden lo fija la paginación)
         paciente_id = self.kwargs['paciente_id']
-        return NotaConsulta.objects.filter(paciente_id=paciente_id).order_by('-fecha_registro')
+        # select_related: medico_nombre se lee del médico de cada nota sin una consulta por fila
+        return NotaConsulta.objects.filter(paciente_id=paciente_id).select_related('medico')
 
-class RecetaDigitalListAPIView(generics.ListAPIView):
+@method_decorator(historial_versionado, name='get')
+class RecetaDigitalListAPIView(ListadoProyectadoMixin, generics.ListAPIView):
     """
     API para listar el historial de Recetas Digitales de un paciente.
     """
     serializer_class = RecetaDigitalSerializer
+    proyeccion = RecetaDigitalProyeccion()
+    renderer_classes = RENDERERS_LISTADOS
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RecetaDigitalCursorPagination
+
+    def get_queryset(self):
+        # Filtra solo las recetas del paciente especificado en la URL (el orden lo fija la paginación)
+        paciente_id = self.kwargs['paciente_id']
+        # Médico por JOIN y todos los detalles de la página en una sola consulta adicional
+        return RecetaDigital.objects.filter(paciente_id=paciente_id).select_related('medico').prefetch_related('detalles')
+
+@method_decorator(historial_versionado, name='get')
+class OrdenReferenciaListAPIView(ListadoProyectadoMixin, generics.ListAPIView):
+    """
+    API para listar el historial de Órdenes de Referencia de un paciente.
+    """
+    serializer_class = OrdenReferenciaSerializer
+    proyeccion = OrdenReferenciaProyeccion()
+    renderer_classes = RENDERERS_LISTADOS
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrdenReferenciaCursorPagination
 
     def get_queryset(self):
-        # Filtra solo las recetas del paciente especificado en la URL
         paciente_id = self.kwargs['paciente_id']
-        return RecetaDigital.objects.filter(paciente_id=paciente_id).order_by('-fecha_emision')
+        # medico_general_numero se lee del médico emisor por JOIN
+        return OrdenReferencia.objects.filter(paciente_id=paciente_id).select_related('medico_general')
 
-class PacienteLookupAPIView(generics.ListAPIView):
+class PacienteLookupAPIView(APIView):
     """
     API pública para que el PACIENTE valide su CURP y obtenga su ID. (CU-PAC-001)
+    Devuelve una lista con {id, CURP, nombre, apellidos} del paciente, o vacía si la CURP no existe.
     """
-    serializer_class = PacientePublicSerializer
     # PERMISO CRÍTICO: Permitir a CUALQUIERA acceder para validar el CURP.
     permission_classes = [permissions.AllowAny]
 
-    def get_queryset(self):
-        query = self.request.query_params.get('curp', None)
-        # Búsqueda estricta por el CURP
-        if query:
-            return Paciente.objects.filter(CURP__iexact=query)
-        return Paciente.objects.none() # No devolver nada si no hay CURP
\ No newline at end of file
+    def get(self, request, *args, **kwargs):
+        # Ruta caliente: cada visita del paciente empieza aquí. Igualdad exacta sobre el índice único
+        # de la CURP (ver paciente_por_curp) y los logins repetidos se sirven de cache.
+        paciente = paciente_por_curp(request.query_params.get('curp', None))
+        return Response([paciente] if paciente else [])
+
+# Secciones del expediente unificado. Cada historial aporta su consulta, paginación y serializador,
+# y su ruta es la que se usa en el enlace `next` para seguir cargando esa sección.
+HISTORIALES_EXPEDIENTE = {
+    'notas': (NotaConsultaListAPIView, 'historial-notas'),
+    'recetas': (RecetaDigitalListAPIView, 'historial-recetas'),
+    'citas': (CitasPacienteListAPIView, 'citas-paciente-list'),
+    'ordenes': (OrdenReferenciaListAPIView, 'historial-ordenes'),
+}
+SECCIONES_EXPEDIENTE = ('paciente', *HISTORIALES_EXPEDIENTE)
+
+@method_decorator(historial_versionado, name='get')
+class ExpedienteAPIView(generics.GenericAPIView):
+    """
+    API del expediente clínico de un paciente en una sola petición (RF-020): sus datos y la primera
+    página de notas, recetas (con medicamentos), citas y órdenes de referencia.
+    ?secciones=notas,recetas devuelve solo las secciones que el cliente va a mostrar.
+    El número de consultas es fijo (una por sección y dos para recetas), sin importar cuántos registros haya.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = RENDERERS_LISTADOS
+
+    def get(self, request, paciente_id, *args, **kwargs):
+        solicitadas = request.query_params.get('secciones')
+        secciones = [s.strip() for s in solicitadas.split(',') if s.strip()] if solicitadas else SECCIONES_EXPEDIENTE
+        desconocidas = [seccion for seccion in secciones if seccion not in SECCIONES_EXPEDIENTE]
+        if desconocidas:
+            return Response({"error": "E-H01", "message": f"Secciones no válidas: {', '.join(desconocidas)}. "
+                                                          f"Opciones: {', '.join(SECCIONES_EXPEDIENTE)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        paciente = Paciente.objects.filter(id=paciente_id).first()
+        if paciente is None:
+            return Response({"detail": "Paciente no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        datos = {}
+        if 'paciente' in secciones:
+            with medir_serializacion():
+                datos['paciente'] = PacienteSerializer(paciente).data
+        for seccion, (vista_clase, nombre_url) in HISTORIALES_EXPEDIENTE.items():
+            if seccion in secciones:
+                datos[seccion] = self.pagina_historial(vista_clase, nombre_url, paciente_id)
+        return Response(datos)
+
+    def pagina_historial(self, vista_clase, nombre_url, paciente_id):
+        """ Primera página de un historial, tal como la devolvería su propia vista (con su proyección). """
+        request = self.request
+        vista = vista_clase()
+        vista.setup(request, paciente_id=paciente_id)
+        vista.format_kwarg = None
+
+        paginador = vista.pagination_class()
+        # Cada sección empieza en su primera página: un ?cursor= en esta URL no pertenece a ninguna de ellas
+        consulta = request.query_params.copy()
+        consulta.pop(paginador.cursor_query_param, None)
+        primera_pagina = copy.copy(request._request)
+        primera_pagina.GET = consulta
+        pagina = paginador.paginate_queryset(vista.proyeccion.consulta(vista.get_queryset()),
+                                             Request(primera_pagina), view=vista)
+        # Los enlaces apuntan al historial de la sección (con el mismo tamaño de página), no a esta vista
+        paginador.base_url = request.build_absolute_uri(reverse(nombre_url, kwargs={'paciente_id': paciente_id}))
+        if paginador.page_size_query_param in request.query_params:
+            paginador.base_url = replace_query_param(
+                paginador.base_url, paginador.page_size_query_param, paginador.page_size)
+        with medir_serializacion():
+            resultados = vista.proyeccion.representar(pagina)
+        return {
+            'next': paginador.get_next_link(),
+            'previous': paginador.get_previous_link(),
+            'results': resultados,
+        }
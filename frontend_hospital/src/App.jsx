@@ -1,4 +1,6 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
+import axios from 'axios';
+import { cerrarSesionLocal, haySesion, instalarRenovacion } from './sesion';
 import LoginComponent from './components/Login';
 import DoctorPanel from './components/Doctor/DoctorPanel';
 import PatientLogin from './components/Patient/PatientLogin'; 
@@ -6,8 +8,11 @@ import PatientPanel from './components/Patient/PatientPanel';
 import RescheduleSelect from './components/Patient/RescheduleSelect';
 import SuperAdminPanel from './components/Admin/SuperAdminPanel';
 
+//const API_LOGOUT_URL = 'http://127.0.0.1:8000/api/personal/logout/';
+const API_LOGOUT_URL = 'https://sistemahospitalario-production.up.railway.app/api/personal/logout/';
+
 const getInitialView = () => {
-    if (localStorage.getItem('authToken')) return 'doctor';
+    if (haySesion()) return 'doctor';
     return 'login'; // Mostrará la vista de inicio (podríamos crear una landing, pero por ahora login)
 };
 
@@ -15,6 +20,9 @@ function App() {
     const [view, setView] = useState(getInitialView());
     const [patientData, setPatientData] = useState(null);
 
+    // Token caducado: se renueva y se repite la petición; si ya no se puede renovar, vuelve al login
+    useEffect(() => instalarRenovacion(() => setView('login')), []);
+
     const userRole = localStorage.getItem('userRole');
 
     const handleDoctorLoginSuccess = (rol) => {
@@ -38,8 +46,12 @@ function App() {
     
     // Función de Logout (para Médico)
     const handleLogout = () => {
-        localStorage.removeItem('authToken');
-        localStorage.removeItem('userRole');
+        // Revocar el token en el servidor; la sesión local se cierra aunque la petición falle
+        const token = localStorage.getItem('authToken');
+        if (token) {
+            axios.post(API_LOGOUT_URL, null, { headers: { Authorization: `Token ${token}` } }).catch(() => {});
+        }
+        cerrarSesionLocal();
         setView('login');
     };
     
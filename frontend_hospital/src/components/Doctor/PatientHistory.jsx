@@ -6,6 +6,8 @@ const API_BASE_URL = 'https://sistemahospitalario-production.up.railway.app/api/
 
 function PatientHistory({ patientId }) {
     const [history, setHistory] = useState({ notes: [], recipes: [] });
+    // URLs de la siguiente página de cada historial (paginación por cursor)
+    const [nextPages, setNextPages] = useState({ notes: null, recipes: null });
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const token = localStorage.getItem('authToken');
@@ -23,19 +25,21 @@ function PatientHistory({ patientId }) {
             setError('');
             
             try {
-                // Petición para Notas de Consulta
-                const notesResponse = await axios.get(`${API_BASE_URL}notas/${patientId}/`, {
-                    headers: { Authorization: `Token ${token}` }
-                });
-                
-                // Petición para Recetas Digitales
-                const recipesResponse = await axios.get(`${API_BASE_URL}recetas/${patientId}/`, {
+                // Una sola petición al expediente con solo las secciones que se muestran aquí
+                const response = await axios.get(`${API_BASE_URL}${patientId}/`, {
+                    params: { secciones: 'notas,recetas' },
                     headers: { Authorization: `Token ${token}` }
                 });
+                const { notas, recetas } = response.data;
 
                 setHistory({ 
-                    notes: notesResponse.data, 
-                    recipes: recipesResponse.data 
+                    notes: notas.results, 
+                    recipes: recetas.results 
+                });
+                // Los enlaces "next" apuntan al historial de cada sección
+                setNextPages({
+                    notes: notas.next,
+                    recipes: recetas.next
                 });
 
             } catch (err) {
@@ -50,6 +54,20 @@ function PatientHistory({ patientId }) {
     }, [patientId]);
 
 
+    // Carga la siguiente página de notas o recetas y la agrega al final de la lista
+    const loadMore = async (section) => {
+        try {
+            const response = await axios.get(nextPages[section], {
+                headers: { Authorization: `Token ${token}` }
+            });
+            setHistory(prev => ({ ...prev, [section]: [...prev[section], ...response.data.results] }));
+            setNextPages(prev => ({ ...prev, [section]: response.data.next }));
+        } catch (err) {
+            console.error("Error cargando más historial:", err);
+            setError('No se pudo cargar más historial del paciente.');
+        }
+    };
+
     if (loading) return <p>Cargando historial clínico...</p>;
     if (error) return <p style={{ color: 'red' }}>{error}</p>;
 
@@ -71,6 +89,11 @@ function PatientHistory({ patientId }) {
                     </div>
                 ))
             )}
+            {nextPages.notes && (
+                <button onClick={() => loadMore('notes')} style={{ padding: '8px', marginBottom: '15px' }}>
+                    Cargar más notas
+                </button>
+            )}
 
             {/* --- LISTA DE RECETAS --- */}
             <h4>Recetas Digitales</h4>
@@ -92,6 +115,11 @@ function PatientHistory({ patientId }) {
                     </div>
                 ))
             )}
+            {nextPages.recipes && (
+                <button onClick={() => loadMore('recipes')} style={{ padding: '8px', marginBottom: '15px' }}>
+                    Cargar más recetas
+                </button>
+            )}
         </div>
     );
 }
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import axios from 'axios';
+import { guardarSesion } from '../sesion';
 
 //const API_BASE_URL = 'http://127.0.0.1:8000/api/personal/login/'; // URL para desarrollo local
 const API_BASE_URL = 'https://sistemahospitalario-production.up.railway.app/api/personal/login/'; // URL para producción
@@ -19,12 +20,11 @@ function LoginComponent({ onLoginSuccess }) {
                 password: password,
             });
 
-            // Si el login es exitoso, DRF devuelve el token y el rol
-            const { token, rol } = response.data;
+            // Si el login es exitoso, DRF devuelve el token (con su caducidad), el token de renovación y el rol
+            const { rol } = response.data;
             
-            // Almacenar el token para futuras peticiones autenticadas
-            localStorage.setItem('authToken', token);
-            localStorage.setItem('userRole', rol);
+            // Almacenar la sesión para futuras peticiones autenticadas (ver sesion.js)
+            guardarSesion(response.data);
 
             // Llamar a una función de manejo de éxito para redirigir
             onLoginSuccess(rol);
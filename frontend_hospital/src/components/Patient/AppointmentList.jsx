@@ -8,6 +8,7 @@ const API_LIST_URL = 'https://sistemahospitalario-production.up.railway.app/api/
 
 function AppointmentList({ patientId }) {
     const [appointments, setAppointments] = useState([]);
+    const [nextPage, setNextPage] = useState(null); // Siguiente página (paginación por cursor)
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [message, setMessage] = useState('');
@@ -20,7 +21,8 @@ function AppointmentList({ patientId }) {
         try {
             // NOTA: Para obtener esta lista, necesitamos crear el endpoint de lectura en el backend.
             const response = await axios.get(`${API_LIST_URL}${patientId}/`); 
-            setAppointments(response.data);
+            setAppointments(response.data.results);
+            setNextPage(response.data.next);
         } catch (err) {
             console.error("Error listando citas:", err);
             setError('No se pudieron cargar sus citas.');
@@ -35,6 +37,17 @@ function AppointmentList({ patientId }) {
         }
     }, [patientId]);
 
+    const loadMore = async () => {
+        try {
+            const response = await axios.get(nextPage);
+            setAppointments(prev => [...prev, ...response.data.results]);
+            setNextPage(response.data.next);
+        } catch (err) {
+            console.error("Error listando citas:", err);
+            setError('No se pudieron cargar más citas.');
+        }
+    };
+
     const handleCancel = async (citaId) => {
         try {
             // Llama al endpoint de Cancelación (RB-004: valida las 2 horas y MG)
@@ -89,6 +102,11 @@ function AppointmentList({ patientId }) {
                     ))}
                 </ul>
             )}
+            {nextPage && (
+                <button onClick={loadMore} style={{ padding: '8px' }}>
+                    Ver más citas
+                </button>
+            )}
         </div>
     );
 }
@@ -0,0 +1,63 @@
+import axios from 'axios';
+
+// Sesión del personal: el token de acceso caduca (PERSONAL_TOKEN_DURACION_MINUTOS) y se renueva
+// con el token de renovación sin volver a pedir la contraseña.
+
+//const API_RENOVAR_URL = 'http://127.0.0.1:8000/api/personal/token/renovar/';
+const API_RENOVAR_URL = 'https://sistemahospitalario-production.up.railway.app/api/personal/token/renovar/';
+
+export const guardarSesion = ({ token, refresh, expira, rol }) => {
+    localStorage.setItem('authToken', token);
+    localStorage.setItem('refreshToken', refresh);
+    localStorage.setItem('tokenExpira', expira);
+    if (rol) localStorage.setItem('userRole', rol);
+};
+
+export const cerrarSesionLocal = () => {
+    localStorage.removeItem('authToken');
+    localStorage.removeItem('refreshToken');
+    localStorage.removeItem('tokenExpira');
+    localStorage.removeItem('userRole');
+};
+
+// Una sesión guardada antes de los tokens con caducidad no tiene token de renovación: se pide login
+export const haySesion = () => Boolean(localStorage.getItem('authToken') && localStorage.getItem('refreshToken'));
+
+let renovacionEnCurso = null;
+
+const renovarToken = () => {
+    // Cada renovación rota ambas claves: varias peticiones con 401 a la vez comparten una sola
+    if (!renovacionEnCurso) {
+        renovacionEnCurso = axios.post(API_RENOVAR_URL, { refresh: localStorage.getItem('refreshToken') }, { sinRenovar: true })
+            .then((response) => {
+                guardarSesion(response.data);
+                return response.data.token;
+            })
+            .finally(() => { renovacionEnCurso = null; });
+    }
+    return renovacionEnCurso;
+};
+
+// Ante un 401 en una petición del personal (Authorization: Token ...), renueva el token y la repite una vez.
+// Si la renovación falla (token de renovación caducado o revocado), cierra la sesión local.
+export const instalarRenovacion = (onSesionExpirada) => {
+    const id = axios.interceptors.response.use(undefined, async (error) => {
+        const config = error.config;
+        const autorizacion = String(config?.headers?.Authorization || '');
+        if (error.response?.status !== 401 || !config || config.sinRenovar || config.reintento
+            || !autorizacion.startsWith('Token ') || !localStorage.getItem('refreshToken')) {
+            return Promise.reject(error);
+        }
+        try {
+            const token = await renovarToken();
+            config.reintento = true;
+            config.headers.Authorization = `Token ${token}`;
+            return axios(config);
+        } catch {
+            cerrarSesionLocal();
+            onSesionExpirada();
+            return Promise.reject(error);
+        }
+    });
+    return () => axios.interceptors.response.eject(id);
+};
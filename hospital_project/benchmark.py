@@ -0,0 +1,60 @@
+# hospital_project/benchmark.py
+# Utilidades compartidas por los comandos benchmark_* de las apps.
+import contextlib
+
+from django.conf import settings
+from django.db import transaction
+
+from expediente.models import Paciente
+
+
+def percentil(valores, p):
+    """ Percentil p (0-100) por el método del rango más cercano. """
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def resumen_latencias(valores_ms):
+    """ p50/p95/p99 (ms) de una lista de latencias, redondeados para reportes JSON. """
+    return {f"p{p}_ms": round(percentil(valores_ms, p), 3) for p in (50, 95, 99)}
+
+
+@contextlib.contextmanager
+def transaccion_revertida():
+    """
+    Transacción que se revierte siempre, salga el bloque como salga (al terminar, con return,
+    break o una excepción): los datos temporales de un benchmark nunca quedan en la BD.
+    """
+    with transaction.atomic():
+        try:
+            yield
+        finally:
+            transaction.set_rollback(True)
+
+
+def host_permitido():
+    """
+    Host para APIClient/APIRequestFactory: el cliente de pruebas usa 'testserver', que fuera de
+    `manage.py test` no está en ALLOWED_HOSTS. Los enlaces de paginación también se construyen con él.
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*':
+            # '.ejemplo.com' admite el dominio y sus subdominios
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def muestra_pacientes(rnd, tamano, campos=('id', 'CURP', 'apellidos')):
+    """
+    Hasta `tamano` pacientes al azar (diccionarios con `campos`) sin ORDER BY RANDOM(), prohibitivo
+    con millones de filas: se sortean IDs del rango y se leen los que existen.
+    """
+    rango = Paciente.objects.order_by('id').values_list('id', flat=True)
+    primero, ultimo = rango.first(), rango.last()
+    if primero is None:
+        return []
+    candidatos = {rnd.randint(primero, ultimo) for _ in range(tamano * 3)}
+    return list(Paciente.objects.filter(id__in=candidatos).values(*campos)[:tamano])
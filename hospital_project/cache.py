@@ -0,0 +1,102 @@
+# hospital_project/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+# Registro de todas las caches creadas, para exponer sus estadísticas
+_REGISTRO = {}
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    """
+    Cache en memoria del proceso con expiración (TTL), tamaño acotado (LRU)
+    y contadores de aciertos/fallos.
+
+    Si se indica `backend` (un alias de settings.CACHES), los valores se guardan en esa
+    cache compartida en lugar de la memoria local, para que varios workers de gunicorn
+    vean las mismas invalidaciones.
+    """
+
+    def __init__(self, nombre, ttl, max_entradas=1024, backend=None):
+        self.nombre = nombre
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.backend = backend
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        _REGISTRO[nombre] = self
+
+    def _clave_compartida(self, clave):
+        return f"{self.nombre}:{clave}"
+
+    def get(self, clave, default=None):
+        if self.backend:
+            valor = caches[self.backend].get(self._clave_compartida(clave), _AUSENTE)
+        else:
+            with self._lock:
+                valor, expira = self._datos.get(clave, (_AUSENTE, 0))
+                if valor is not _AUSENTE and expira < time.monotonic():
+                    del self._datos[clave]
+                    valor = _AUSENTE
+                elif valor is not _AUSENTE:
+                    self._datos.move_to_end(clave)
+
+        with self._lock:
+            if valor is _AUSENTE:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+        return default if valor is _AUSENTE else valor
+
+    def set(self, clave, valor):
+        if self.backend:
+            caches[self.backend].set(self._clave_compartida(clave), valor, self.ttl)
+            return
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def get_or_set(self, clave, cargar):
+        """ Devuelve el valor en cache o lo calcula con `cargar()` y lo guarda. """
+        valor = self.get(clave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = cargar()
+            self.set(clave, valor)
+        return valor
+
+    def delete(self, clave):
+        if self.backend:
+            caches[self.backend].delete(self._clave_compartida(clave))
+            return
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        """ Vacía la memoria local (las claves de un backend compartido expiran por TTL). """
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        estadisticas = {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+        }
+        # Con un backend compartido las entradas no están en la memoria local (y el backend no sabe contarlas)
+        if not self.backend:
+            estadisticas['entradas'] = len(self._datos)
+        return estadisticas
+
+
+def estadisticas_caches():
+    """ Devuelve las estadísticas de todas las caches registradas, por nombre. """
+    return {nombre: cache.estadisticas() for nombre, cache in _REGISTRO.items()}
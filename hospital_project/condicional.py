@@ -0,0 +1,50 @@
+# hospital_project/condicional.py
+"""
+GET condicional (ETag / Last-Modified) para vistas DRF. Los validadores salen de una consulta
+barata (una versión o un agregado), así que si el cliente ya tiene la representación actual
+se responde 304 sin cargar ni serializar ningún registro.
+"""
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def validadores_peticion(request):
+    """ Validadores que condicional() ya calculó para esta petición (None si no los hay). """
+    return getattr(request, '_validadores_condicionales', None)
+
+
+def condicional(validadores):
+    """
+    Decorador para el get() de una APIView (con method_decorator). `validadores(request, *args, **kwargs)`
+    devuelve (version, ultima_modificacion) o None si el recurso no existe; se evalúa una sola vez por petición
+    y después de la autenticación y los permisos.
+    """
+    def obtener(request, *args, **kwargs):
+        if not hasattr(request, '_validadores_condicionales'):
+            request._validadores_condicionales = validadores(request, *args, **kwargs)
+        return request._validadores_condicionales
+
+    def etag(request, *args, **kwargs):
+        datos = obtener(request, *args, **kwargs)
+        if datos is None:
+            return None
+        # La misma URL puede servirse como JSON o como API navegable
+        return f'"{datos[0]}-{request.accepted_renderer.format}"'
+
+    def ultima_modificacion(request, *args, **kwargs):
+        datos = obtener(request, *args, **kwargs)
+        return datos[1] if datos else None
+
+    def decorador(vista):
+        vista_condicional = condition(etag_func=etag, last_modified_func=ultima_modificacion)(vista)
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            respuesta = vista_condicional(request, *args, **kwargs)
+            # El cliente puede guardar la respuesta, pero debe revalidarla cada vez (dato clínico)
+            patch_cache_control(respuesta, private=True, no_cache=True)
+            return respuesta
+        return envoltura
+    return decorador
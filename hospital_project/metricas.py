@@ -0,0 +1,213 @@
+# hospital_project/metricas.py
+"""
+Métricas por endpoint (nombre de la URL resuelta): latencia, consultas a la BD y su tiempo,
+y tiempo de serialización (renderizado de la respuesta). Se agregan en histogramas en memoria del proceso y se exponen
+en formato Prometheus en /metrics. Opcionalmente se perfila con cProfile una muestra de
+peticiones y se guardan en disco las que resultan lentas.
+"""
+import contextlib
+import contextvars
+import cProfile
+import random
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .cache import estadisticas_caches
+
+# Límites superiores de los buckets de cada histograma
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Acumulador de la petición en curso (cada hilo/petición tiene el suyo)
+_peticion_actual = contextvars.ContextVar('metricas_peticion', default=None)
+
+# Solo una petición perfilada a la vez por proceso (desde Python 3.12 cProfile no admite perfiles simultáneos)
+_perfilando = threading.Lock()
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class RegistroMetricas:
+    """ Histogramas por endpoint, protegidos con un lock (gunicorn con hilos). """
+
+    SERIES = {
+        'latencia_segundos': BUCKETS_SEGUNDOS,
+        'bd_segundos': BUCKETS_SEGUNDOS,
+        'bd_consultas': BUCKETS_CONSULTAS,
+        'serializacion_segundos': BUCKETS_SEGUNDOS,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def registrar(self, endpoint, metodo, estado, valores):
+        with self._lock:
+            serie = self._endpoints.setdefault((endpoint, metodo), {
+                'respuestas': {},
+                **{nombre: Histograma(buckets) for nombre, buckets in self.SERIES.items()},
+            })
+            serie['respuestas'][estado] = serie['respuestas'].get(estado, 0) + 1
+            for nombre, valor in valores.items():
+                serie[nombre].observar(valor)
+
+    def reiniciar(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def exportar(self):
+        """ Texto en formato de exposición de Prometheus (text/plain; version=0.0.4). """
+        lineas = []
+        with self._lock:
+            lineas += [
+                '# HELP hospital_http_respuestas_total Respuestas por endpoint, método y código HTTP.',
+                '# TYPE hospital_http_respuestas_total counter',
+            ]
+            for (endpoint, metodo), serie in sorted(self._endpoints.items()):
+                for estado, total in sorted(serie['respuestas'].items()):
+                    lineas.append(
+                        f'hospital_http_respuestas_total{{endpoint="{endpoint}",metodo="{metodo}",estado="{estado}"}} {total}'
+                    )
+
+            for nombre in self.SERIES:
+                metrica = f'hospital_http_{nombre}'
+                lineas += [f'# HELP {metrica} {nombre} por petición, por endpoint.', f'# TYPE {metrica} histogram']
+                for (endpoint, metodo), serie in sorted(self._endpoints.items()):
+                    histograma = serie[nombre]
+                    etiquetas = f'endpoint="{endpoint}",metodo="{metodo}"'
+                    acumulado = 0
+                    for limite, conteo in zip(histograma.buckets + ('+Inf',), histograma.conteos):
+                        acumulado += conteo
+                        lineas.append(f'{metrica}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                    lineas.append(f'{metrica}_sum{{{etiquetas}}} {histograma.suma:.6f}')
+                    lineas.append(f'{metrica}_count{{{etiquetas}}} {histograma.total}')
+
+        # Caches en memoria (hospital_project.cache)
+        for campo, tipo in (('aciertos', 'counter'), ('fallos', 'counter'), ('tasa_aciertos', 'gauge'),
+                            ('entradas', 'gauge')):
+            metrica = f'hospital_cache_{campo}' + ('_total' if tipo == 'counter' else '')
+            lineas += [f'# HELP {metrica} {campo} de cada cache en memoria.', f'# TYPE {metrica} {tipo}']
+            for nombre, estadisticas in sorted(estadisticas_caches().items()):
+                # 'entradas' solo existe en las caches locales (sin backend de settings.CACHES)
+                if campo in estadisticas:
+                    lineas.append(f'{metrica}{{cache="{nombre}"}} {round(estadisticas[campo], 4)}')
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas()
+
+
+@contextlib.contextmanager
+def medir_serializacion():
+    """
+    Suma al tiempo de serialización de la petición en curso lo que tarda el bloque. Lo usan los
+    listados al construir la representación (proyecciones y serializadores), el middleware al
+    renderizar las Response de DRF y las vistas que renderizan ellas mismas (p. ej. la cache de
+    historiales). Fuera de una petición medida no hace nada.
+    """
+    acumulador = _peticion_actual.get()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if acumulador is not None:
+            acumulador['serializacion_segundos'] += time.perf_counter() - inicio
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición: latencia total, número y tiempo de consultas a la BD
+    (connection.execute_wrapper) y tiempo de serialización: la representación de los listados
+    (ListadoProyectadoMixin y el expediente unificado) más el renderizado de la respuesta
+    (JSON, HTML de la API navegable), que es donde se codifica el cuerpo.
+    Debe ir primero en MIDDLEWARE para que la latencia incluya al resto de middlewares.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _medir_consulta(self, execute, sql, params, many, context):
+        acumulador = _peticion_actual.get()
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if acumulador is not None:
+                acumulador['bd_consultas'] += 1
+                acumulador['bd_segundos'] += time.perf_counter() - inicio
+
+    def __call__(self, request):
+        acumulador = {'bd_consultas': 0, 'bd_segundos': 0.0, 'serializacion_segundos': 0.0}
+        token = _peticion_actual.set(acumulador)
+        perfilar = random.random() < settings.METRICAS_PERFILADO_TASA and _perfilando.acquire(blocking=False)
+        perfil = cProfile.Profile() if perfilar else None
+
+        inicio = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._medir_consulta):
+                if perfil:
+                    perfil.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if perfil:
+                        perfil.disable()
+                        _perfilando.release()
+        finally:
+            _peticion_actual.reset(token)
+        latencia = time.perf_counter() - inicio
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        endpoint = (coincidencia.view_name or coincidencia.route) if coincidencia else 'sin_ruta'
+        registro.registrar(endpoint, request.method, response.status_code, {
+            'latencia_segundos': latencia,
+            'bd_segundos': acumulador['bd_segundos'],
+            'bd_consultas': acumulador['bd_consultas'],
+            'serializacion_segundos': acumulador['serializacion_segundos'],
+        })
+
+        if perfil and latencia * 1000 >= settings.METRICAS_PERFILADO_UMBRAL_MS:
+            self._guardar_perfil(perfil, endpoint, latencia)
+        return response
+
+    def process_template_response(self, request, response):
+        # Las Response de DRF se renderizan (JSON) después de la vista: se renderiza aquí para medirlo.
+        # Django no vuelve a renderizar una respuesta ya renderizada.
+        with medir_serializacion():
+            response.render()
+        return response
+
+    def _guardar_perfil(self, perfil, endpoint, latencia):
+        directorio = Path(settings.METRICAS_PERFILADO_DIR)
+        directorio.mkdir(parents=True, exist_ok=True)
+        nombre = f"{endpoint.replace(':', '_').replace('/', '_')}-{int(time.time() * 1000)}-{int(latencia * 1000)}ms.prof"
+        perfil.dump_stats(directorio / nombre)
+
+
+def metricas_view(request):
+    """
+    Endpoint /metrics para Prometheus: exige la cabecera "Authorization: Bearer <METRICAS_TOKEN>".
+    Sin METRICAS_TOKEN configurado responde 403 (el tráfico por endpoint no es público).
+    """
+    token = settings.METRICAS_TOKEN
+    if not token or not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,54 @@
+# hospital_project/proyecciones.py
+"""
+Listados de solo lectura a partir de .values(): cada Proyeccion produce los mismos campos, en el mismo
+orden y con los mismos formatos que el serializador al que sustituye, sin instanciar modelos ni recorrer
+los campos del serializador en cada fila. Si cambia el serializador hay que cambiar su proyección;
+el comando benchmark_serializacion compara ambas salidas byte a byte.
+"""
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .metricas import medir_serializacion
+
+# Los mismos to_representation que aplican los campos de DRF (ISO 8601 en la zona horaria activa)
+fecha_hora = serializers.DateTimeField().to_representation
+fecha = serializers.DateField().to_representation
+
+
+def decimal(max_digits, decimal_places):
+    """ Formato de un DecimalField del modelo (texto con los decimales fijos). """
+    formato = serializers.DecimalField(max_digits=max_digits, decimal_places=decimal_places).to_representation
+    return lambda valor: None if valor is None else formato(valor)
+
+
+def nombre_completo(nombre, apellidos):
+    # Igual que AbstractUser.get_full_name()
+    return f"{nombre} {apellidos}".strip()
+
+
+class Proyeccion:
+    """ `columnas` se piden con .values(); `fila()` las convierte en la representación del serializador. """
+    columnas = ()
+
+    def consulta(self, queryset):
+        return queryset.values(*self.columnas)
+
+    def representar(self, filas):
+        return [self.fila(fila) for fila in filas]
+
+    def fila(self, fila):
+        raise NotImplementedError
+
+
+class ListadoProyectadoMixin:
+    """ Para ListAPIView: el GET lista con `proyeccion` en lugar de instanciar modelos y serializarlos. """
+    proyeccion = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.proyeccion.consulta(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(queryset)
+        with medir_serializacion():
+            datos = self.proyeccion.representar(queryset if pagina is None else pagina)
+        if pagina is not None:
+            return self.get_paginated_response(datos)
+        return Response(datos)
@@ -0,0 +1,35 @@
+# hospital_project/renderers.py
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: sin ella se usa el módulo json de la biblioteca estándar
+    orjson = None
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    JSONRenderer que codifica con orjson cuando está instalado y produce los mismos bytes que
+    JSONRenderer (separadores compactos, UTF-8 sin escapar, fechas y decimales con el encoder de DRF).
+    Cuando no puede garantizarlo (indentación pedida, UNICODE_JSON/COMPACT_JSON desactivados,
+    claves no str, enteros de más de 64 bits) usa JSONRenderer.
+
+    orjson escribe algunos flotantes de otra forma (1e16 frente a 1e+16): se declara solo en vistas
+    cuyas respuestas no llevan flotantes (los decimales viajan como texto).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            contenido = orjson.dumps(data, default=self.encoder_class().default,
+                                     option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Igual que JSONRenderer: U+2028 y U+2029 son JSON válido pero no JavaScript válido
+        return contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+# Renderers de los listados de lectura (historiales, citas, búsqueda de pacientes)
+RENDERERS_LISTADOS = (JSONRapidoRenderer, BrowsableAPIRenderer)
@@ -59,6 +59,8 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'personal.Personal'
 
 MIDDLEWARE = [
+    # Primero, para que la latencia medida incluya al resto de middlewares (/metrics)
+    'hospital_project.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
@@ -70,6 +72,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# --- MÉTRICAS (hospital_project.metricas) ---
+# /metrics en formato Prometheus: exige "Authorization: Bearer <METRICAS_TOKEN>"; sin token configurado responde 403.
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+# Fracción de peticiones perfiladas con cProfile (0 = desactivado); se guardan las que superan el umbral.
+METRICAS_PERFILADO_TASA = float(os.environ.get('METRICAS_PERFILADO_TASA', 0))
+METRICAS_PERFILADO_UMBRAL_MS = int(os.environ.get('METRICAS_PERFILADO_UMBRAL_MS', 500))
+METRICAS_PERFILADO_DIR = os.environ.get('METRICAS_PERFILADO_DIR') or str(BASE_DIR / 'perfiles')
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 TRUSTED_RAILWAY_HOST = 'https://sistemahospitalario-production.up.railway.app'
@@ -87,6 +97,9 @@ CORS_ALLOWED_ORIGINS = [
     VERCEL_FRONTEND_URL,  # <-- Incluimos el host de Vercel
 ]
 
+# Encabezados de respuesta que el frontend puede leer (paginación de opciones de citas)
+CORS_EXPOSE_HEADERS = ['X-Siguiente-Desde', 'X-Siguiente-Desde-Agenda']
+
 ROOT_URLCONF = 'hospital_project.urls'
 
 TEMPLATES = [
@@ -126,11 +139,92 @@ DATABASES = {
     )
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # SQLite (desarrollo local y pruebas): BEGIN IMMEDIATE toma el candado de escritura al abrir la transacción,
+    # así las escrituras concurrentes esperan su turno en lugar de fallar con "database is locked".
+    # La BD de pruebas va a un archivo (no en memoria) para que las pruebas con hilos la compartan.
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+
+# --- AGENDA ---
+# Estrategia de autoasignación de citas MG (agenda.estrategias):
+# 'primero' (slot más próximo), 'menor_carga' (médico con menos minutos agendados) o 'round_robin'.
+AGENDA_ESTRATEGIA_ASIGNACION = os.environ.get('AGENDA_ESTRATEGIA_ASIGNACION', 'primero')
+
+# Búsqueda de disponibilidad (agenda.disponibilidad): horizonte en días a partir de mañana,
+# duración de cada slot (RF-011) y número de opciones que devuelve /api/agenda/opciones/ (RB-005).
+AGENDA_DIAS_A_BUSCAR = int(os.environ.get('AGENDA_DIAS_A_BUSCAR', 14))
+AGENDA_DURACION_SLOT_MINUTOS = int(os.environ.get('AGENDA_DURACION_SLOT_MINUTOS', 30))
+AGENDA_OPCIONES_MINIMAS = int(os.environ.get('AGENDA_OPCIONES_MINIMAS', 5))
+
+# --- CACHES ---
+# Padrón de Médicos Generales y sus Agendas (agenda.disponibilidad).
+# Con varios workers de gunicorn, AGENDA_CACHE_PADRON_BACKEND puede apuntar a un alias de CACHES
+# compartido (Redis/Memcached/BD) para que las invalidaciones lleguen a todos los procesos.
+AGENDA_CACHE_PADRON_TTL = int(os.environ.get('AGENDA_CACHE_PADRON_TTL', 300)) # segundos
+AGENDA_CACHE_PADRON_BACKEND = os.environ.get('AGENDA_CACHE_PADRON_BACKEND') or None
+# CURP -> paciente para el login público del paciente (expediente.busqueda)
+PACIENTES_CACHE_CURP_TTL = int(os.environ.get('PACIENTES_CACHE_CURP_TTL', 600)) # segundos
+PACIENTES_CACHE_CURP_MAX_ENTRADAS = int(os.environ.get('PACIENTES_CACHE_CURP_MAX_ENTRADAS', 10000))
+PACIENTES_CACHE_CURP_BACKEND = os.environ.get('PACIENTES_CACHE_CURP_BACKEND') or None
+# Token -> usuario autenticado (personal.authentication); se invalida al cerrar sesión y al guardar Personal
+PERSONAL_CACHE_TOKENS_TTL = int(os.environ.get('PERSONAL_CACHE_TOKENS_TTL', 300)) # segundos
+PERSONAL_CACHE_TOKENS_MAX_ENTRADAS = int(os.environ.get('PERSONAL_CACHE_TOKENS_MAX_ENTRADAS', 10000))
+PERSONAL_CACHE_TOKENS_BACKEND = os.environ.get('PERSONAL_CACHE_TOKENS_BACKEND') or None
+# Respuestas JSON de los historiales por (endpoint, paciente, versión del expediente, página) (expediente.versiones).
+# Una escritura cambia la versión y deja inalcanzables las entradas anteriores: el TTL solo libera espacio.
+HISTORIAL_CACHE_TTL = int(os.environ.get('HISTORIAL_CACHE_TTL', 3600)) # segundos
+HISTORIAL_CACHE_MAX_ENTRADAS = int(os.environ.get('HISTORIAL_CACHE_MAX_ENTRADAS', 2000))
+HISTORIAL_CACHE_BACKEND = os.environ.get('HISTORIAL_CACHE_BACKEND') or None
+# Directorio de la cache en disco 'historiales' (HISTORIAL_CACHE_BACKEND=historiales), compartida entre workers
+HISTORIAL_CACHE_DIR = os.environ.get('HISTORIAL_CACHE_DIR') or None
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if HISTORIAL_CACHE_DIR:
+    CACHES['historiales'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': HISTORIAL_CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': HISTORIAL_CACHE_MAX_ENTRADAS},
+    }
+
+# --- TOKENS DE ACCESO (personal.TokenAcceso) ---
+# El token de sesión caduca tras una jornada; el de renovación permite obtener uno nuevo sin contraseña.
+PERSONAL_TOKEN_DURACION_MINUTOS = int(os.environ.get('PERSONAL_TOKEN_DURACION_MINUTOS', 8 * 60))
+PERSONAL_TOKEN_RENOVACION_DIAS = int(os.environ.get('PERSONAL_TOKEN_RENOVACION_DIAS', 7))
+
 AUTHENTICATION_BACKENDS = [
     # Asegura la autenticación del modelo de usuario personalizado
     'django.contrib.auth.backends.ModelBackend'
 ]
 
+# --- HASH DE CONTRASEÑAS (personal.hashers) ---
+# Algoritmo preferido: 'pbkdf2' (por defecto), 'bcrypt' (requiere `bcrypt`) o 'argon2' (requiere `argon2-cffi`).
+# Los demás se conservan para verificar hashes antiguos; al iniciar sesión se recalculan con el preferido.
+# El costo se ajusta por despliegue midiendo con `python manage.py benchmark_hasher`.
+PERSONAL_PASSWORD_HASHER = os.environ.get('PERSONAL_PASSWORD_HASHER', 'pbkdf2')
+PERSONAL_HASHER_PBKDF2_ITERACIONES = int(os.environ.get('PERSONAL_HASHER_PBKDF2_ITERACIONES', 1_000_000))
+PERSONAL_HASHER_BCRYPT_RONDAS = int(os.environ.get('PERSONAL_HASHER_BCRYPT_RONDAS', 12))
+PERSONAL_HASHER_ARGON2_TIEMPO = int(os.environ.get('PERSONAL_HASHER_ARGON2_TIEMPO', 2))
+PERSONAL_HASHER_ARGON2_MEMORIA_KIB = int(os.environ.get('PERSONAL_HASHER_ARGON2_MEMORIA_KIB', 102400))
+PERSONAL_HASHER_ARGON2_PARALELISMO = int(os.environ.get('PERSONAL_HASHER_ARGON2_PARALELISMO', 8))
+# Recalcular el hash en un hilo aparte tras un login exitoso (no suma un segundo hash a la respuesta)
+PERSONAL_REHASH_EN_SEGUNDO_PLANO = os.environ.get('PERSONAL_REHASH_EN_SEGUNDO_PLANO', 'True') == 'True'
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'personal.hashers.PBKDF2PasswordHasher',
+    'bcrypt': 'personal.hashers.BCryptSHA256PasswordHasher',
+    'argon2': 'personal.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PERSONAL_PASSWORD_HASHER]] + [
+    ruta for nombre, ruta in _PASSWORD_HASHERS.items() if nombre != PERSONAL_PASSWORD_HASHER
+] + [
+    # Resto de la lista por defecto de Django, para poder verificar hashes antiguos
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -154,7 +248,8 @@ AUTH_PASSWORD_VALIDATORS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # Esto le dice a DRF que debe buscar un token en el header Authorization
-        'rest_framework.authentication.TokenAuthentication', 
+        # (TokenAuthentication con cache: no consulta la BD en cada petición)
+        'personal.authentication.CachedTokenAuthentication', 
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         # Aplicamos la restricción por defecto de que el usuario debe estar autenticado
@@ -162,6 +257,21 @@ REST_FRAMEWORK = {
     )
 }
 
+# Tamaño de página de los historiales (notas, recetas, citas); el cliente puede pedir
+# otro con ?page_size= hasta el máximo (expediente.pagination).
+HISTORIAL_PAGE_SIZE = int(os.environ.get('HISTORIAL_PAGE_SIZE', 20))
+HISTORIAL_MAX_PAGE_SIZE = int(os.environ.get('HISTORIAL_MAX_PAGE_SIZE', 100))
+
+# Filas por lote de las exportaciones en streaming (expediente.exportacion): tamaño del fetch del cursor
+# y de cada bloque escrito. La memoria usada es proporcional a este valor, no al total exportado.
+EXPORTACION_CHUNK_SIZE = int(os.environ.get('EXPORTACION_CHUNK_SIZE', 2000))
+
+# Documentos de receta (HTML/PDF) generados y guardados por hash de contenido (expediente.documentos)
+RECETAS_DOCUMENTOS_DIR = os.environ.get('RECETAS_DOCUMENTOS_DIR') or str(BASE_DIR / 'documentos' / 'recetas')
+
+# Máximo de resultados de la búsqueda de pacientes (expediente.busqueda), ordenados por relevancia
+PACIENTES_BUSQUEDA_LIMITE = int(os.environ.get('PACIENTES_BUSQUEDA_LIMITE', 50))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -0,0 +1,57 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from expediente.models import Paciente
+from expediente.serializers import NotaConsultaProyeccion
+from personal.models import Personal
+from .metricas import registro
+
+
+class MetricasViewTests(SimpleTestCase):
+    """ /metrics solo responde con METRICAS_TOKEN configurado y la cabecera Bearer correcta. """
+
+    @override_settings(METRICAS_TOKEN='')
+    def test_sin_token_configurado(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_con_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+        respuesta = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn(b'hospital_http_respuestas_total', respuesta.content)
+
+
+class SerializacionMedidaTests(TestCase):
+    """ serializacion_segundos incluye la construcción de la representación, no solo el renderizado. """
+
+    def setUp(self):
+        registro.reiniciar()
+        self.paciente = Paciente.objects.create(CURP='METR900101HDFRRN01', nombre='Ana', apellidos='López',
+                                                direccion='Calle 1', fecha_nacimiento='1990-01-01')
+        self.client = APIClient()
+        self.client.force_authenticate(Personal.objects.create_user('MG-700', password='x', rol='MEDICO'))
+
+    def tearDown(self):
+        registro.reiniciar()
+
+    def serializacion(self, endpoint):
+        with registro._lock:
+            return registro._endpoints[(endpoint, 'GET')]['serializacion_segundos'].suma
+
+    def test_proyeccion_cuenta_como_serializacion(self):
+        def representar_lento(filas):
+            time.sleep(0.05)
+            return []
+
+        with mock.patch.object(NotaConsultaProyeccion, 'representar', side_effect=representar_lento):
+            self.client.get(f'/api/expediente/historial/notas/{self.paciente.id}/')
+            self.client.get(f'/api/expediente/historial/{self.paciente.id}/', {'secciones': 'notas'})
+
+        self.assertGreaterEqual(self.serializacion('historial-notas'), 0.05)
+        self.assertGreaterEqual(self.serializacion('historial-expediente'), 0.05)
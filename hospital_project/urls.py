@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metricas import metricas_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metricas_view, name='metricas'),
     path('api/personal/', include('personal.urls')),
     path('api/expediente/', include('expediente.urls')),
     path('api/agenda/', include('agenda.urls')),
@@ -1,12 +1,21 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Especialidad, Especialista, Personal 
+from .models import Especialidad, Especialista, Personal, TokenAcceso
 from .forms import PersonalCreationForm, PersonalChangeForm
 
 admin.site.register(Especialidad)
 admin.site.register(Especialista)
 
 
+class TokenAccesoAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'creado', 'expira', 'refresh_expira', 'generacion')
+    search_fields = ('usuario__numero_empleado',)
+    raw_id_fields = ('usuario',)
+    readonly_fields = ('key', 'refresh', 'creado')
+
+admin.site.register(TokenAcceso, TokenAccesoAdmin)
+
+
 class PersonalAdmin(UserAdmin):
     form = PersonalChangeForm
     add_form = PersonalCreationForm
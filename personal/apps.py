@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PersonalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'personal'
+
+    def ready(self):
+        # Registrar los receptores de señales (cache de tokens de autenticación)
+        from . import signals  # noqa: F401
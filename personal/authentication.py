@@ -0,0 +1,106 @@
+# personal/authentication.py
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from hospital_project.cache import CacheTTL
+from .models import Personal, TokenAcceso
+
+# Campos de Personal que necesitan la autenticación y los permisos (IsDoctorOrAdmin, IsClinicalStaff).
+# El resto se carga de forma diferida solo si una vista lo pide.
+CAMPOS_USUARIO = (
+    'id', 'numero_empleado', 'first_name', 'last_name', 'rol',
+    'is_active', 'is_staff', 'is_superuser', 'esta_bloqueado', 'generacion_tokens',
+)
+
+# token -> (id del usuario, generación, caducidad), e id del usuario -> campos de CAMPOS_USUARIO.
+# Se invalidan con señales al cerrar sesión (borrar el TokenAcceso) y al guardar Personal (ver personal/signals.py).
+# La revocación se comprueba comparando la generación del token con Personal.generacion_tokens,
+# que viaja en la cache del usuario: validar un token no necesita ninguna consulta extra.
+cache_tokens = CacheTTL(
+    'tokens',
+    ttl=settings.PERSONAL_CACHE_TOKENS_TTL,
+    max_entradas=settings.PERSONAL_CACHE_TOKENS_MAX_ENTRADAS,
+    backend=settings.PERSONAL_CACHE_TOKENS_BACKEND,
+)
+cache_usuarios = CacheTTL(
+    'usuarios_autenticados',
+    ttl=settings.PERSONAL_CACHE_TOKENS_TTL,
+    max_entradas=settings.PERSONAL_CACHE_TOKENS_MAX_ENTRADAS,
+    backend=settings.PERSONAL_CACHE_TOKENS_BACKEND,
+)
+
+
+def datos_usuario(usuario):
+    return {campo: getattr(usuario, campo) for campo in CAMPOS_USUARIO}
+
+
+def usuario_desde_cache(datos):
+    """ Reconstruye un Personal sin consultar la BD; los campos no cacheados quedan diferidos. """
+    # from_db() espera los valores en el orden de los campos del modelo, no en el de CAMPOS_USUARIO
+    campos = [campo.attname for campo in Personal._meta.concrete_fields if campo.attname in datos]
+    return Personal.from_db('default', campos, [datos[campo] for campo in campos])
+
+
+def invalidar_token(key):
+    cache_tokens.delete(key)
+
+
+def invalidar_usuario(usuario_id):
+    cache_usuarios.delete(usuario_id)
+
+
+def revocar_tokens(usuario_id):
+    """ Revoca de golpe todos los tokens emitidos al usuario (sin borrar filas). """
+    Personal.objects.filter(pk=usuario_id).update(generacion_tokens=F('generacion_tokens') + 1)
+    # update() no emite post_save
+    invalidar_usuario(usuario_id)
+
+
+def token_vigente(token, datos):
+    """ Un token es válido si no ha caducado y su generación es la actual del usuario. """
+    return token['expira'] > timezone.now() and token['generacion'] == datos['generacion_tokens']
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Autenticación por TokenAcceso (cabecera "Authorization: Token <key>") con cache delante:
+    una petición con un token ya visto no consulta la BD. Rechaza tokens caducados o revocados
+    y a usuarios bloqueados (RNF-004).
+    """
+    model = TokenAcceso
+
+    def _cargar_token(self, key):
+        try:
+            token = TokenAcceso.objects.select_related('usuario').get(key=key)
+        except TokenAcceso.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        datos_token = {'usuario_id': token.usuario_id, 'generacion': token.generacion, 'expira': token.expira}
+        cache_tokens.set(key, datos_token)
+        cache_usuarios.set(token.usuario_id, datos_usuario(token.usuario))
+        return datos_token
+
+    def _cargar_usuario(self, usuario_id):
+        usuario = Personal.objects.only(*CAMPOS_USUARIO).filter(pk=usuario_id).first()
+        if usuario is None:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        datos = datos_usuario(usuario)
+        cache_usuarios.set(usuario_id, datos)
+        return datos
+
+    def authenticate_credentials(self, key):
+        token = cache_tokens.get(key) or self._cargar_token(key)
+        datos = cache_usuarios.get(token['usuario_id']) or self._cargar_usuario(token['usuario_id'])
+
+        if not datos['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        if datos['esta_bloqueado']:
+            raise exceptions.AuthenticationFailed("Cuenta bloqueada por intentos fallidos (E-SA-02).")
+        if not token_vigente(token, datos):
+            raise exceptions.AuthenticationFailed("Token expirado o revocado.")
+
+        usuario = usuario_desde_cache(datos)
+        return (usuario, TokenAcceso(key=key, usuario=usuario, generacion=token['generacion'], expira=token['expira']))
@@ -0,0 +1,72 @@
+# personal/hashers.py
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.db import connection
+
+# Costo de cada algoritmo configurable por despliegue (ver settings: PERSONAL_PASSWORD_HASHER y PERSONAL_HASHER_*).
+# Los hashes con un costo distinto al configurado se recalculan al iniciar sesión (must_update).
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = settings.PERSONAL_HASHER_PBKDF2_ITERACIONES
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    # Requiere el paquete opcional `bcrypt`
+    rounds = settings.PERSONAL_HASHER_BCRYPT_RONDAS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    # Requiere el paquete opcional `argon2-cffi`
+    time_cost = settings.PERSONAL_HASHER_ARGON2_TIEMPO
+    memory_cost = settings.PERSONAL_HASHER_ARGON2_MEMORIA_KIB
+    parallelism = settings.PERSONAL_HASHER_ARGON2_PARALELISMO
+
+
+# Nombre corto (settings.PERSONAL_PASSWORD_HASHER) -> atributo que fija su costo
+ATRIBUTO_COSTO = {
+    'pbkdf2': 'iterations',
+    'bcrypt': 'rounds',
+    'argon2': 'time_cost',
+}
+
+
+def necesita_rehash(encoded):
+    """ True si el hash no es del algoritmo preferido o no tiene el costo configurado. """
+    preferido = hashers.get_hasher('default')
+    try:
+        actual = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return actual.algorithm != preferido.algorithm or preferido.must_update(encoded)
+
+
+def _rehash(usuario_id, password, encoded_anterior):
+    from .models import Personal
+    # Solo si la contraseña no cambió mientras tanto (no sobrescribir un cambio de contraseña)
+    Personal.objects.filter(pk=usuario_id, password=encoded_anterior).update(
+        password=hashers.make_password(password)
+    )
+
+
+def _rehash_en_hilo(*argumentos):
+    try:
+        _rehash(*argumentos)
+    finally:
+        # La conexión es propia del hilo: cerrarla aquí no toca la de la petición
+        connection.close()
+
+
+def rehash_password(usuario, password):
+    """
+    Recalcula el hash de la contraseña (recién verificada) con el algoritmo y costo configurados.
+    Con PERSONAL_REHASH_EN_SEGUNDO_PLANO se hace en un hilo aparte para no sumar un segundo
+    hash a la latencia del login.
+    """
+    argumentos = (usuario.pk, password, usuario.password)
+    if settings.PERSONAL_REHASH_EN_SEGUNDO_PLANO:
+        threading.Thread(target=_rehash_en_hilo, args=argumentos, daemon=True).start()
+    else:
+        _rehash(*argumentos)
@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital_project.benchmark import percentil
+from personal.hashers import (
+    ATRIBUTO_COSTO, Argon2PasswordHasher, BCryptSHA256PasswordHasher, PBKDF2PasswordHasher,
+)
+
+HASHERS = {
+    'pbkdf2': PBKDF2PasswordHasher,
+    'bcrypt': BCryptSHA256PasswordHasher,
+    'argon2': Argon2PasswordHasher,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de CPU por login (verificación de una contraseña) para un algoritmo de hash "
+        "y uno o varios costos, para ajustar PERSONAL_HASHER_* al CPU de cada despliegue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', choices=sorted(HASHERS), default=settings.PERSONAL_PASSWORD_HASHER,
+            help="Algoritmo a medir (por defecto, PERSONAL_PASSWORD_HASHER)."
+        )
+        parser.add_argument(
+            '--costos', default='',
+            help="Costos a comparar separados por coma: iteraciones (pbkdf2), rondas (bcrypt) "
+                 "o time_cost (argon2). Por defecto, el configurado."
+        )
+        parser.add_argument('--repeticiones', type=int, default=10, help="Verificaciones por costo.")
+
+    def handle(self, *args, **options):
+        clase = HASHERS[options['hasher']]
+        atributo = ATRIBUTO_COSTO[options['hasher']]
+        try:
+            costos = [int(c) for c in options['costos'].split(',') if c.strip()] or [getattr(clase, atributo)]
+        except ValueError:
+            raise CommandError("--costos debe ser una lista de enteros separados por coma.")
+
+        for costo in costos:
+            hasher = clase()
+            setattr(hasher, atributo, costo)
+            try:
+                encoded = hasher.encode('Bench#2024', hasher.salt())
+            except ValueError as e:
+                # Falta la biblioteca opcional (bcrypt / argon2-cffi)
+                raise CommandError(str(e))
+
+            cpu_ms, reloj_ms = [], []
+            for _ in range(options['repeticiones']):
+                inicio_cpu, inicio = time.process_time(), time.perf_counter()
+                hasher.verify('Bench#2024', encoded)
+                cpu_ms.append((time.process_time() - inicio_cpu) * 1000)
+                reloj_ms.append((time.perf_counter() - inicio) * 1000)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{options['hasher']} {atributo}={costo}"))
+            self.stdout.write("  CPU por login (ms) p50/p95: {:.1f} / {:.1f}".format(
+                percentil(cpu_ms, 50), percentil(cpu_ms, 95)))
+            self.stdout.write("  tiempo real (ms) p50/p95: {:.1f} / {:.1f}".format(
+                percentil(reloj_ms, 50), percentil(reloj_ms, 95)))
@@ -0,0 +1,64 @@
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from hospital_project.benchmark import host_permitido, percentil, transaccion_revertida
+from personal.models import Personal
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia del login bajo una carga con forma de ataque (credential stuffing): "
+        "la mayoría de las peticiones prueban contraseñas erróneas contra un grupo de cuentas víctima, "
+        "mezcladas con logins legítimos. Crea empleados temporales dentro de una transacción "
+        "que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=500, help="Número total de peticiones de login.")
+        parser.add_argument('--ataque', type=float, default=0.9, help="Fracción de peticiones maliciosas (0-1).")
+        parser.add_argument('--victimas', type=int, default=20, help="Cuentas atacadas.")
+        parser.add_argument('--legitimos', type=int, default=20, help="Cuentas con logins legítimos.")
+        parser.add_argument('--semilla', type=int, default=0, help="Semilla aleatoria (carga reproducible).")
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        latencias = {'legitimo': [], 'ataque': []}
+        respuestas = Counter()
+
+        with transaccion_revertida():
+            # Un solo hash para todas las cuentas temporales: crear el padrón no debe dominar la medición
+            password = 'Bench#2024'
+            hash_password = make_password(password)
+            victimas = [f"BENCH-V{i:05d}" for i in range(options['victimas'])]
+            legitimos = [f"BENCH-L{i:05d}" for i in range(options['legitimos'])]
+            Personal.objects.bulk_create([
+                Personal(numero_empleado=numero, username=numero, password=hash_password, rol='MEDICO')
+                for numero in victimas + legitimos
+            ])
+
+            cliente = APIClient(SERVER_NAME=host_permitido())
+            for _ in range(options['peticiones']):
+                if rnd.random() < options['ataque']:
+                    tipo, datos = 'ataque', {'numero_empleado': rnd.choice(victimas), 'password': f"x{rnd.random()}"}
+                else:
+                    tipo, datos = 'legitimo', {'numero_empleado': rnd.choice(legitimos), 'password': password}
+
+                inicio = time.perf_counter()
+                respuesta = cliente.post('/api/personal/login/', datos, format='json')
+                latencias[tipo].append((time.perf_counter() - inicio) * 1000)
+                respuestas[(tipo, respuesta.status_code)] += 1
+
+            bloqueadas = Personal.objects.filter(numero_empleado__in=victimas, esta_bloqueado=True).count()
+
+        for tipo, valores in latencias.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Login {tipo}: {len(valores)} peticiones"))
+            self.stdout.write("  latencia (ms) p50/p95/p99: {:.2f} / {:.2f} / {:.2f}".format(
+                percentil(valores, 50), percentil(valores, 95), percentil(valores, 99)))
+            codigos = {codigo: n for (t, codigo), n in sorted(respuestas.items()) if t == tipo}
+            self.stdout.write(f"  respuestas: {codigos}")
+        self.stdout.write(f"Cuentas víctima bloqueadas: {bloqueadas} de {options['victimas']}")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from personal.models import TokenAcceso
+
+
+class Command(BaseCommand):
+    help = (
+        "Elimina en lotes los tokens de acceso cuyo token de renovación ya caducó "
+        "(ya no sirven ni para autenticar ni para renovar). Se recomienda ejecutarlo a diario (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=1000,
+            help="Tokens eliminados por sentencia DELETE (por defecto 1000)."
+        )
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        caducados = TokenAcceso.objects.filter(refresh_expira__lte=ahora).order_by('refresh_expira')
+        total = 0
+        # Lotes pequeños: cada DELETE mantiene los bloqueos poco tiempo aunque haya millones de filas
+        while True:
+            claves = list(caducados.values_list('key', flat=True)[:options['lote']])
+            if not claves:
+                break
+            eliminados, _ = TokenAcceso.objects.filter(key__in=claves).delete()
+            total += eliminados
+
+        self.stdout.write(self.style.SUCCESS(f"Tokens caducados eliminados: {total}."))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal', '0003_especialidad_especialista'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personal',
+            name='generacion_tokens',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='TokenAcceso',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('refresh', models.CharField(max_length=40, unique=True)),
+                ('generacion', models.PositiveIntegerField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField()),
+                ('refresh_expira', models.DateTimeField(db_index=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens_acceso', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
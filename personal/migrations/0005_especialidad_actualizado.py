@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal', '0004_token_acceso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='especialidad',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -1,4 +1,10 @@
+import binascii
+import os
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
 from django.utils.translation import gettext_lazy as _
 
@@ -79,6 +85,9 @@ class Personal(AbstractUser):
     intentos_fallidos = models.IntegerField(default=0)
     esta_bloqueado = models.BooleanField(default=False)
     ultima_contrasena_hash = models.CharField(max_length=128, blank=True, null=True)
+
+    # Al incrementarse, todos los tokens emitidos con una generación anterior quedan revocados
+    generacion_tokens = models.PositiveIntegerField(default=0, editable=False)
     
     # Asignar el Manager personalizado
     objects = PersonalManager() 
@@ -89,6 +98,8 @@ class Personal(AbstractUser):
 class Especialidad(models.Model):
     # Catálogo de 10 especialidades (RF-005)
     nombre = models.CharField(max_length=100, unique=True)
+    # Validador de las peticiones condicionales del catálogo (MAX + COUNT, ver EspecialidadListAPIView)
+    actualizado = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.nombre
@@ -101,4 +112,40 @@ class Especialista(models.Model):
     # Se registran 2 especialistas por especialidad (Regla de Negocio implícita en RF-006)
     
     def __str__(self):
-        return f"{self.medico.get_full_name()} - {self.especialidad.nombre}"
\ No newline at end of file
+        return f"{self.medico.get_full_name()} - {self.especialidad.nombre}"
+
+
+# ----------------- Tokens de acceso -----------------
+
+def generar_clave():
+    return binascii.hexlify(os.urandom(20)).decode()
+
+
+class TokenAcceso(models.Model):
+    """
+    Token de sesión con caducidad (PERSONAL_TOKEN_DURACION_MINUTOS) y token de renovación
+    (PERSONAL_TOKEN_RENOVACION_DIAS). Cada renovación rota ambas claves.
+    Sigue siendo válido solo mientras su generación coincida con Personal.generacion_tokens.
+    """
+    key = models.CharField(max_length=40, primary_key=True)
+    refresh = models.CharField(max_length=40, unique=True)
+    usuario = models.ForeignKey(Personal, on_delete=models.CASCADE, related_name='tokens_acceso')
+    generacion = models.PositiveIntegerField()
+    creado = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField()
+    refresh_expira = models.DateTimeField(db_index=True)
+
+    @classmethod
+    def emitir(cls, usuario):
+        ahora = timezone.now()
+        return cls.objects.create(
+            key=generar_clave(),
+            refresh=generar_clave(),
+            usuario=usuario,
+            generacion=usuario.generacion_tokens,
+            expira=ahora + timedelta(minutes=settings.PERSONAL_TOKEN_DURACION_MINUTOS),
+            refresh_expira=ahora + timedelta(days=settings.PERSONAL_TOKEN_RENOVACION_DIAS),
+        )
+
+    def __str__(self):
+        return f"Token de {self.usuario_id} (expira {self.expira:%Y-%m-%d %H:%M})"
@@ -24,4 +24,15 @@ class IsClinicalStaff(permissions.BasePermission):
         user = request.user
         if user and user.is_authenticated:
             return user.rol in CLINICAL_STAFF_ROLES
-        return False
\ No newline at end of file
+        return False
+
+class IsSuperAdmin(permissions.BasePermission):
+    """
+    Permite el acceso solo al Super Administrador (extracciones para auditoría y reportes NOM).
+    Recepción, Estudios y Farmacia no ven los diagnósticos de todas las notas.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        if user and user.is_authenticated:
+            return user.rol == 'ADMIN_SUPER'
+        return False
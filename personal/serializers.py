@@ -1,8 +1,13 @@
 # personal/serializers.py
 from rest_framework import serializers
-from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password
+from django.db.models import Case, F, Value, When
+from .authentication import invalidar_usuario
+from .hashers import necesita_rehash, rehash_password
 from .models import Personal, Especialidad, Especialista
-from django.db import transaction
+
+# Intentos fallidos consecutivos que bloquean la cuenta (RNF-004)
+INTENTOS_PARA_BLOQUEO = 3
 
 class LoginSerializer(serializers.Serializer):
     # El usuario se autentica con el numero_empleado
@@ -10,51 +15,51 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True, style={'input_type': 'password'})
 
     def validate(self, data):
-        empleado = None
         password = data.get('password')
         num_empleado = data.get('numero_empleado')
         
-        try:
-            empleado = Personal.objects.get(numero_empleado=num_empleado)
-        except Personal.DoesNotExist:
+        empleado = Personal.objects.filter(numero_empleado=num_empleado).first()
+        if empleado is None:
             # No encontramos el empleado, lanzamos error estándar para no dar pistas
             raise serializers.ValidationError("Credenciales inválidas (E-ME-01)[cite: 249].")
 
         if not empleado.is_active:
-            print("FALLO: Usuario inactivo.")
             raise serializers.ValidationError("Cuenta inactiva.")
 
         # --- Lógica de Seguridad de Bloqueo (RNF-004) ---
+        # Se rechaza antes de calcular el hash: una ráfaga contra una cuenta bloqueada no consume CPU.
         if empleado.esta_bloqueado:
             raise serializers.ValidationError("Cuenta bloqueada por intentos fallidos (E-SA-02)[cite: 453].")
 
-        user = authenticate(request=self.context.get('request'), **{empleado.USERNAME_FIELD: num_empleado, 'password': password})
-        # Nota: Usamos {empleado.USERNAME_FIELD: num_empleado} para asegurar que 
-        # la palabra clave coincida con el campo de login definido ('numero_empleado').
-
-        if user:
+        # Un solo hash sobre el empleado ya cargado (authenticate() lo volvería a consultar).
+        # Sin `setter`: si el hash usa otro algoritmo o costo, se recalcula en segundo plano.
+        if check_password(password, empleado.password):
             # Autenticación exitosa
             if empleado.intentos_fallidos > 0:
-                empleado.intentos_fallidos = 0 # Reiniciar contador
-                empleado.save()
-            data['user'] = user
+                Personal.objects.filter(pk=empleado.pk).update(intentos_fallidos=0) # Reiniciar contador
+            if necesita_rehash(empleado.password):
+                rehash_password(empleado, password)
+            data['user'] = empleado
             return data
         
         # --- Lógica de Intento Fallido (TA-1 de CU-A01) ---
-        else:
-            # Fallo de autenticación
-            with transaction.atomic():
-                empleado.intentos_fallidos += 1
-                
-                # Bloquear al 3er intento fallido (RNF-004)
-                if empleado.intentos_fallidos >= 3:
-                    empleado.esta_bloqueado = True
-                    # El sistema solicita cambio de contraseña al bloquear (RNF-004)
-                    # En la vida real, se notificaría para forzar el cambio
-                    
-                empleado.save()
+        # Incremento y bloqueo en un solo UPDATE atómico: intentos simultáneos no se pierden
+        # (sin lectura-modificación-escritura ni bloqueo de fila). Al 3er intento fallido se bloquea (RNF-004).
+        # En el UPDATE, intentos_fallidos del lado derecho es el valor previo al incremento.
+        Personal.objects.filter(pk=empleado.pk).update(
+            intentos_fallidos=F('intentos_fallidos') + 1,
+            esta_bloqueado=Case(
+                When(intentos_fallidos__gte=INTENTOS_PARA_BLOQUEO - 1, then=Value(True)),
+                default=F('esta_bloqueado'),
+            ),
+        )
+        # update() no emite post_save: la cache de autenticación debe ver el bloqueo de inmediato
+        invalidar_usuario(empleado.pk)
 
-            raise serializers.ValidationError("Credenciales inválidas (E-ME-01)[cite: 249].")
+        raise serializers.ValidationError("Credenciales inválidas (E-ME-01)[cite: 249].")
+
+class RenovarTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True, max_length=40)
 
 class EspecialidadSerializer(serializers.ModelSerializer):
     class Meta:
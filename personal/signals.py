@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import CAMPOS_USUARIO, invalidar_token, invalidar_usuario
+from .models import Personal, TokenAcceso
+
+
+@receiver(post_save, sender=Personal)
+@receiver(post_delete, sender=Personal)
+def invalidar_usuario_autenticado(sender, instance, update_fields=None, **kwargs):
+    # Bloqueo, cambio de rol o desactivación: la siguiente petición vuelve a leer al usuario.
+    # Los guardados parciales que no tocan los campos cacheados (p. ej. last_login) no invalidan.
+    if update_fields is not None and not set(CAMPOS_USUARIO).intersection(update_fields):
+        return
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=TokenAcceso)
+def invalidar_token_eliminado(sender, instance, **kwargs):
+    # Cerrar sesión, renovar o purgar borra el TokenAcceso
+    invalidar_token(instance.key)
@@ -1,3 +1,230 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import serializers
+from .authentication import cache_tokens, cache_usuarios, revocar_tokens
+from .models import Especialidad, Personal, TokenAcceso
+
+CONTRASENA = 'Clave-Segura-2024'
+
+
+class TokenCacheadoTests(TestCase):
+    """
+    Un token ya visto se valida desde la cache (sin consultar la BD), pero deja de servir en cuanto
+    se cierra la sesión, se revocan los tokens del usuario o la cuenta se bloquea (RNF-004).
+    """
+
+    def setUp(self):
+        cache_tokens.clear()
+        cache_usuarios.clear()
+        self.medico = Personal.objects.create_user('MED-001', password=CONTRASENA, rol='MEDICO',
+                                                   first_name='Ana', last_name='García')
+        self.admin = Personal.objects.create_user('ADM-001', password=CONTRASENA, rol='ADMIN_SUPER')
+
+    def iniciar_sesion(self, usuario):
+        respuesta = APIClient().post('/api/personal/login/', {'numero_empleado': usuario.numero_empleado,
+                                                              'password': CONTRASENA}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Token {respuesta.json()['token']}")
+        return cliente
+
+    def calentar(self, cliente, url='/api/personal/especialidades/'):
+        """ Primera petición: carga el token y el usuario en la cache; la segunda ya no los consulta. """
+        self.assertEqual(cliente.get(url).status_code, 200)
+        self.assertEqual(cliente.get(url).status_code, 200)
+
+    def test_usuario_desde_cache_conserva_sus_campos(self):
+        # Los permisos por rol se evalúan sobre el usuario reconstruido desde la cache
+        cliente = self.iniciar_sesion(self.admin)
+        self.calentar(cliente, '/api/expediente/exportar/?entidad=notas')
+
+        cliente = self.iniciar_sesion(self.medico)
+        self.calentar(cliente, '/api/expediente/pacientes/')
+        self.assertEqual(cliente.get('/api/expediente/exportar/?entidad=notas').status_code, 403)
+
+    def test_logout(self):
+        cliente = self.iniciar_sesion(self.medico)
+        self.calentar(cliente)
+
+        self.assertEqual(cliente.post('/api/personal/logout/').status_code, 204)
+        self.assertEqual(cliente.get('/api/personal/especialidades/').status_code, 401)
+
+    def test_revocacion_por_generacion(self):
+        cliente, otra_sesion = self.iniciar_sesion(self.medico), self.iniciar_sesion(self.medico)
+        self.calentar(cliente)
+        self.calentar(otra_sesion)
+
+        revocar_tokens(self.medico.pk)
+        self.assertEqual(cliente.get('/api/personal/especialidades/').status_code, 401)
+        self.assertEqual(otra_sesion.get('/api/personal/especialidades/').status_code, 401)
+
+    def test_logout_de_todas_las_sesiones(self):
+        cliente, otra_sesion = self.iniciar_sesion(self.medico), self.iniciar_sesion(self.medico)
+        self.calentar(otra_sesion)
+
+        self.assertEqual(cliente.post('/api/personal/logout/', {'todas': True}, format='json').status_code, 204)
+        self.assertEqual(otra_sesion.get('/api/personal/especialidades/').status_code, 401)
+
+    def test_bloqueo_por_intentos_fallidos(self):
+        cliente = self.iniciar_sesion(self.medico)
+        self.calentar(cliente)
+
+        for _ in range(3):
+            respuesta = APIClient().post('/api/personal/login/', {'numero_empleado': 'MED-001',
+                                                                  'password': 'incorrecta'}, format='json')
+            self.assertEqual(respuesta.status_code, 400)
+
+        respuesta = cliente.get('/api/personal/especialidades/')
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertIn('E-SA-02', respuesta.json()['detail'])
+
+
+@override_settings(PERSONAL_REHASH_EN_SEGUNDO_PLANO=False)
+class RehashAlIniciarSesionTests(TestCase):
+    """ Un hash con otro algoritmo se recalcula con el preferido al iniciar sesión. """
+
+    def setUp(self):
+        self.anterior = make_password(CONTRASENA, hasher='pbkdf2_sha1')
+        self.medico = Personal.objects.create(numero_empleado='MED-002', username='MED-002',
+                                              password=self.anterior, rol='MEDICO')
+
+    def iniciar_sesion(self):
+        return APIClient().post('/api/personal/login/', {'numero_empleado': 'MED-002', 'password': CONTRASENA},
+                                format='json')
+
+    def test_hash_actualizado(self):
+        with transaction.atomic():
+            self.assertEqual(self.iniciar_sesion().status_code, 200)
+            # La conexión de la petición sigue abierta tras el rehash síncrono
+            self.medico.refresh_from_db()
+
+        self.assertTrue(self.medico.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(check_password(CONTRASENA, self.medico.password))
+
+    def test_no_sobrescribe_un_cambio_de_contrasena(self):
+        rehash_original = serializers.rehash_password
+
+        def cambiar_y_rehash(usuario, password):
+            # Otra sesión cambia la contraseña entre la verificación y el rehash
+            Personal.objects.filter(pk=usuario.pk).update(password=make_password('Otra-Clave-2024'))
+            rehash_original(usuario, password)
+
+        with mock.patch.object(serializers, 'rehash_password', cambiar_y_rehash):
+            self.assertEqual(self.iniciar_sesion().status_code, 200)
+
+        self.medico.refresh_from_db()
+        self.assertTrue(check_password('Otra-Clave-2024', self.medico.password))
+
+
+class EspecialidadesCondicionalTests(TestCase):
+    """ El catálogo de especialidades se revalida con MAX(actualizado) y COUNT: altas, cambios y bajas. """
+
+    def setUp(self):
+        self.cardiologia = Especialidad.objects.create(nombre='Cardiología')
+        self.dermatologia = Especialidad.objects.create(nombre='Dermatología')
+        self.client = APIClient()
+        self.client.force_authenticate(Personal.objects.create_user('MED-003', password='x', rol='MEDICO'))
+
+    def etag(self):
+        return self.client.get('/api/personal/especialidades/')['ETag']
+
+    def test_304_con_una_consulta(self):
+        etag = self.etag()
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/api/personal/especialidades/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_cambios_en_el_catalogo_cambian_el_etag(self):
+        etags = [self.etag()]
+        Especialidad.objects.create(nombre='Neurología')
+        etags.append(self.etag())
+        self.cardiologia.nombre = 'Cardiología Pediátrica'
+        self.cardiologia.save()
+        etags.append(self.etag())
+        # Dermatología no es la más reciente: su baja no mueve MAX(actualizado), la detecta el COUNT
+        self.dermatologia.delete()
+        etags.append(self.etag())
+        self.assertEqual(len(set(etags)), 4)
+
+
+class TokenAccesoTests(TestCase):
+    """ Caducidad del token de acceso, renovación con rotación de claves y purga de tokens caducados. """
+
+    def setUp(self):
+        cache_tokens.clear()
+        cache_usuarios.clear()
+        self.medico = Personal.objects.create(numero_empleado='MED-004', username='MED-004', rol='MEDICO')
+
+    def cliente(self, key):
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+        return cliente
+
+    def renovar(self, refresh):
+        return APIClient().post('/api/personal/token/renovar/', {'refresh': refresh}, format='json')
+
+    def test_token_caducado(self):
+        cliente = self.cliente(TokenAcceso.emitir(self.medico).key)
+        self.assertEqual(cliente.get('/api/personal/especialidades/').status_code, 200)
+
+        # También con el token ya en la cache de autenticación
+        despues = timezone.now() + timedelta(minutes=settings.PERSONAL_TOKEN_DURACION_MINUTOS + 1)
+        with mock.patch('personal.authentication.timezone.now', return_value=despues):
+            respuesta = cliente.get('/api/personal/especialidades/')
+        self.assertEqual(respuesta.status_code, 401)
+
+    def test_renovacion_rota_ambas_claves(self):
+        anterior = TokenAcceso.emitir(self.medico)
+        cliente = self.cliente(anterior.key)
+        self.assertEqual(cliente.get('/api/personal/especialidades/').status_code, 200)
+
+        respuesta = self.renovar(anterior.refresh)
+        self.assertEqual(respuesta.status_code, 200)
+        nuevo = respuesta.json()
+        self.assertNotEqual(nuevo['token'], anterior.key)
+        self.assertNotEqual(nuevo['refresh'], anterior.refresh)
+        self.assertEqual(nuevo['rol'], 'MEDICO')
+
+        self.assertEqual(cliente.get('/api/personal/especialidades/').status_code, 401)
+        self.assertEqual(self.cliente(nuevo['token']).get('/api/personal/especialidades/').status_code, 200)
+
+    def test_token_de_renovacion_reutilizado(self):
+        refresh = TokenAcceso.emitir(self.medico).refresh
+        self.assertEqual(self.renovar(refresh).status_code, 200)
+        self.assertEqual(self.renovar(refresh).status_code, 401)
+        self.assertEqual(TokenAcceso.objects.filter(usuario=self.medico).count(), 1)
+
+    def test_token_de_renovacion_caducado_o_revocado(self):
+        caducado = TokenAcceso.emitir(self.medico)
+        TokenAcceso.objects.filter(pk=caducado.pk).update(refresh_expira=timezone.now())
+        self.assertEqual(self.renovar(caducado.refresh).status_code, 401)
+
+        revocado = TokenAcceso.emitir(self.medico)
+        revocar_tokens(self.medico.pk)
+        self.assertEqual(self.renovar(revocado.refresh).status_code, 401)
+
+    def test_purgar_tokens_en_lotes(self):
+        vigentes = {TokenAcceso.emitir(self.medico).key for _ in range(2)}
+        caducados = [TokenAcceso.emitir(self.medico).key for _ in range(5)]
+        TokenAcceso.objects.filter(key__in=caducados).update(refresh_expira=timezone.now() - timedelta(days=1))
+
+        salida = StringIO()
+        with CaptureQueriesContext(connection) as consultas:
+            call_command('purgar_tokens', lote=2, stdout=salida)
+
+        self.assertIn('Tokens caducados eliminados: 5.', salida.getvalue())
+        self.assertEqual(set(TokenAcceso.objects.values_list('key', flat=True)), vigentes)
+        # Tres lotes (2 + 2 + 1) y una última lectura vacía
+        borrados = [q for q in consultas.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(borrados), 3)
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import LoginAPIView, EspecialidadListAPIView
+from .views import LoginAPIView, LogoutAPIView, RenovarTokenAPIView, EspecialidadListAPIView
 
 urlpatterns = [
     path('login/', LoginAPIView.as_view(), name='login'),
+    path('logout/', LogoutAPIView.as_view(), name='logout'),
+    path('token/renovar/', RenovarTokenAPIView.as_view(), name='token-renovar'),
 
     # Ruta para el catálogo
     path('especialidades/', EspecialidadListAPIView.as_view(), name='especialidad-list'),
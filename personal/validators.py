@@ -1,5 +1,6 @@
 # personal/validators.py
 import re
+from django.contrib.auth.hashers import check_password
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
@@ -39,7 +40,9 @@ class NoSequenceValidator:
 class NoReuseValidator:
     # No permitir repetir la misma contraseña (RNF-006)
     def validate(self, password, user=None):
-        if user and user.ultima_contrasena_hash and user.check_password(password):
+        # check_password sin `setter`: user.check_password() recalcularía y guardaría el hash
+        # si coincide, un segundo hash innecesario justo antes de rechazar la contraseña.
+        if user and user.ultima_contrasena_hash and check_password(password, user.password):
             raise ValidationError(_("No puedes reutilizar tu última contraseña."), code='reuse_forbidden')
 
     def get_help_text(self):
@@ -1,9 +1,24 @@
 # personal/views.py
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token # Usaremos Tokens para el login
-from .serializers import LoginSerializer, EspecialidadSerializer
-from .models import Especialidad
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from hospital_project.condicional import condicional
+from .authentication import revocar_tokens
+from .serializers import LoginSerializer, EspecialidadSerializer, RenovarTokenSerializer
+from .models import Especialidad, TokenAcceso
+
+
+def respuesta_token(token, user):
+    return {
+        "token": token.key,
+        "refresh": token.refresh,
+        "expira": token.expira,
+        "numero_empleado": user.numero_empleado,
+        "rol": user.rol,
+    }
 
 class LoginAPIView(generics.GenericAPIView):
     """
@@ -18,19 +33,66 @@ class LoginAPIView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         
-        # Generar o obtener el token de autenticación
-        token, created = Token.objects.get_or_create(user=user)
+        # Emitir un token de sesión con caducidad (y su token de renovación)
+        token = TokenAcceso.emitir(user)
         
         return Response({
-            "token": token.key,
-            "numero_empleado": user.numero_empleado,
-            "rol": user.rol,
+            **respuesta_token(token, user),
             "message": "Inicio de sesión exitoso[cite: 154]."
         }, status=status.HTTP_200_OK)
 
+class RenovarTokenAPIView(generics.GenericAPIView):
+    """
+    API para renovar la sesión con el token de renovación, sin volver a pedir la contraseña.
+    Rota ambas claves: el token anterior y su token de renovación dejan de ser válidos.
+    """
+    serializer_class = RenovarTokenSerializer
+    permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            # Bloquear la fila evita que dos renovaciones simultáneas con la misma clave emitan dos tokens
+            anterior = (TokenAcceso.objects.select_for_update().select_related('usuario')
+                        .filter(refresh=serializer.validated_data['refresh']).first())
+            user = anterior.usuario if anterior else None
+            if (anterior is None or anterior.refresh_expira <= timezone.now()
+                    or anterior.generacion != user.generacion_tokens
+                    or not user.is_active or user.esta_bloqueado):
+                return Response({"detail": "Token de renovación inválido o expirado."},
+                                status=status.HTTP_401_UNAUTHORIZED)
+            anterior.delete()
+            token = TokenAcceso.emitir(user)
+
+        return Response(respuesta_token(token, user), status=status.HTTP_200_OK)
+
+class LogoutAPIView(generics.GenericAPIView):
+    """
+    API para Cerrar Sesión: revoca el token actual (y su entrada en la cache de autenticación).
+    Con {"todas": true} revoca todas las sesiones del usuario, p. ej. ante un equipo extraviado.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.data.get('todas'):
+            revocar_tokens(request.user.pk)
+        TokenAcceso.objects.filter(key=request.auth.key).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+def validadores_especialidades(request, *args, **kwargs):
+    # Un alta o una edición cambian la fecha máxima y una baja cambia el total
+    catalogo = Especialidad.objects.aggregate(total=Count('id'), modificado=Max('actualizado'))
+    modificado = catalogo['modificado']
+    return f"especialidades-{catalogo['total']}-{modificado.timestamp() if modificado else 0}", modificado
+
+@method_decorator(condicional(validadores_especialidades), name='get')
 class EspecialidadListAPIView(generics.ListAPIView):
     """
     API para devolver el catálogo de especialidades (RF-005).
+    Admite GET condicional: si no cambió, responde 304 sin leer el catálogo.
     """
     queryset = Especialidad.objects.all()
     serializer_class = EspecialidadSerializer